@@ -2,6 +2,7 @@
 """
 API модули
 """
+from .image_cache import ImageCache
 from .wb_api import WildberriesAPI, wb_api
 
-__all__ = ["WildberriesAPI", "wb_api"]
+__all__ = ["ImageCache", "WildberriesAPI", "wb_api"]
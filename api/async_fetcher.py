@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""
+Асинхронный HTTP-движок для изображений WB
+Один поток с event loop и общим aiohttp-пулом соединений
+вместо десятков потоков, ждущих ответа basket-серверов
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import socket
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+
+from api.host_health import HostHealthTable
+from api.image_metrics import ImageMetrics
+
+logger = logging.getLogger(__name__)
+
+# Ошибки сети, которые считаются обычной неудачей запроса
+NETWORK_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, OSError)
+
+
+class CachingResolver(AbstractResolver):
+    """
+    DNS-резолвер с кэшем ответов на ttl секунд.
+    Позволяет заранее разрешить имена basket-хостов перед массовой загрузкой.
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._resolver = aiohttp.ThreadedResolver()
+        self._cache: Dict[Tuple[str, int, int], Tuple[float, list]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, host: str, port: int = 0, family: int = socket.AF_INET):
+        key = (host, port, family)
+        cached = self._cache.get(key)
+        if cached and cached[0] > time.monotonic():
+            self.hits += 1
+            return cached[1]
+        self.misses += 1
+        result = await self._resolver.resolve(host, port, family)
+        self._cache[key] = (time.monotonic() + self.ttl, result)
+        return result
+
+    async def close(self):
+        await self._resolver.close()
+
+    @property
+    def cached_hosts(self) -> int:
+        now = time.monotonic()
+        return len({key[0] for key, (expires, _) in self._cache.items() if expires > now})
+
+
+class AsyncImageFetcher:
+    """
+    HEAD-пробы и загрузки изображений на выделенном event loop.
+
+    Синхронный код вызывает корутины через run(): запрос уходит в поток
+    цикла, вызывающий поток ждёт только результата.
+    """
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None,
+                 connections: int = 64, connections_per_host: int = 6,
+                 probe_timeout: float = 2, fetch_timeout: float = 5,
+                 health: Optional[HostHealthTable] = None,
+                 dns_ttl: float = 300, keepalive_timeout: float = 60,
+                 metrics: Optional[ImageMetrics] = None):
+        """
+        Args:
+            headers: Заголовки по умолчанию для всех запросов
+            connections: Общий лимит одновременных соединений
+            connections_per_host: Лимит соединений к одному basket-серверу
+            probe_timeout: Таймаут HEAD-пробы (сек)
+            fetch_timeout: Таймаут загрузки файла (сек)
+            health: Таблица здоровья хостов (разомкнутые хосты не опрашиваются)
+            dns_ttl: Время жизни DNS-ответа в кэше (сек)
+            keepalive_timeout: Сколько держать простаивающее соединение открытым (сек)
+            metrics: Метрики (задержка по хостам, трафик, отсечённые запросы)
+        """
+        self.headers = dict(headers or {})
+        self.connections = connections
+        self.connections_per_host = connections_per_host
+        self.probe_timeout = probe_timeout
+        self.fetch_timeout = fetch_timeout
+        self.health = health
+        self.dns_ttl = dns_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self.metrics = metrics
+        # Подмена адреса запроса (локальный стенд вместо basket-серверов);
+        # здоровье и метрики при этом ведутся по исходному хосту
+        self.url_rewrite: Optional[Callable[[str], str]] = None
+        self.resolver: Optional[CachingResolver] = None
+        # Счётчики соединений (заполняются trace-хуками aiohttp)
+        self.connections_created = 0
+        self.connections_reused = 0
+        self.warmups = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = threading.Lock()
+
+    # ============== ЖИЗНЕННЫЙ ЦИКЛ ==============
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Event loop движка (запускается при первом обращении)"""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._run_loop, args=(loop,),
+                    name="WB_Image_Loop", daemon=True
+                )
+                self._thread.start()
+                self._loop = loop
+                atexit.register(self.close)
+            return self._loop
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        # Вызывается только из потока цикла, поэтому без блокировки
+        if self._session is None or self._session.closed:
+            self.resolver = CachingResolver(self.dns_ttl)
+            connector = aiohttp.TCPConnector(
+                limit=self.connections,
+                limit_per_host=self.connections_per_host,
+                resolver=self.resolver,
+                use_dns_cache=False,  # кэшем DNS управляет CachingResolver
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector, headers=self.headers,
+                trace_configs=[self._trace_config()],
+            )
+        return self._session
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig()
+
+        async def on_create(session, context, params):
+            self.connections_created += 1
+
+        async def on_reuse(session, context, params):
+            self.connections_reused += 1
+
+        trace.on_connection_create_end.append(on_create)
+        trace.on_connection_reuseconn.append(on_reuse)
+        return trace
+
+    # Период проверки флага отмены при ожидании результата (сек)
+    CANCEL_POLL = 0.05
+
+    def run(self, coro, timeout: Optional[float] = None,
+            cancel: Optional[threading.Event] = None):
+        """
+        Выполнить корутину в потоке движка и дождаться результата
+
+        Args:
+            timeout: Предельное время ожидания (concurrent.futures.TimeoutError)
+            cancel: Флаг отмены - как только он выставлен, корутина отменяется
+                    (concurrent.futures.CancelledError), не дожидаясь таймаута
+        """
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            if cancel is None:
+                return future.result(timeout)
+            deadline = None if timeout is None else time.monotonic() + timeout
+            while True:
+                if cancel.is_set():
+                    raise concurrent.futures.CancelledError()
+                step = self.CANCEL_POLL
+                if deadline is not None:
+                    step = min(step, max(deadline - time.monotonic(), 0))
+                try:
+                    return future.result(step)
+                except concurrent.futures.TimeoutError:
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise
+        except BaseException:
+            future.cancel()
+            raise
+
+    def close(self):
+        """Закрыть сессию и остановить цикл"""
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+
+        async def _shutdown():
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
+
+        try:
+            asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(2)
+        except Exception:
+            pass
+        loop.call_soon_threadsafe(loop.stop)
+
+    # ============== ЗАПРОСЫ ==============
+
+    def _admit(self, url: str) -> Optional[str]:
+        """Хост запроса, если запрос разрешён таблицей здоровья, иначе None"""
+        host = HostHealthTable.host_of(url)
+        if self.health is not None and not self.health.allow(host):
+            if self.metrics is not None:
+                self.metrics.inc("blocked")
+            return None
+        return host
+
+    def _record(self, host: str, started: float, status: Optional[int], error: str = ""):
+        latency_ms = (time.monotonic() - started) * 1000
+        failed = status is None or status >= 500
+        if self.metrics is not None and not failed:
+            self.metrics.observe_host(host, latency_ms)
+        if self.health is None:
+            return
+        if failed:
+            self.health.record_failure(host, error or f"HTTP {status}")
+        else:
+            self.health.record_success(host, latency_ms)
+
+    def _target(self, url: str) -> str:
+        """Фактический адрес запроса"""
+        return self.url_rewrite(url) if self.url_rewrite else url
+
+    def _release(self, host: str):
+        if self.health is not None:
+            self.health.release_probe(host)
+
+    async def head(self, url: str) -> Optional[int]:
+        """HEAD-запрос, возвращает HTTP-статус или None при сетевой ошибке или отключённом хосте"""
+        host = self._admit(url)
+        if host is None:
+            return None
+        session = await self._get_session()
+        timeout = aiohttp.ClientTimeout(total=self.probe_timeout)
+        started = time.monotonic()
+        try:
+            async with session.head(self._target(url), timeout=timeout,
+                                    allow_redirects=True) as response:
+                status = response.status
+        except NETWORK_ERRORS as e:
+            self._record(host, started, None, repr(e))
+            return None
+        except asyncio.CancelledError:
+            self._release(host)
+            raise
+        self._record(host, started, status)
+        return status
+
+    async def fetch(self, url: str) -> Tuple[Optional[int], Optional[bytes]]:
+        """
+        GET-запрос
+
+        Returns:
+            (статус или None при сетевой ошибке, тело ответа при статусе 200)
+        """
+        host = self._admit(url)
+        if host is None:
+            return None, None
+        session = await self._get_session()
+        timeout = aiohttp.ClientTimeout(total=self.fetch_timeout)
+        started = time.monotonic()
+        try:
+            async with session.get(self._target(url), timeout=timeout) as response:
+                status = response.status
+                data = await response.read() if status == 200 else None
+        except NETWORK_ERRORS as e:
+            logger.debug(f"Ошибка загрузки {url}: {e!r}")
+            self._record(host, started, None, repr(e))
+            return None, None
+        except asyncio.CancelledError:
+            self._release(host)
+            raise
+        self._record(host, started, status)
+        if data and self.metrics is not None:
+            self.metrics.inc("bytes", len(data))
+        return status, data
+
+    async def warmup(self, host_connections: Dict[str, int]):
+        """
+        Прогрев перед массовой загрузкой: разрешить DNS и открыть
+        keep-alive соединения к хостам, которые понадобятся
+
+        Args:
+            host_connections: {хост: сколько соединений открыть}
+        """
+        session = await self._get_session()
+        timeout = aiohttp.ClientTimeout(total=self.probe_timeout)
+        self.warmups += 1
+
+        async def open_one(url: str):
+            # Лёгкий HEAD к корню хоста: соединение остаётся в пуле
+            try:
+                async with session.head(url, timeout=timeout) as response:
+                    await response.release()
+            except NETWORK_ERRORS:
+                pass
+
+        async def warm_host(host: str, count: int):
+            # Разомкнутые хосты не прогреваем (и не занимаем их пробу)
+            if self.health is not None and not self.health.rank([host]):
+                return
+            url = self._target(f"https://{host}/")
+            parts = urlsplit(url)
+            try:
+                await self.resolver.resolve(parts.hostname, parts.port or 443, socket.AF_INET)
+            except OSError:
+                return
+            count = max(1, min(count, self.connections_per_host))
+            await asyncio.gather(*(open_one(url) for _ in range(count)))
+
+        await asyncio.gather(*(warm_host(h, n) for h, n in host_connections.items()))
+
+    def warmup_background(self, host_connections: Dict[str, int]):
+        """Запустить прогрев, не дожидаясь его завершения"""
+        if host_connections:
+            asyncio.run_coroutine_threadsafe(self.warmup(host_connections), self.loop)
+
+    def stats(self) -> dict:
+        total = self.connections_created + self.connections_reused
+        return {
+            'connections_created': self.connections_created,
+            'connections_reused': self.connections_reused,
+            'reuse_ratio': round(self.connections_reused / total, 3) if total else None,
+            'dns_hits': self.resolver.hits if self.resolver else 0,
+            'dns_misses': self.resolver.misses if self.resolver else 0,
+            'dns_cached_hosts': self.resolver.cached_hosts if self.resolver else 0,
+            'warmups': self.warmups,
+        }
+
+    async def _probe(self, url: str) -> Optional[str]:
+        return url if await self.head(url) == 200 else None
+
+    async def probe_first(self, urls: List[str], timeout: Optional[float] = None) -> Optional[str]:
+        """
+        Параллельно опросить URL и вернуть первый ответивший 200.
+        Остальные пробы отменяются сразу после первого успеха.
+        """
+        if not urls:
+            return None
+        tasks = [asyncio.ensure_future(self._probe(url)) for url in urls]
+        try:
+            for next_done in asyncio.as_completed(tasks, timeout=timeout or self.probe_timeout * 2):
+                url = await next_done
+                if url:
+                    return url
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+        return None
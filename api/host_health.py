@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Учёт состояния basket-серверов WB (circuit breaker)
+Деградировавший хост перестаёт получать запросы, пока пробный
+запрос не покажет, что он снова отвечает
+"""
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+# Состояния автомата
+CLOSED = "closed"        # Хост здоров, запросы идут
+OPEN = "open"            # Хост отключён до истечения паузы
+HALF_OPEN = "half_open"  # Пропускается одна пробная заявка
+
+
+@dataclass
+class HostHealth:
+    """Статистика одного хоста"""
+    host: str
+    state: str = CLOSED
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    latency_ewma: Optional[float] = None  # мс
+    success_ewma: float = 1.0            # доля успешных ответов (скользящая)
+    opened_at: float = 0
+    probe_started_at: float = 0
+    last_error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        if self.latency_ewma is not None:
+            data["latency_ewma"] = round(self.latency_ewma, 1)
+        data["success_ewma"] = round(self.success_ewma, 3)
+        return data
+
+
+class HostHealthTable:
+    """
+    Таблица здоровья хостов.
+
+    После failure_threshold неудач подряд хост размыкается (OPEN) на
+    open_seconds, затем переходит в HALF_OPEN: пропускается один пробный
+    запрос, успех замыкает цепь, неудача снова её размыкает.
+    """
+
+    def __init__(self, failure_threshold: int = 3, open_seconds: float = 30,
+                 alpha: float = 0.2, probe_timeout: float = 10):
+        """
+        Args:
+            failure_threshold: Неудач подряд до размыкания
+            open_seconds: Пауза перед пробным запросом (сек)
+            alpha: Вес нового замера в EWMA
+            probe_timeout: Через сколько секунд незавершённая проба считается потерянной
+        """
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.alpha = alpha
+        self.probe_timeout = probe_timeout
+        self._hosts: Dict[str, HostHealth] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url: str) -> str:
+        return urlsplit(url).hostname or ""
+
+    def _get_locked(self, host: str) -> HostHealth:
+        health = self._hosts.get(host)
+        if health is None:
+            health = self._hosts[host] = HostHealth(host)
+        return health
+
+    def _refresh_locked(self, health: HostHealth, now: float):
+        if health.state == OPEN and now - health.opened_at >= self.open_seconds:
+            health.state = HALF_OPEN
+            health.probe_started_at = 0
+
+    # ============== МАРШРУТИЗАЦИЯ ==============
+
+    def allow(self, host: str) -> bool:
+        """
+        Можно ли отправить запрос на хост.
+        В HALF_OPEN разрешает ровно одну пробу за раз.
+        """
+        now = time.time()
+        with self._lock:
+            health = self._hosts.get(host)
+            if health is None:
+                return True
+            self._refresh_locked(health, now)
+            if health.state == CLOSED:
+                return True
+            if health.state == HALF_OPEN:
+                if not health.probe_started_at or now - health.probe_started_at > self.probe_timeout:
+                    health.probe_started_at = now
+                    return True
+            return False
+
+    def rank(self, hosts: Iterable[str]) -> List[str]:
+        """
+        Упорядочить хосты от здоровых к сомнительным,
+        разомкнутые (OPEN) исключаются
+        """
+        now = time.time()
+        ranked = []
+        with self._lock:
+            for index, host in enumerate(hosts):
+                health = self._hosts.get(host)
+                if health is None:
+                    ranked.append(((0, -1.0, 0, index), host))
+                    continue
+                self._refresh_locked(health, now)
+                if health.state == OPEN:
+                    continue
+                ranked.append(((
+                    1 if health.state == HALF_OPEN else 0,
+                    -health.success_ewma,
+                    health.latency_ewma or 0,
+                    index,
+                ), host))
+        ranked.sort(key=lambda item: item[0])
+        return [host for _, host in ranked]
+
+    # ============== УЧЁТ РЕЗУЛЬТАТОВ ==============
+
+    def record_success(self, host: str, latency_ms: float):
+        """Хост ответил (любой HTTP-статус, кроме 5xx)"""
+        with self._lock:
+            health = self._get_locked(host)
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.success_ewma += self.alpha * (1 - health.success_ewma)
+            if health.latency_ewma is None:
+                health.latency_ewma = latency_ms
+            else:
+                health.latency_ewma += self.alpha * (latency_ms - health.latency_ewma)
+            health.state = CLOSED
+            health.probe_started_at = 0
+
+    def record_failure(self, host: str, error: str = ""):
+        """Сетевая ошибка, таймаут или 5xx"""
+        now = time.time()
+        with self._lock:
+            health = self._get_locked(host)
+            health.failures += 1
+            health.consecutive_failures += 1
+            health.success_ewma -= self.alpha * health.success_ewma
+            health.last_error = error[:200] or None
+            if (health.state == HALF_OPEN
+                    or health.consecutive_failures >= self.failure_threshold):
+                health.state = OPEN
+                health.opened_at = now
+                health.probe_started_at = 0
+
+    def release_probe(self, host: str):
+        """Проба отменена без результата - разрешить следующую"""
+        with self._lock:
+            health = self._hosts.get(host)
+            if health is not None:
+                health.probe_started_at = 0
+
+    # ============== ДИАГНОСТИКА ==============
+
+    def snapshot(self) -> List[dict]:
+        """Состояние всех известных хостов (для диагностики)"""
+        now = time.time()
+        with self._lock:
+            for health in self._hosts.values():
+                self._refresh_locked(health, now)
+            rows = [h.to_dict() for h in self._hosts.values()]
+        rows.sort(key=lambda row: row["host"])
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+"""
+Дисковый кэш изображений товаров
+Шардированные подкаталоги, лимит по объёму с LRU-вытеснением,
+атомарная запись (temp-файл + rename), манифест в памяти
+и небольшой LRU-кэш содержимого часто запрашиваемых файлов
+"""
+import os
+import hashlib
+import tempfile
+import threading
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Ключ записи кэша: (vendor_code, номер изображения, размер)
+CacheKey = Tuple[str, int, str]
+
+# Размер, под которым лежат файлы старого плоского формата {vendor_code}_{num}.webp
+LEGACY_SIZE = "small"
+
+
+@dataclass
+class CacheEntry:
+    """Запись манифеста: файл изображения, присутствующий на диске"""
+    vendor_code: str
+    num: int
+    size: str
+    path: Path
+    nbytes: int
+    mtime: float
+    etag: Optional[str] = None  # Хэш содержимого (вычисляется при записи или первом чтении)
+
+    @property
+    def key(self) -> CacheKey:
+        return (self.vendor_code, self.num, self.size)
+
+    @property
+    def url_version(self) -> str:
+        """Версия файла для URL: меняется при каждой перезаписи"""
+        return f"{int(self.mtime * 1000):x}"
+
+
+class ImageCache:
+    """
+    Кэш изображений с ограничением по объёму.
+
+    Файлы раскладываются по 256 подкаталогам (первые два символа md5 от артикула),
+    чтобы ни в одной директории не копились десятки тысяч файлов.
+    Манифест (OrderedDict) хранит порядок обращений: в начале - давно не
+    использованные записи, они вытесняются первыми при превышении лимита.
+    """
+
+    SUFFIX = ".webp"
+    TMP_SUFFIX = ".tmp"
+
+    def __init__(self, root: Path, max_bytes: int = 0, hot_bytes: int = 0,
+                 hot_item_max_bytes: int = 256 * 1024):
+        """
+        Args:
+            root: Корневой каталог кэша
+            max_bytes: Лимит объёма в байтах (0 - без ограничения)
+            hot_bytes: Объём содержимого файлов, держащегося в памяти (0 - не держать)
+            hot_item_max_bytes: Файлы крупнее не попадают в память
+        """
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hot_bytes = hot_bytes
+        self.hot_item_max_bytes = hot_item_max_bytes
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[CacheKey, CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._evictions = 0
+        self._hot: "OrderedDict[CacheKey, bytes]" = OrderedDict()
+        self._hot_total = 0
+        self._hot_hits = 0
+        self._hot_misses = 0
+        # Счётчик изменений манифеста (растёт при каждой записи/удалении)
+        self.version = 0
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.rescan()
+
+    # ============== ПУТИ ==============
+
+    @staticmethod
+    def shard_for(vendor_code: str) -> str:
+        """Имя подкаталога для артикула"""
+        return hashlib.md5(str(vendor_code).encode("utf-8")).hexdigest()[:2]
+
+    @classmethod
+    def filename_for(cls, vendor_code: str, num: int, size: str) -> str:
+        return f"{vendor_code}_{num}_{size}{cls.SUFFIX}"
+
+    def path_for(self, vendor_code: str, num: int = 1, size: str = LEGACY_SIZE) -> Path:
+        """Путь к файлу изображения (независимо от его наличия)"""
+        vendor_code = str(vendor_code)
+        return self.root / self.shard_for(vendor_code) / self.filename_for(vendor_code, num, size)
+
+    @classmethod
+    def parse_filename(cls, name: str) -> Optional[CacheKey]:
+        """
+        Разбор имени файла в ключ кэша.
+        Поддерживает новый формат {vc}_{num}_{size}.webp и старый {vc}_{num}.webp
+        """
+        if not name.endswith(cls.SUFFIX):
+            return None
+        parts = name[:-len(cls.SUFFIX)].split("_")
+        try:
+            if len(parts) == 3:
+                return (parts[0], int(parts[1]), parts[2])
+            if len(parts) == 2:
+                return (parts[0], int(parts[1]), LEGACY_SIZE)
+        except ValueError:
+            return None
+        return None
+
+    # ============== МАНИФЕСТ ==============
+
+    def rescan(self):
+        """
+        Построить манифест по содержимому диска.
+        Файлы старого плоского формата переносятся в шарды,
+        недописанные temp-файлы удаляются.
+        """
+        entries: List[CacheEntry] = []
+        legacy: List[os.DirEntry] = []
+
+        with os.scandir(self.root) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    if len(entry.name) == 2:
+                        entries.extend(self._scan_shard(entry.path))
+                elif entry.name.endswith(self.SUFFIX):
+                    legacy.append(entry)
+                elif entry.name.endswith(self.TMP_SUFFIX):
+                    self._unlink_quietly(entry.path)
+
+        for entry in legacy:
+            migrated = self._migrate_legacy(entry)
+            if migrated:
+                entries.append(migrated)
+
+        # Самые старые файлы - в начало очереди на вытеснение
+        entries.sort(key=lambda e: e.mtime)
+        with self._lock:
+            self._entries = OrderedDict((e.key, e) for e in entries)
+            self._total_bytes = sum(e.nbytes for e in entries)
+            self._hot.clear()
+            self._hot_total = 0
+            self.version += 1
+            self._evict_locked()
+
+        if legacy:
+            logger.info(f"Перенесено в шарды {len(legacy)} файлов кэша старого формата")
+
+    def _scan_shard(self, shard_path: str) -> Iterator[CacheEntry]:
+        with os.scandir(shard_path) as it:
+            for entry in it:
+                if entry.name.endswith(self.TMP_SUFFIX):
+                    self._unlink_quietly(entry.path)
+                    continue
+                key = self.parse_filename(entry.name)
+                if not key:
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if st.st_size <= 0:
+                    self._unlink_quietly(entry.path)
+                    continue
+                yield CacheEntry(key[0], key[1], key[2], Path(entry.path), st.st_size, st.st_mtime)
+
+    def _migrate_legacy(self, entry: os.DirEntry) -> Optional[CacheEntry]:
+        key = self.parse_filename(entry.name)
+        if not key:
+            return None
+        try:
+            st = entry.stat()
+            if st.st_size <= 0:
+                self._unlink_quietly(entry.path)
+                return None
+            target = self.path_for(*key)
+            target.parent.mkdir(exist_ok=True)
+            os.replace(entry.path, target)
+        except OSError as e:
+            logger.warning(f"Не удалось перенести {entry.name} в шард: {e}")
+            return None
+        return CacheEntry(key[0], key[1], key[2], target, st.st_size, st.st_mtime)
+
+    def get(self, vendor_code: str, num: int = 1, size: str = LEGACY_SIZE) -> Optional[CacheEntry]:
+        """Найти запись и отметить обращение к ней (для LRU)"""
+        key = (str(vendor_code), num, size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def peek(self, vendor_code: str, num: int = 1, size: str = LEGACY_SIZE) -> Optional[CacheEntry]:
+        """Найти запись без изменения порядка вытеснения"""
+        return self._entries.get((str(vendor_code), num, size))
+
+    def contains(self, vendor_code: str, num: int = 1, size: str = LEGACY_SIZE) -> bool:
+        return (str(vendor_code), num, size) in self._entries
+
+    def entries(self) -> List[CacheEntry]:
+        """Снимок всех записей манифеста"""
+        with self._lock:
+            return list(self._entries.values())
+
+    def entries_for(self, vendor_code: str) -> List[CacheEntry]:
+        """Все записи артикула (все номера и размеры)"""
+        vendor_code = str(vendor_code)
+        with self._lock:
+            return [e for e in self._entries.values() if e.vendor_code == vendor_code]
+
+    # ============== ЗАПИСЬ / УДАЛЕНИЕ ==============
+
+    def put(self, vendor_code: str, num: int, size: str, data: bytes) -> CacheEntry:
+        """
+        Атомарно записать изображение в кэш.
+        Данные пишутся во временный файл в том же шарде и переименовываются
+        поверх целевого, поэтому читатели никогда не видят обрезанный файл.
+        """
+        vendor_code = str(vendor_code)
+        target = self.path_for(vendor_code, num, size)
+        target.parent.mkdir(exist_ok=True)
+
+        fd, tmp_path = tempfile.mkstemp(dir=target.parent, prefix=f".{target.stem}.", suffix=self.TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, target)
+        except BaseException:
+            self._unlink_quietly(tmp_path)
+            raise
+
+        st = target.stat()
+        entry = CacheEntry(vendor_code, num, size, target, st.st_size, st.st_mtime,
+                           etag=self.content_etag(data))
+        with self._lock:
+            previous = self._entries.get(entry.key)
+            if previous is not None:
+                self._drop_locked(previous)
+            self._entries[entry.key] = entry
+            self._total_bytes += entry.nbytes
+            self.version += 1
+            self._evict_locked(keep=entry.key)
+            # Только что скачанное скорее всего сразу запросят
+            self._remember_hot_locked(entry, data)
+        return entry
+
+    # ============== ЧТЕНИЕ ==============
+
+    @staticmethod
+    def content_etag(data: bytes) -> str:
+        """Строгий ETag по содержимому файла"""
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def read(self, entry: CacheEntry) -> bytes:
+        """
+        Прочитать содержимое файла (из памяти, если он недавно читался).
+        Заодно вычисляет ETag записи, если он ещё неизвестен.
+        """
+        key = entry.key
+        with self._lock:
+            data = self._hot.get(key)
+            if data is not None and self._entries.get(key) is entry:
+                self._hot.move_to_end(key)
+                self._hot_hits += 1
+                return data
+            self._hot_misses += 1
+
+        data = entry.path.read_bytes()
+        if entry.etag is None:
+            entry.etag = self.content_etag(data)
+        with self._lock:
+            if self._entries.get(key) is entry:
+                self._remember_hot_locked(entry, data)
+        return data
+
+    def etag_for(self, entry: CacheEntry) -> str:
+        """ETag записи (при необходимости читает файл один раз)"""
+        if entry.etag is None:
+            self.read(entry)
+        return entry.etag
+
+    def _remember_hot_locked(self, entry: CacheEntry, data: bytes):
+        if not self.hot_bytes or len(data) > self.hot_item_max_bytes:
+            return
+        key = entry.key
+        previous = self._hot.pop(key, None)
+        if previous is not None:
+            self._hot_total -= len(previous)
+        self._hot[key] = data
+        self._hot_total += len(data)
+        while self._hot_total > self.hot_bytes and self._hot:
+            _, dropped = self._hot.popitem(last=False)
+            self._hot_total -= len(dropped)
+
+    def remove(self, vendor_code: str, num: Optional[int] = None, size: Optional[str] = None) -> int:
+        """
+        Удалить записи артикула (все, конкретного номера и/или размера)
+
+        Returns:
+            Количество удалённых файлов
+        """
+        vendor_code = str(vendor_code)
+        with self._lock:
+            victims = [
+                e for e in self._entries.values()
+                if e.vendor_code == vendor_code
+                and (num is None or e.num == num)
+                and (size is None or e.size == size)
+            ]
+            for entry in victims:
+                self._drop_locked(entry)
+            if victims:
+                self.version += 1
+        for entry in victims:
+            self._unlink_quietly(entry.path)
+        return len(victims)
+
+    def quarantine(self, entry: CacheEntry, directory: Path) -> Optional[Path]:
+        """
+        Исключить повреждённый файл из кэша, перенеся его в каталог карантина.
+        Если запись уже перезаписана или удалена, ничего не делает.
+
+        Returns:
+            Путь к файлу в карантине или None
+        """
+        with self._lock:
+            if self._entries.get(entry.key) is not entry:
+                return None
+            self._drop_locked(entry)
+            self.version += 1
+            directory = Path(directory)
+            directory.mkdir(parents=True, exist_ok=True)
+            target = directory / f"{int(entry.mtime)}_{entry.path.name}"
+            try:
+                # Под блокировкой: параллельный put() не успеет записать новый файл на это место
+                os.replace(entry.path, target)
+            except OSError as e:
+                logger.warning(f"Не удалось перенести {entry.path.name} в карантин: {e}")
+                self._unlink_quietly(entry.path)
+                return None
+        return target
+
+    def clear(self) -> int:
+        """Удалить все файлы кэша"""
+        with self._lock:
+            victims = list(self._entries.values())
+            self._entries.clear()
+            self._total_bytes = 0
+            self._hot.clear()
+            self._hot_total = 0
+            self.version += 1
+        for entry in victims:
+            self._unlink_quietly(entry.path)
+        return len(victims)
+
+    def trim(self, max_bytes: Optional[int] = None) -> int:
+        """Вытеснить давно не использованные файлы до заданного объёма"""
+        with self._lock:
+            before = self._evictions
+            self._evict_locked(limit=max_bytes)
+            return self._evictions - before
+
+    def _evict_locked(self, keep: Optional[CacheKey] = None, limit: Optional[int] = None):
+        limit = self.max_bytes if limit is None else limit
+        if not limit:
+            return
+        victims = []
+        remaining = self._total_bytes
+        for key, entry in self._entries.items():
+            if remaining <= limit:
+                break
+            if key == keep:
+                continue
+            victims.append(entry)
+            remaining -= entry.nbytes
+        for entry in victims:
+            self._drop_locked(entry)
+            self._unlink_quietly(entry.path)
+            self._evictions += 1
+        if victims:
+            self.version += 1
+
+    def _drop_locked(self, entry: CacheEntry):
+        if self._entries.pop(entry.key, None) is not None:
+            self._total_bytes -= entry.nbytes
+        hot = self._hot.pop(entry.key, None)
+        if hot is not None:
+            self._hot_total -= len(hot)
+
+    @staticmethod
+    def _unlink_quietly(path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    # ============== СТАТИСТИКА ==============
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "files": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self._evictions,
+                "hot_files": len(self._hot),
+                "hot_bytes": self._hot_total,
+                "hot_hits": self._hot_hits,
+                "hot_misses": self._hot_misses,
+            }
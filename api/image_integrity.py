@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка целостности кэша изображений
+Прерванная запись или сохранённая вместо картинки HTML-страница
+оставляют на диске файл, который кэш считает валидным. Сканер проверяет
+заголовок и декодируемость файлов, битые переносит в карантин
+и ставит на повторную загрузку
+"""
+import io
+import json
+import os
+import threading
+import time
+import logging
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from api.image_cache import CacheEntry, ImageCache
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+logger = logging.getLogger(__name__)
+
+JPEG_MAGIC = b"\xff\xd8\xff"
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+
+def header_problem(data: bytes) -> Optional[str]:
+    """Дешёвая проверка по заголовку: None - похоже на изображение, иначе причина"""
+    if not data:
+        return "empty"
+    head = data[:512].lstrip().lower()
+    if head.startswith(b"<") or b"<html" in head:
+        return "html page"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        declared = int.from_bytes(data[4:8], "little") + 8
+        if len(data) < declared:
+            return f"truncated ({len(data)} of {declared} bytes)"
+        return None
+    if data.startswith(JPEG_MAGIC) or data.startswith(PNG_MAGIC):
+        return None
+    return "unknown format"
+
+
+def inspect_file(path: str) -> Optional[str]:
+    """
+    Полная проверка файла: заголовок и декодирование.
+    Функция верхнего уровня - выполняется в дочернем процессе.
+    """
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        # Файл успели вытеснить или перезаписать - проверять нечего
+        return None
+    except OSError as e:
+        return f"read error: {e}"
+    problem = header_problem(data)
+    if problem or not HAS_PIL:
+        return problem
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+    except Exception as e:
+        return f"decode error: {e}"[:200]
+    return None
+
+
+def inspect_batch(paths: List[str]) -> List[Optional[str]]:
+    """Проверить пачку файлов за один вызов пула (меньше пересылок между процессами)"""
+    return [inspect_file(path) for path in paths]
+
+
+class IntegrityScanner:
+    """
+    Инкрементальный сканер кэша.
+
+    Каждый проход проверяет только файлы, изменённые после предыдущего
+    прохода (граница mtime хранится в state_file). Битые файлы уходят
+    в quarantine_dir, для изображения №1 вызывается on_bad - повторная
+    загрузка с низким приоритетом. Фоновый цикл запускается раз в
+    interval секунд и только когда should_run() разрешает.
+    """
+
+    BATCH_SIZE = 64
+    # Сколько дней хранить файлы в карантине
+    QUARANTINE_DAYS = 7
+    # Сколько последних битых файлов показывать в отчёте
+    REPORT_LIMIT = 50
+
+    def __init__(self, cache: ImageCache, submit: Callable, state_file: Path,
+                 quarantine_dir: Path, on_bad: Optional[Callable[[CacheEntry], None]] = None,
+                 interval: float = 6 * 3600, should_run: Optional[Callable[[], bool]] = None):
+        """
+        Args:
+            cache: Кэш изображений
+            submit: Запуск функции в пуле процессов: submit(fn, *args) -> Future
+            state_file: Файл с границей сканирования и последним отчётом
+            quarantine_dir: Каталог для битых файлов
+            on_bad: Вызывается для каждого изъятого файла (перезагрузка)
+            interval: Период фоновой проверки (сек)
+            should_run: Можно ли сейчас сканировать (например, пользователь бездействует)
+        """
+        self.cache = cache
+        self.submit = submit
+        self.state_file = Path(state_file)
+        self.quarantine_dir = Path(quarantine_dir)
+        self.on_bad = on_bad
+        self.interval = interval
+        self.should_run = should_run
+        self._scan_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.state = self._load_state()
+
+    # ============== СОСТОЯНИЕ ==============
+
+    def _load_state(self) -> dict:
+        try:
+            return json.loads(self.state_file.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {"since_mtime": 0, "last_report": None, "total_quarantined": 0}
+
+    def _save_state(self):
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_file.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.state_file)
+
+    # ============== ПРОВЕРКА ==============
+
+    @property
+    def is_scanning(self) -> bool:
+        return self._scan_lock.locked()
+
+    def scan(self, full: bool = False) -> Optional[dict]:
+        """
+        Один проход проверки
+
+        Args:
+            full: Проверить весь кэш, а не только изменённые файлы
+
+        Returns:
+            Отчёт о проходе или None, если проверка уже идёт
+        """
+        if not self._scan_lock.acquire(blocking=False):
+            return None
+        try:
+            return self._scan(full)
+        finally:
+            self._scan_lock.release()
+
+    def _scan(self, full: bool) -> dict:
+        started = time.time()
+        since = 0 if full else self.state.get("since_mtime", 0)
+        entries = [e for e in self.cache.entries() if e.mtime > since]
+        entries.sort(key=lambda e: e.mtime)
+
+        bad: List[dict] = []
+        for start in range(0, len(entries), self.BATCH_SIZE):
+            batch = entries[start:start + self.BATCH_SIZE]
+            problems = self.submit(inspect_batch, [str(e.path) for e in batch]).result()
+            for entry, problem in zip(batch, problems):
+                if problem and self._quarantine(entry, problem):
+                    bad.append({"vendor_code": entry.vendor_code, "num": entry.num,
+                                "size": entry.size, "reason": problem})
+
+        if entries:
+            self.state["since_mtime"] = max(since, entries[-1].mtime)
+        pruned = self._prune_quarantine()
+        report = {
+            "full": full,
+            "started_at": started,
+            "duration": round(time.time() - started, 2),
+            "scanned": len(entries),
+            "quarantined": len(bad),
+            "bad": bad[-self.REPORT_LIMIT:],
+            "pruned": pruned,
+        }
+        self.state["last_report"] = report
+        self.state["total_quarantined"] = self.state.get("total_quarantined", 0) + len(bad)
+        self._save_state()
+        if bad:
+            logger.warning(f"Проверка кэша: изъято повреждённых файлов - {len(bad)} из {len(entries)}")
+        return report
+
+    def _quarantine(self, entry: CacheEntry, problem: str) -> bool:
+        if self.cache.quarantine(entry, self.quarantine_dir) is None:
+            return False
+        logger.info(f"В карантин: {entry.path.name} ({problem})")
+        if self.on_bad is not None:
+            try:
+                self.on_bad(entry)
+            except Exception as e:
+                logger.error(f"Ошибка постановки {entry.vendor_code} на загрузку: {e}")
+        return True
+
+    def _prune_quarantine(self) -> int:
+        if not self.quarantine_dir.exists():
+            return 0
+        expires = time.time() - self.QUARANTINE_DAYS * 86400
+        removed = 0
+        for path in self.quarantine_dir.iterdir():
+            try:
+                if path.stat().st_mtime < expires:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                continue
+        return removed
+
+    # ============== ФОН ==============
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="Image_Integrity", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def scan_background(self, full: bool = False) -> bool:
+        """Запустить проход в отдельном потоке; False - проверка уже идёт"""
+        if self.is_scanning:
+            return False
+        threading.Thread(target=self._safe_scan, args=(full,), daemon=True).start()
+        return True
+
+    def _safe_scan(self, full: bool = False):
+        try:
+            self.scan(full)
+        except Exception as e:
+            logger.error(f"Ошибка проверки кэша изображений: {e}")
+
+    def _loop(self):
+        # Пока пользователь активен, повторяем попытку каждую минуту
+        wait = min(self.interval, 60)
+        while not self._stop.wait(wait):
+            if self.should_run is not None and not self.should_run():
+                wait = min(self.interval, 60)
+                continue
+            self._safe_scan()
+            wait = self.interval
+
+    def status(self) -> Dict:
+        return {
+            "scanning": self.is_scanning,
+            "since_mtime": self.state.get("since_mtime", 0),
+            "total_quarantined": self.state.get("total_quarantined", 0),
+            "last_report": self.state.get("last_report"),
+        }
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Метрики конвейера изображений
+Счётчики и гистограммы показывают, откуда берутся картинки (кэш или сеть),
+насколько точна расчётная таблица basket-серверов и где теряется время
+"""
+import bisect
+import threading
+from typing import Dict, Optional, Sequence
+
+# Границы корзин гистограмм
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000)
+PROBE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами (верхние границы включительно)"""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)  # последняя корзина - "больше всех"
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля по верхней границе корзины"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.bounds[index] if index < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self) -> dict:
+        labels = [str(b) for b in self.bounds] + ["inf"]
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 1) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "max": round(self.max, 1),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class ImageMetrics:
+    """
+    Метрики WildberriesAPI и AsyncImageFetcher.
+
+    Счётчики:
+        cache_hits / downloads / download_failures - чем закончился запрос изображения
+        variants_derived - размеры, полученные уменьшением мастер-копии
+        primary_success / fanout - расчётный сервер ответил / понадобился перебор
+        fanout_success - перебор нашёл изображение
+        bytes - скачано из сети, blocked - запросы, отсечённые circuit breaker
+    Гистограммы:
+        probes_per_find - HEAD-проб на один перебор серверов
+        queue_wait_ms - ожидание свободного потока пула загрузки
+        download_ms - полное время загрузки одного изображения
+        host:<хост> - задержка ответа каждого basket-сервера
+    """
+
+    COUNTERS = (
+        "cache_hits", "downloads", "download_failures", "variants_derived",
+        "primary_success", "fanout", "fanout_success", "bytes", "blocked",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = {}
+        self._histograms: Dict[str, Histogram] = {}
+        self._hosts: Dict[str, Histogram] = {}
+        self.reset()
+
+    def inc(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = LATENCY_BUCKETS_MS):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(buckets)
+            histogram.observe(value)
+
+    def observe_host(self, host: str, latency_ms: float):
+        with self._lock:
+            histogram = self._hosts.get(host)
+            if histogram is None:
+                histogram = self._hosts[host] = Histogram(LATENCY_BUCKETS_MS)
+            histogram.observe(latency_ms)
+
+    def reset(self):
+        with self._lock:
+            self._counters = dict.fromkeys(self.COUNTERS, 0)
+            self._histograms = {}
+            self._hosts = {}
+
+    @staticmethod
+    def _ratio(part: int, whole: int) -> Optional[float]:
+        return round(part / whole, 3) if whole else None
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {name: h.to_dict() for name, h in self._histograms.items()}
+            hosts = {host: h.to_dict() for host, h in sorted(self._hosts.items())}
+
+        lookups = counters["cache_hits"] + counters["downloads"] + counters["download_failures"]
+        attempts = counters["primary_success"] + counters["fanout"]
+        return {
+            "counters": counters,
+            "ratios": {
+                # Доля запросов, обслуженных без сети
+                "cache_hit": self._ratio(counters["cache_hits"], lookups),
+                # Низкая доля при высоком fan-out - таблица basket устарела
+                "primary_success": self._ratio(counters["primary_success"], attempts),
+                "fanout": self._ratio(counters["fanout"], attempts),
+                "fanout_success": self._ratio(counters["fanout_success"], counters["fanout"]),
+            },
+            "histograms": histograms,
+            "hosts": hosts,
+        }
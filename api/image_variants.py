@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Локальное получение уменьшенных вариантов изображений
+С WB скачивается одна мастер-копия, остальные размеры
+масштабируются через Pillow в отдельных процессах
+"""
+import io
+import atexit
+import threading
+import concurrent.futures
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+# Максимальные габариты вариантов (ширина, высота), пропорции сохраняются
+VARIANT_BOXES: Dict[str, Tuple[int, int]] = {
+    "big": (516, 688),
+    "small": (246, 328),
+    "thumb": (100, 100),
+}
+
+WEBP_QUALITY = 82
+
+
+def render_variant(data: bytes, size: str) -> bytes:
+    """
+    Уменьшить изображение до габаритов варианта и закодировать в webp.
+    Функция верхнего уровня - выполняется в дочернем процессе.
+    """
+    box = VARIANT_BOXES[size]
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        img.thumbnail(box, Image.LANCZOS)
+        out = io.BytesIO()
+        img.save(out, format="WEBP", quality=WEBP_QUALITY, method=4)
+        return out.getvalue()
+
+
+class VariantRenderer:
+    """Пул процессов для масштабирования (создаётся при первом обращении)"""
+
+    def __init__(self, max_workers: int = 2):
+        self.max_workers = max_workers
+        self._pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_available(self) -> bool:
+        return HAS_PIL
+
+    def _get_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.max_workers)
+                atexit.register(self.shutdown)
+            return self._pool
+
+    def submit(self, data: bytes, size: str) -> concurrent.futures.Future:
+        return self.submit_call(render_variant, data, size)
+
+    def submit_call(self, fn: Callable, *args) -> concurrent.futures.Future:
+        """Выполнить функцию верхнего уровня в том же пуле (например, проверку файлов кэша)"""
+        return self._get_pool().submit(fn, *args)
+
+    def render(self, data: bytes, size: str, timeout: float = 30) -> bytes:
+        """Синхронно получить вариант (ожидая дочерний процесс)"""
+        try:
+            return self.submit(data, size).result(timeout=timeout)
+        except concurrent.futures.process.BrokenProcessPool:
+            # Пул мог упасть (например, при нехватке памяти) - пересоздаём
+            with self._lock:
+                self._pool = None
+            return self.submit(data, size).result(timeout=timeout)
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -4,16 +4,32 @@
 Получение изображений товаров по vendor_code (артикулу)
 С множественными fallback-источниками
 """
-import requests
+import asyncio
 import concurrent.futures
+import queue
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, List, Dict, Tuple
+from typing import Optional, List, Dict, Iterator, Tuple
+from urllib.parse import urlsplit
 import logging
 
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from config import IMAGE_CACHE_DIR
+from config import (
+    IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, IMAGE_HOT_CACHE_BYTES,
+    IMAGE_MASTER_SIZE, IMAGE_VARIANT_WORKERS,
+    WB_HTTP_CONNECTIONS, WB_HTTP_CONNECTIONS_PER_HOST,
+    WB_HOST_FAILURE_THRESHOLD, WB_HOST_OPEN_SECONDS,
+    WB_DNS_TTL, WB_KEEPALIVE_SECONDS, WB_BASKET_OVERRIDE
+)
+from api.async_fetcher import AsyncImageFetcher
+from api.host_health import HostHealthTable
+from api.image_cache import ImageCache, CacheEntry
+from api.image_metrics import ImageMetrics, PROBE_BUCKETS
+from api.image_variants import VariantRenderer, VARIANT_BOXES
 
 # Настройка логгера
 logger = logging.getLogger(__name__)
@@ -27,31 +43,77 @@ class WildberriesAPI:
         "Accept-Language": "ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7",
     }
 
+    # Через сколько секунд можно повторить загрузку после неудачи
+    FAILED_RETRY_AFTER = 600
+    # Общий таймаут поиска сервера перебором (сек)
+    FIND_TIMEOUT = 5
+    # Предельное время загрузки одного изображения с учётом перебора серверов (сек)
+    DOWNLOAD_TIMEOUT = 20
+    # Сколько артикулов помнить в таблице basket-хостов (LRU)
+    IMAGE_HOSTS_LIMIT = 10000
+
     # Базовые URL для изображений WB
     BASKET_HOSTS = [f"basket-{i:02d}.wbbasket.ru" for i in range(1, 33)]
     
     def __init__(self):
         self.cache_dir = IMAGE_CACHE_DIR
-        self.cache_dir.mkdir(parents=True, exist_ok=True)
-        self._failed_images = {}  # Кэш неудачных попыток
-
-        # Настройка сессии с пулом соединений для переиспользования TCP
-        self.session = requests.Session()
-        # Увеличиваем пул, чтобы хватило на check_executor (32 потока)
-        adapter = requests.adapters.HTTPAdapter(
-            pool_connections=50,
-            pool_maxsize=50,
-            max_retries=1
+        self.cache = ImageCache(self.cache_dir, IMAGE_CACHE_MAX_BYTES, hot_bytes=IMAGE_HOT_CACHE_BYTES)
+        # С WB качается только мастер-размер, остальные получаются локально
+        self.master_size = IMAGE_MASTER_SIZE
+        self.variants = VariantRenderer(IMAGE_VARIANT_WORKERS)
+        self._failed_images = {}  # Кэш неудачных попыток: (vendor_code, size) -> время
+        # Фоновые загрузки, поставленные через resolve_images: (vendor_code, size) -> Future
+        self._pending_downloads: Dict[Tuple[str, str], concurrent.futures.Future] = {}
+        self._pending_lock = threading.Lock()
+        # basket-хост, отдавший изображение №1: vendor_code -> host (для галереи без перебора)
+        self._image_hosts: "OrderedDict[str, str]" = OrderedDict()
+        self._hosts_lock = threading.Lock()
+
+        # Счётчики и гистограммы конвейера (кэш / сеть / перебор серверов)
+        self.metrics = ImageMetrics()
+
+        # Здоровье basket-серверов: деградировавшие хосты пропускаются
+        self.host_health = HostHealthTable(
+            failure_threshold=WB_HOST_FAILURE_THRESHOLD,
+            open_seconds=WB_HOST_OPEN_SECONDS,
+        )
+
+        # Все запросы к basket-серверам идут через один event loop
+        # с общим пулом соединений (лимит соединений на хост)
+        self.fetcher = AsyncImageFetcher(
+            headers=self.HEADERS,
+            connections=WB_HTTP_CONNECTIONS,
+            connections_per_host=WB_HTTP_CONNECTIONS_PER_HOST,
+            health=self.host_health,
+            dns_ttl=WB_DNS_TTL,
+            keepalive_timeout=WB_KEEPALIVE_SECONDS,
+            metrics=self.metrics,
         )
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
-        self.session.headers.update(self.HEADERS)
+        self.map_hosts(WB_BASKET_OVERRIDE)
 
-        # Executor for background downloads
+        # Потоки для фоновых задач (сами потоки только ждут результата от event loop)
         self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=8, thread_name_prefix="WB_Image_Download")
-        # Shared executor for checking URLs
-        self.check_executor = concurrent.futures.ThreadPoolExecutor(max_workers=32, thread_name_prefix="WB_URL_Check")
     
+    def map_hosts(self, base_url: Optional[str]):
+        """
+        Направить запросы к basket-серверам на другой адрес (локальный стенд):
+        https://basket-07.wbbasket.ru/vol1/... -> {base_url}/basket-07.wbbasket.ru/vol1/...
+
+        Args:
+            base_url: Адрес стенда или None - работать с настоящими серверами
+        """
+        if not base_url:
+            self.fetcher.url_rewrite = None
+            return
+        base = base_url.rstrip('/')
+
+        def rewrite(url: str) -> str:
+            parts = urlsplit(url)
+            return f"{base}/{parts.hostname}{parts.path}"
+
+        self.fetcher.url_rewrite = rewrite
+        logger.info(f"Запросы к basket-серверам направлены на {base}")
+
     @staticmethod
     def get_basket_number(vendor_code: str) -> int:
         """
@@ -176,46 +238,255 @@ class WildberriesAPI:
             for i in range(1, min(pics_count + 1, 11))
         ]
     
-    def get_cached_image_path(self, vendor_code: str, image_num: int = 1) -> Path:
+    def get_cached_image_path(self, vendor_code: str, image_num: int = 1,
+                              size: str = "small") -> Path:
         """Получить путь к кэшированному изображению"""
-        return self.cache_dir / f"{vendor_code}_{image_num}.webp"
+        return self.cache.path_for(vendor_code, image_num, size)
     
     def download_image_sync(self, vendor_code: str, image_num: int = 1,
-                             size: str = "small", force: bool = False) -> Tuple[Optional[Path], bool]:
+                             size: str = "small", force: bool = False,
+                             cancel: Optional[threading.Event] = None) -> Tuple[Optional[Path], bool]:
         """
         Синхронно скачать и закэшировать изображение товара
+
+        Args:
+            cancel: Флаг прерывания загрузки (фоновые задачи уступают канал пользователю)
+
+        Raises:
+            concurrent.futures.CancelledError: Загрузка прервана флагом cancel
         
         Returns:
             (Path, bool) - Путь к файлу (или None), и флаг "был ли скачан" (True) или взят из кэша (False)
         """
-        cache_path = self.get_cached_image_path(vendor_code, image_num)
-        
         # Проверяем кэш
-        if not force and cache_path.exists() and cache_path.stat().st_size > 0:
-            return cache_path, False
-        
-        # Ищем рабочий URL (с использованием User-Agent и перебором серверов)
-        url = self.find_working_image_url_sync(vendor_code, image_num, size)
-        
-        if not url:
-            # Fallback to calculated URL if check failed
-            url = self.get_image_url(vendor_code, image_num, size)
+        if not force:
+            entry = self.cache.get(vendor_code, image_num, size)
+            if entry:
+                self.metrics.inc("cache_hits")
+                return entry.path, False
 
+        # Немастерные размеры получаем из мастер-копии, без отдельной загрузки
+        if self._derives(size):
+            master_path, downloaded = self.download_image_sync(
+                vendor_code, image_num, self.master_size, force=force, cancel=cancel
+            )
+            if not master_path:
+                return None, False
+            entry = self.derive_variant(vendor_code, image_num, size)
+            if entry:
+                self.metrics.inc("variants_derived")
+                return entry.path, downloaded
+            # Не удалось уменьшить - качаем нужный размер напрямую
+
+        started = time.monotonic()
         try:
-            # Используем сессию и уменьшенный таймаут (5с вместо 15с)
-            response = self.session.get(url, timeout=5)
-            if response.status_code == 200:
-                cache_path.write_bytes(response.content)
-                return cache_path, True
-            else:
-                if response.status_code != 404:
-                    logger.warning(f"Ошибка загрузки {vendor_code} (Status {response.status_code}): {url}")
-        except Exception as e:
-            # Логируем ошибку соединения короче
-            logger.error(f"Исключение при загрузке {vendor_code}: {str(e).split('Caused by')[0]}")
-        
+            data = self.fetcher.run(self._download(vendor_code, image_num, size),
+                                    timeout=self.DOWNLOAD_TIMEOUT, cancel=cancel)
+        except concurrent.futures.TimeoutError:
+            logger.error(f"Превышено время загрузки {vendor_code}")
+            data = None
+        self.metrics.observe("download_ms", (time.monotonic() - started) * 1000)
+        if data:
+            self.metrics.inc("downloads")
+            entry = self.cache.put(vendor_code, image_num, size, data)
+            if size == self.master_size:
+                self._drop_variants(vendor_code, image_num)
+            return entry.path, True
+        self.metrics.inc("download_failures")
         return None, False
+
+    async def _download(self, vendor_code: str, image_num: int, size: str) -> Optional[bytes]:
+        """
+        Скачать изображение: сначала с расчётного basket-сервера,
+        при неудаче - с первого сервера, ответившего на HEAD-пробу
+        """
+        primary_url = self.get_image_url(vendor_code, image_num, size)
+        status, data = await self.fetcher.fetch(primary_url)
+        if status == 200:
+            self.metrics.inc("primary_success")
+            self._remember_host(vendor_code, image_num, primary_url)
+            return data
+
+        url = await self._find_fallback_url(vendor_code, image_num, size, exclude=primary_url)
+        if not url:
+            if status not in (None, 404):
+                logger.warning(f"Ошибка загрузки {vendor_code} (Status {status}): {primary_url}")
+            return None
+
+        status, data = await self.fetcher.fetch(url)
+        if status == 200:
+            self._remember_host(vendor_code, image_num, url)
+            return data
+        logger.warning(f"Ошибка загрузки {vendor_code} (Status {status}): {url}")
+        return None
     
+    def _derives(self, size: str) -> bool:
+        """Получается ли размер уменьшением мастер-копии"""
+        return (size != self.master_size and size in VARIANT_BOXES
+                and self.variants.is_available)
+
+    def _drop_variants(self, vendor_code: str, image_num: int):
+        """Мастер-копия перезаписана: полученные из прежней копии варианты устарели"""
+        for size in VARIANT_BOXES:
+            if size != self.master_size:
+                self.cache.remove(vendor_code, image_num, size)
+
+    def derive_variant(self, vendor_code: str, image_num: int, size: str) -> Optional[CacheEntry]:
+        """
+        Получить вариант размера из закэшированной мастер-копии
+        (масштабирование выполняется в пуле процессов)
+        """
+        if not self._derives(size):
+            return None
+        master = self.cache.get(vendor_code, image_num, self.master_size)
+        if not master:
+            return None
+        try:
+            data = self.variants.render(master.path.read_bytes(), size)
+            return self.cache.put(vendor_code, image_num, size, data)
+        except Exception as e:
+            logger.error(f"Не удалось получить вариант {size} для {vendor_code}: {e}")
+            return None
+
+    def cached_entry(self, vendor_code: str, image_num: int = 1,
+                     size: str = "small") -> Optional[CacheEntry]:
+        """
+        Запись кэша, из которой можно отдать нужный размер: сам вариант
+        или мастер-копия, если вариант будет получен при первом обращении
+        """
+        entry = self.cache.peek(vendor_code, image_num, size)
+        if entry is None and self._derives(size):
+            entry = self.cache.peek(vendor_code, image_num, self.master_size)
+        return entry
+
+    def url_version(self, vendor_code: str, image_num: int = 1,
+                    size: str = "small") -> Optional[str]:
+        """
+        Версия для URL изображения. У получаемых из мастер-копии размеров это
+        версия мастер-копии: варианты удаляются при её перезаписи, поэтому она
+        однозначно задаёт их содержимое, и ссылка одного размера с заменой
+        size остаётся верной для другого. None - изображения нет в кэше.
+        """
+        if self._derives(size):
+            master = self.cache.peek(vendor_code, image_num, self.master_size)
+            if master is not None:
+                return master.url_version
+        entry = self.cache.peek(vendor_code, image_num, size)
+        return entry.url_version if entry else None
+
+    def host_for(self, vendor_code: str) -> str:
+        """basket-хост, на который уйдёт загрузка артикула (известный или расчётный)"""
+        return (self._known_host(vendor_code)
+                or f"basket-{self.get_basket_number(vendor_code):02d}.wbbasket.ru")
+
+    def warm_up(self, vendor_codes: List[str], lookahead: int = 200):
+        """
+        Перед массовой загрузкой заранее разрешить DNS и открыть соединения
+        к хостам ближайших lookahead артикулов (в фоне, без ожидания)
+        """
+        host_counts: Dict[str, int] = {}
+        for vc in vendor_codes[:lookahead]:
+            host = self.host_for(str(vc))
+            host_counts[host] = host_counts.get(host, 0) + 1
+        self.fetcher.warmup_background(host_counts)
+
+    # ============== ГАЛЕРЕЯ ==============
+
+    def _remember_host(self, vendor_code: str, image_num: int, url: str):
+        if image_num != 1:
+            return
+        with self._hosts_lock:
+            self._image_hosts[vendor_code] = HostHealthTable.host_of(url)
+            self._image_hosts.move_to_end(vendor_code)
+            while len(self._image_hosts) > self.IMAGE_HOSTS_LIMIT:
+                self._image_hosts.popitem(last=False)
+
+    def _known_host(self, vendor_code: str) -> Optional[str]:
+        with self._hosts_lock:
+            host = self._image_hosts.get(vendor_code)
+            if host is not None:
+                self._image_hosts.move_to_end(vendor_code)
+            return host
+
+    def image_host(self, vendor_code: str) -> Optional[str]:
+        """
+        basket-хост изображений артикула: запомненный при загрузке №1,
+        иначе определяется один раз пробой изображения №1
+        """
+        host = self._known_host(vendor_code)
+        if host is None:
+            url = self.find_working_image_url_sync(vendor_code, 1, self.master_size)
+            if url:
+                self._remember_host(vendor_code, 1, url)
+                host = HostHealthTable.host_of(url)
+        return host
+
+    def _image_url_on_host(self, host: str, vendor_code: str, image_num: int, size: str) -> str:
+        vol, part = self.get_vol_part(vendor_code)
+        size_path = {"big": "c516x688", "small": "c246x328", "thumb": "c100x100"}.get(size, "c516x688")
+        return f"https://{host}/vol{vol}/part{part}/{vendor_code}/images/{size_path}/{image_num}.webp"
+
+    def iter_gallery(self, vendor_code: str, pics_count: int,
+                     size: str = "big") -> Iterator[Tuple[int, Optional[CacheEntry]]]:
+        """
+        Изображения 2..pics_count для галереи в порядке готовности.
+        Закэшированные отдаются сразу, остальные качаются параллельно
+        с хоста изображения №1 (без перебора серверов) в общий кэш.
+
+        Yields:
+            (номер изображения, запись кэша или None при неудаче); не дождавшиеся
+            таймаута номера тоже отдаются с None - клиент может запросить их снова
+        """
+        missing = []
+        for num in range(2, min(pics_count, 10) + 1):
+            entry = self.cached_entry(vendor_code, num, size)
+            if entry:
+                yield num, entry
+            else:
+                missing.append(num)
+        if not missing:
+            return
+
+        host = self.image_host(vendor_code)
+        if not host:
+            for num in missing:
+                yield num, None
+            return
+
+        # Немастерные размеры получаются из мастер-копии при отдаче
+        fetch_size = self.master_size if self._derives(size) else size
+        results: "queue.Queue[Tuple[int, Optional[bytes]]]" = queue.Queue()
+
+        async def fetch_one(num: int):
+            status, data = await self.fetcher.fetch(
+                self._image_url_on_host(host, vendor_code, num, fetch_size)
+            )
+            results.put((num, data if status == 200 else None))
+
+        async def fetch_all():
+            await asyncio.gather(*(fetch_one(num) for num in missing))
+
+        future = asyncio.run_coroutine_threadsafe(fetch_all(), self.fetcher.loop)
+        deadline = time.monotonic() + self.DOWNLOAD_TIMEOUT
+        unresolved = set(missing)
+        try:
+            while unresolved:
+                try:
+                    num, data = results.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                unresolved.discard(num)
+                entry = None
+                if data:
+                    entry = self.cache.put(vendor_code, num, fetch_size, data)
+                    if fetch_size == self.master_size:
+                        self._drop_variants(vendor_code, num)
+                yield num, entry
+            for num in sorted(unresolved):
+                yield num, None
+        finally:
+            future.cancel()
+
     def queue_image_download(self, vendor_code: str, image_num: int = 1, size: str = "small"):
         """
         Поставить задачу на загрузку изображения в фоне.
@@ -223,6 +494,82 @@ class WildberriesAPI:
         """
         pass
 
+    def resolve_images(self, vendor_codes: List[str], size: str = "small",
+                       wait: float = 0) -> Dict[str, Dict[str, Optional[str]]]:
+        """
+        Пакетное разрешение изображений для списка артикулов.
+        Закэшированные отдаются сразу, отсутствующие ставятся в фоновую
+        загрузку (одна задача на артикул, повторные вызовы её не дублируют).
+
+        Args:
+            vendor_codes: Артикулы
+            size: Размер изображения
+            wait: Сколько секунд ждать завершения хотя бы одной из
+                  поставленных загрузок перед ответом (0 - не ждать)
+
+        Returns:
+            {vendor_code: {"status": "cached"|"pending"|"missing", "path": str|None}}
+        """
+        codes = list(dict.fromkeys(str(vc) for vc in vendor_codes if vc))
+        pending = [f for f in (self._queue_resolve(vc, size) for vc in codes) if f]
+
+        if wait > 0 and pending:
+            concurrent.futures.wait(pending, timeout=wait,
+                                    return_when=concurrent.futures.FIRST_COMPLETED)
+
+        return {vc: self._resolve_status(vc, size) for vc in codes}
+
+    def _queue_resolve(self, vendor_code: str, size: str) -> Optional[concurrent.futures.Future]:
+        """Поставить артикул в фоновую загрузку, если его нет в кэше"""
+        if self.cached_entry(vendor_code, 1, size):
+            return None
+        key = (vendor_code, size)
+        with self._pending_lock:
+            future = self._pending_downloads.get(key)
+            if future is not None:
+                return future
+            failed_at = self._failed_images.get(key)
+            if failed_at and time.time() - failed_at < self.FAILED_RETRY_AFTER:
+                return None
+            future = self._submit(self._resolve_task, vendor_code, size)
+            self._pending_downloads[key] = future
+            return future
+
+    def _submit(self, fn, *args) -> concurrent.futures.Future:
+        """Поставить задачу в пул загрузки с учётом времени ожидания в очереди"""
+        queued_at = time.monotonic()
+
+        def task():
+            self.metrics.observe("queue_wait_ms", (time.monotonic() - queued_at) * 1000)
+            return fn(*args)
+
+        return self.executor.submit(task)
+
+    def _resolve_task(self, vendor_code: str, size: str):
+        key = (vendor_code, size)
+        try:
+            path, _ = self.download_image_sync(vendor_code, 1, size)
+            with self._pending_lock:
+                if path:
+                    self._failed_images.pop(key, None)
+                else:
+                    self._failed_images[key] = time.time()
+        except Exception as e:
+            logger.error(f"Ошибка фоновой загрузки {vendor_code}: {e}")
+            with self._pending_lock:
+                self._failed_images[key] = time.time()
+        finally:
+            with self._pending_lock:
+                self._pending_downloads.pop(key, None)
+
+    def _resolve_status(self, vendor_code: str, size: str) -> Dict[str, Optional[str]]:
+        entry = self.cached_entry(vendor_code, 1, size)
+        if entry:
+            return {"status": "cached", "path": str(entry.path)}
+        if (vendor_code, size) in self._pending_downloads:
+            return {"status": "pending", "path": None}
+        return {"status": "missing", "path": None}
+
     def prefetch_images(self, vendor_codes: List[str],
                                size: str = "small") -> Dict[str, Optional[Path]]:
         """
@@ -236,7 +583,7 @@ class WildberriesAPI:
         
         # Запускаем задачи
         for vc in vendor_codes:
-            futures[vc] = self.executor.submit(self.download_image_sync, vc, 1, size)
+            futures[vc] = self._submit(self.download_image_sync, vc, 1, size)
 
         # Собираем результаты
         for vc, future in futures.items():
@@ -248,13 +595,16 @@ class WildberriesAPI:
 
         return results
     
-    def clear_cache(self):
-        """Очистить кэш изображений"""
-        for file in self.cache_dir.glob("*.webp"):
-            try:
-                file.unlink()
-            except OSError:
-                pass
+    def clear_cache(self, vendor_code: Optional[str] = None) -> int:
+        """
+        Очистить кэш изображений (весь или только указанного артикула)
+
+        Returns:
+            Количество удалённых файлов
+        """
+        if vendor_code:
+            return self.cache.remove(vendor_code)
+        return self.cache.clear()
     
     def get_all_possible_image_urls(self, vendor_code: str, image_num: int = 1,
                                      size: str = "small") -> List[str]:
@@ -294,56 +644,40 @@ class WildberriesAPI:
         Returns:
             Рабочий URL или None
         """
-        # Сначала пробуем основной URL
-        primary_url = self.get_image_url(vendor_code, image_num, size)
-        
         try:
-            # Используем сессию
-            response = self.session.head(primary_url, timeout=2, allow_redirects=True)
-            if response.status_code == 200:
-                return primary_url
-        except Exception:
-            pass
-        
-        # Если основной не работает, пробуем другие серверы параллельно
-        all_urls = self.get_all_possible_image_urls(vendor_code, image_num, size)
-        urls_to_check = [url for url in all_urls if url != primary_url]
-        
-        def check_url(url):
-            try:
-                # Используем сессию
-                response = self.session.head(url, timeout=2, allow_redirects=True)
-                if response.status_code == 200:
-                    return url
-            except Exception:
-                pass
+            return self.fetcher.run(
+                self._find_working_url(vendor_code, image_num, size),
+                timeout=self.DOWNLOAD_TIMEOUT
+            )
+        except concurrent.futures.TimeoutError:
             return None
-        
-        # Проверяем параллельно (максимум 10 потоков)
-        try:
-            # Используем общий пул
-            futures = {self.check_executor.submit(check_url, url): url for url in urls_to_check}
-            try:
-                for future in concurrent.futures.as_completed(futures, timeout=5):
-                    try:
-                        result = future.result(timeout=1)
-                        if result:
-                            # Отменяем остальные, чтобы не грузить пул
-                            for f in futures:
-                                f.cancel()
-                            return result
-                    except Exception:
-                        continue
-            except concurrent.futures.TimeoutError:
-                pass
-            finally:
-                # В любом случае стараемся отменить хвосты
-                for f in futures:
-                    f.cancel()
-        except Exception:
-            pass
-        
-        return None
+
+    async def _find_working_url(self, vendor_code: str, image_num: int, size: str) -> Optional[str]:
+        # Сначала пробуем основной URL
+        primary_url = self.get_image_url(vendor_code, image_num, size)
+        if await self.fetcher.head(primary_url) == 200:
+            self.metrics.inc("primary_success")
+            return primary_url
+        return await self._find_fallback_url(vendor_code, image_num, size, exclude=primary_url)
+
+    async def _find_fallback_url(self, vendor_code: str, image_num: int, size: str,
+                                 exclude: Optional[str] = None) -> Optional[str]:
+        """
+        Опросить остальные basket-серверы параллельно, первый ответивший 200 - рабочий.
+        Отключённые хосты не опрашиваются, здоровые и быстрые опрашиваются первыми.
+        """
+        by_host = {
+            HostHealthTable.host_of(url): url
+            for url in self.get_all_possible_image_urls(vendor_code, image_num, size)
+            if url != exclude
+        }
+        urls = [by_host[host] for host in self.host_health.rank(by_host)]
+        self.metrics.inc("fanout")
+        self.metrics.observe("probes_per_find", len(urls), PROBE_BUCKETS)
+        url = await self.fetcher.probe_first(urls, timeout=self.FIND_TIMEOUT)
+        if url:
+            self.metrics.inc("fanout_success")
+        return url
 
 
 # Глобальный экземпляр API клиента
@@ -21,15 +21,78 @@ CUSTOM_PHOTOS_DIR = CUSTOM_DATA_DIR / "photos"
 
 # Кэш изображений товаров
 IMAGE_CACHE_DIR = BASE_DIR / "cache" / "images"
+# Состояние заданий массовой загрузки изображений (переживает перезапуск)
+IMAGE_JOBS_DIR = BASE_DIR / "cache" / "jobs"
+# Лимит объёма кэша изображений (при превышении вытесняются давно не открывавшиеся)
+IMAGE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+# Объём содержимого часто запрашиваемых картинок, который держится в памяти
+IMAGE_HOT_CACHE_BYTES = 64 * 1024 ** 2
+# Размер, который скачивается с WB; остальные (small, thumb) уменьшаются локально
+IMAGE_MASTER_SIZE = "big"
+# Процессов для масштабирования изображений
+IMAGE_VARIANT_WORKERS = 2
+# Проверка целостности кэша: битые файлы переносятся в карантин; период проверки (ч)
+IMAGE_QUARANTINE_DIR = BASE_DIR / "cache" / "quarantine"
+IMAGE_INTEGRITY_INTERVAL_HOURS = 6
+# Фоновая предзагрузка изображений в простое: окна [(час начала, час конца)],
+# простой без действий в интерфейсе вне окон (мин), параллельность и бюджет канала
+IMAGE_PREFETCH_ENABLED = True
+IMAGE_PREFETCH_WINDOWS = [(22, 7)]
+IMAGE_PREFETCH_IDLE_MINUTES = 20
+IMAGE_PREFETCH_CONCURRENCY = 2
+IMAGE_PREFETCH_BYTES_PER_SEC = 256 * 1024
 
 # Настройки приложения
-APP_HOST = "127.0.0.1"
-APP_PORT = 5050
+# Адрес и порт сервера (WB_HOST / WB_PORT или --host / --port при запуске).
+# Без явного адреса development слушает только этот компьютер, а production -
+# все интерфейсы, чтобы подключались терминалы ПВЗ в локальной сети
+APP_HOST = os.environ.get("WB_HOST") or None
+APP_PORT = int(os.environ.get("WB_PORT") or 5050)
+DEFAULT_HOSTS = {"development": "127.0.0.1", "production": "0.0.0.0"}
 DEBUG_MODE = True
+# Режим сервера: development - встроенный сервер Flask с автоперезагрузкой,
+# production - многопоточный WSGI-сервер waitress (несколько терминалов ПВЗ).
+# Переопределяется переменной WB_SERVER_MODE или ключом --mode при запуске
+SERVER_MODE = os.environ.get("WB_SERVER_MODE", "development")
+# Рабочие потоки waitress (каждый открытый поток событий SSE занимает один)
+SERVER_THREADS = 32
+# Потоки событий SSE (/api/events): вкладка держит рабочий поток waitress всё время,
+# пока открыт поток, и сразу занимает его снова при переподключении раз в 5 минут.
+# Под SSE отдаётся не больше четверти потоков, остальные вкладки обновляются опросом
+EVENTS_MAX_SUBSCRIBERS = max(2, SERVER_THREADS // 4)
+# Максимум одновременных соединений / таймаут простаивающего keep-alive (сек)
+SERVER_CONNECTION_LIMIT = 200
+SERVER_KEEPALIVE_SECONDS = 120
+# Очередь соединений, ожидающих приёма (listen backlog)
+SERVER_BACKLOG = 128
+# Сжатие ответов (gzip, brotli при наличии пакета): минимальный размер тела (байт)
+# и каталог для статики, сжатой один раз при запуске
+COMPRESSION_MIN_BYTES = 1024
+STATIC_PRECOMPRESSED_DIR = BASE_DIR / "cache" / "static"
+# Замеры запросов: порог медленного SQL-запроса (мс) и журнал медленных
+# запросов с ротацией (WB_TIMING_LOG=путь к файлу; по умолчанию только в памяти)
+SLOW_QUERY_MS = 100
+TIMING_LOG_FILE = os.environ.get("WB_TIMING_LOG") or None
+# Служебные эндпоинты (профилировщик): доступны с этого компьютера или
+# по заголовку X-Admin-Token=WB_ADMIN_TOKEN; длительность замера - не больше (сек)
+ADMIN_TOKEN = os.environ.get("WB_ADMIN_TOKEN") or None
+PROFILE_MAX_SECONDS = 60
 
 # Wildberries API для получения изображений
 WB_IMAGE_BASE_URL = "https://basket-{basket}.wbbasket.ru/vol{vol}/part{part}/{vendor_code}/images/c516x688/{num}.webp"
 WB_SMALL_IMAGE_URL = "https://basket-{basket}.wbbasket.ru/vol{vol}/part{part}/{vendor_code}/images/c246x328/{num}.webp"
+# Лимиты соединений к basket-серверам (всего / на один хост)
+WB_HTTP_CONNECTIONS = 64
+WB_HTTP_CONNECTIONS_PER_HOST = 6
+# Circuit breaker basket-серверов: неудач подряд до отключения / пауза до пробы (сек)
+WB_HOST_FAILURE_THRESHOLD = 3
+WB_HOST_OPEN_SECONDS = 30
+# Кэш DNS-ответов basket-хостов (сек) и время жизни простаивающих keep-alive соединений (сек)
+WB_DNS_TTL = 300
+WB_KEEPALIVE_SECONDS = 60
+# Адрес локального стенда вместо basket-серверов (офлайн-замеры), например
+# http://127.0.0.1:8800 - запросы уходят на {адрес}/{basket-хост}/{путь}
+WB_BASKET_OVERRIDE = os.environ.get("WB_BASKET_OVERRIDE") or None
 
 # Статусы товаров
 GOODS_STATUSES = {
@@ -7,19 +7,94 @@ import sqlite3
 import json
 import re
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Sequence, Callable
 from pathlib import Path
 from contextlib import contextmanager
+from contextvars import ContextVar
 import threading
+import time
 
 import sys
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from config import DATABASE_PATH, CUSTOM_BUYERS_FILE
-from models import Goods, GoodsInfo, Buyer, DeliveredOrder, SurplusGoods
+from models import Goods, GoodsInfo, Buyer, DeliveredOrder, SurplusGoods, BuyerSnapshot
 
 TZ_PATTERN = re.compile(r"[+-]\d{2}:?\d{2}$")
 
+# Общий снимок БД текущего пакета запросов (см. DatabaseManager.snapshot)
+_snapshot: ContextVar[Optional["_SnapshotConnection"]] = ContextVar('db_snapshot', default=None)
+
+
+class _BufferedCursor:
+    """Результат запроса, прочитанный целиком (курсор не держит общее подключение)"""
+
+    def __init__(self, rows: list, rowcount: int):
+        self._rows = rows
+        self._pos = 0
+        self.rowcount = rowcount
+
+    def fetchall(self) -> list:
+        rows = self._rows[self._pos:]
+        self._pos = len(self._rows)
+        return rows
+
+    def fetchone(self):
+        if self._pos >= len(self._rows):
+            return None
+        self._pos += 1
+        return self._rows[self._pos - 1]
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+class _ObservedConnection:
+    """
+    Подключение с замером запросов: результат дочитывается сразу,
+    чтобы в замер попало всё время SQLite, а не только до первой строки.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, observer: Callable):
+        self._conn = conn
+        self._observer = observer
+
+    def execute(self, sql: str, params=()):
+        started = time.perf_counter()
+        cursor = self._conn.execute(sql, params)
+        rows = cursor.fetchall()
+        self._observer(sql, params, time.perf_counter() - started)
+        return _BufferedCursor(rows, cursor.rowcount)
+
+    def commit(self):
+        self._conn.commit()
+
+
+class _SnapshotConnection:
+    """
+    Подключение только для чтения с открытой транзакцией, общее для потоков пакета.
+    Запросы выполняются по очереди под блокировкой и сразу дочитываются.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, observer: Optional[Callable] = None):
+        self._conn = conn
+        self._lock = threading.Lock()
+        self._observer = observer
+
+    def execute(self, sql: str, params=()):
+        with self._lock:
+            started = time.perf_counter()
+            cursor = self._conn.execute(sql, params)
+            rows = cursor.fetchall()
+            elapsed = time.perf_counter() - started
+        if self._observer:
+            self._observer(sql, params, elapsed)
+        return _BufferedCursor(rows, cursor.rowcount)
+
+    def commit(self):
+        # Снимок только для чтения: фиксировать нечего
+        pass
+
 
 class DatabaseManager:
     """Менеджер для работы с SQLite базой данных ПВЗ"""
@@ -40,20 +115,106 @@ class DatabaseManager:
         if self._initialized:
             return
         self._db_path = DATABASE_PATH
+        # Отдельное постоянное подключение для PRAGMA data_version:
+        # значение сравнимо только в пределах одного подключения
+        self._version_conn: Optional[sqlite3.Connection] = None
+        self._version_lock = threading.Lock()
         self._custom_data: Dict[str, Dict] = {}
+        # Колонки таблиц (для проекции SELECT)
+        self._table_columns: Dict[str, set] = {}
+        # Наблюдатель запросов: observer(sql, params, секунды) - замеры и журнал медленных запросов
+        self.query_observer: Optional[Callable] = None
+        # Счётчик изменений кастомных данных (для версионирования ответов API)
+        self.custom_data_version = 0
         self._load_custom_data()
         self._initialized = True
     
     @contextmanager
     def get_connection(self):
         """Контекстный менеджер для подключения к БД"""
+        shared = _snapshot.get()
+        if shared is not None:
+            yield shared
+            return
         conn = sqlite3.connect(str(self._db_path), timeout=10)
         conn.row_factory = sqlite3.Row
         try:
-            yield conn
+            yield _ObservedConnection(conn, self.query_observer) if self.query_observer else conn
         finally:
             conn.close()
     
+    @contextmanager
+    def snapshot(self):
+        """
+        Общий снимок БД для нескольких запросов.
+
+        Внутри блока (и в потоках, запущенных с копией контекста) get_connection
+        отдаёт одно подключение только для чтения с открытой транзакцией:
+        все запросы видят одно состояние БД, даже если WB ПВЗ пишет в неё параллельно.
+        Снимок держится недолго - пока выполняется пакет запросов.
+        """
+        try:
+            conn = sqlite3.connect(f"file:{self._db_path}?mode=ro", uri=True, timeout=10,
+                                   check_same_thread=False, isolation_level=None)
+        except sqlite3.Error:
+            # БД недоступна - запросы пойдут через обычные подключения и вернут свои ошибки
+            yield
+            return
+        conn.row_factory = sqlite3.Row
+        token = None
+        try:
+            conn.execute("BEGIN")
+            # Снимок фиксируется первым чтением
+            conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            token = _snapshot.set(_SnapshotConnection(conn, self.query_observer))
+        except sqlite3.Error:
+            pass
+        try:
+            yield
+        finally:
+            if token is not None:
+                _snapshot.reset(token)
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+            conn.close()
+    
+    def explain(self, sql: str, params=()) -> List[str]:
+        """План выполнения запроса (EXPLAIN QUERY PLAN) - для журнала медленных запросов"""
+        conn = sqlite3.connect(f"file:{self._db_path}?mode=ro", uri=True, timeout=10)
+        try:
+            return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
+        finally:
+            conn.close()
+    
+    def get_data_version(self) -> int:
+        """
+        Маркер изменений БД: меняется, когда другое подключение
+        (WB ПВЗ или этот сервер) зафиксировало транзакцию. Дешёвый запрос без чтения таблиц.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = sqlite3.connect(str(self._db_path), timeout=10,
+                                                     check_same_thread=False)
+            return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+    
+    def _select(self, conn: sqlite3.Connection, table: str,
+                columns: Optional[Sequence[str]] = None) -> str:
+        """
+        Список колонок для SELECT по проекции полей API.
+        Берутся только существующие в таблице колонки: имена из запроса
+        в SQL как есть не попадают, а колонок goods_on_way меньше, чем goods_in_pick_point.
+        """
+        if not columns:
+            return '*'
+        available = self._table_columns.get(table)
+        if available is None:
+            available = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            self._table_columns[table] = available
+        selected = [c for c in columns if c in available]
+        return ', '.join(selected) if selected else '*'
+    
     def _load_custom_data(self):
         """Загрузка кастомных данных покупателей"""
         if CUSTOM_BUYERS_FILE.exists():
@@ -70,68 +231,95 @@ class DatabaseManager:
         CUSTOM_BUYERS_FILE.parent.mkdir(parents=True, exist_ok=True)
         with open(CUSTOM_BUYERS_FILE, 'w', encoding='utf-8') as f:
             json.dump(self._custom_data, f, ensure_ascii=False, indent=2)
+        self.custom_data_version += 1
     
     # ============== ТОВАРЫ НА ПВЗ (goods_in_pick_point) ==============
     
-    def get_goods_at_pickup(self, limit: int = 100, offset: int = 0) -> List[Goods]:
+    def get_goods_at_pickup(self, limit: int = 100, offset: int = 0,
+                            columns: Optional[Sequence[str]] = None) -> List[Goods]:
         """Получить товары на ПВЗ"""
         query = """
-            SELECT * FROM goods_in_pick_point 
+            SELECT {select} FROM goods_in_pick_point 
             ORDER BY priority_order DESC, cell 
             LIMIT ? OFFSET ?
         """
         with self.get_connection() as conn:
-            cursor = conn.execute(query, (limit, offset))
+            select = self._select(conn, 'goods_in_pick_point', columns)
+            cursor = conn.execute(query.format(select=select), (limit, offset))
             return [self._row_to_goods(row, is_on_way=False) for row in cursor.fetchall()]
     
-    def search_goods_by_barcode(self, barcode: str) -> List[Goods]:
-        """Поиск товаров по ШК (scanned_code) на ПВЗ и в пути"""
+    def search_goods_by_barcode(self, barcode: str,
+                                columns: Optional[Sequence[str]] = None,
+                                limit: int = -1) -> List[Goods]:
+        """Поиск товаров по ШК (scanned_code) на ПВЗ и в пути (limit=-1 - без ограничения)"""
         results = []
         
         # Поиск на ПВЗ
         query_pickup = """
-            SELECT * FROM goods_in_pick_point 
+            SELECT {select} FROM goods_in_pick_point 
             WHERE scanned_code LIKE ? OR sticker_code LIKE ? OR barcode LIKE ?
+            LIMIT ?
         """
         with self.get_connection() as conn:
-            cursor = conn.execute(query_pickup, (f"%{barcode}%", f"%{barcode}%", f"%{barcode}%"))
+            select = self._select(conn, 'goods_in_pick_point', columns)
+            cursor = conn.execute(query_pickup.format(select=select),
+                                  (f"%{barcode}%", f"%{barcode}%", f"%{barcode}%", limit))
             results.extend([self._row_to_goods(row, is_on_way=False) for row in cursor.fetchall()])
         
+        remaining = limit - len(results) if limit >= 0 else -1
+        if remaining == 0:
+            return results
+        
         # Поиск в пути (goods_on_way использует shk_code и sticker_code вместо scanned_code)
         query_onway = """
-            SELECT * FROM goods_on_way 
+            SELECT {select} FROM goods_on_way 
             WHERE CAST(shk_code AS TEXT) LIKE ? OR CAST(sticker_code AS TEXT) LIKE ? OR CAST(barcode AS TEXT) LIKE ?
+            LIMIT ?
         """
         with self.get_connection() as conn:
-            cursor = conn.execute(query_onway, (f"%{barcode}%", f"%{barcode}%", f"%{barcode}%"))
+            select = self._select(conn, 'goods_on_way', columns)
+            cursor = conn.execute(query_onway.format(select=select),
+                                  (f"%{barcode}%", f"%{barcode}%", f"%{barcode}%", remaining))
             results.extend([self._row_to_goods(row, is_on_way=True) for row in cursor.fetchall()])
         
         return results
     
-    def search_goods_by_name(self, name: str) -> List[Goods]:
-        """Поиск товаров по названию или бренду"""
+    def search_goods_by_name(self, name: str,
+                             columns: Optional[Sequence[str]] = None,
+                             limit: int = -1) -> List[Goods]:
+        """Поиск товаров по названию или бренду (limit=-1 - без ограничения)"""
         results = []
         
         # Поиск на ПВЗ
         query_pickup = """
-            SELECT * FROM goods_in_pick_point 
+            SELECT {select} FROM goods_in_pick_point 
             WHERE json_extract(info, '$.name') LIKE ? 
                OR json_extract(info, '$.brand') LIKE ?
                OR json_extract(info, '$.subject_name') LIKE ?
+            LIMIT ?
         """
         with self.get_connection() as conn:
-            cursor = conn.execute(query_pickup, (f"%{name}%", f"%{name}%", f"%{name}%"))
+            select = self._select(conn, 'goods_in_pick_point', columns)
+            cursor = conn.execute(query_pickup.format(select=select),
+                                  (f"%{name}%", f"%{name}%", f"%{name}%", limit))
             results.extend([self._row_to_goods(row, is_on_way=False) for row in cursor.fetchall()])
         
+        remaining = limit - len(results) if limit >= 0 else -1
+        if remaining == 0:
+            return results
+        
         # Поиск в пути
         query_onway = """
-            SELECT * FROM goods_on_way 
+            SELECT {select} FROM goods_on_way 
             WHERE json_extract(info, '$.name') LIKE ? 
                OR json_extract(info, '$.brand') LIKE ?
                OR json_extract(info, '$.subject_name') LIKE ?
+            LIMIT ?
         """
         with self.get_connection() as conn:
-            cursor = conn.execute(query_onway, (f"%{name}%", f"%{name}%", f"%{name}%"))
+            select = self._select(conn, 'goods_on_way', columns)
+            cursor = conn.execute(query_onway.format(select=select),
+                                  (f"%{name}%", f"%{name}%", f"%{name}%", remaining))
             results.extend([self._row_to_goods(row, is_on_way=True) for row in cursor.fetchall()])
         
         return results
@@ -179,42 +367,48 @@ class DatabaseManager:
             cursor = conn.execute(query, (buyer_sid,))
             return [self._row_to_goods(row, is_on_way=True) for row in cursor.fetchall()]
     
-    def get_goods_by_status(self, status: str) -> List[Goods]:
+    def get_goods_by_status(self, status: str,
+                            columns: Optional[Sequence[str]] = None) -> List[Goods]:
         """Получить товары по статусу"""
         query = """
-            SELECT * FROM goods_in_pick_point 
+            SELECT {select} FROM goods_in_pick_point 
             WHERE status = ?
             ORDER BY priority_order DESC
         """
         with self.get_connection() as conn:
-            cursor = conn.execute(query, (status,))
+            select = self._select(conn, 'goods_in_pick_point', columns)
+            cursor = conn.execute(query.format(select=select), (status,))
             return [self._row_to_goods(row, is_on_way=False) for row in cursor.fetchall()]
     
-    def get_goods_by_cell(self, cell: str) -> List[Goods]:
+    def get_goods_by_cell(self, cell: str,
+                          columns: Optional[Sequence[str]] = None) -> List[Goods]:
         """Получить товары в ячейке"""
         query = """
-            SELECT * FROM goods_in_pick_point 
+            SELECT {select} FROM goods_in_pick_point 
             WHERE cell = ?
             ORDER BY priority_order DESC
         """
         with self.get_connection() as conn:
-            cursor = conn.execute(query, (cell,))
+            select = self._select(conn, 'goods_in_pick_point', columns)
+            cursor = conn.execute(query.format(select=select), (cell,))
             return [self._row_to_goods(row, is_on_way=False) for row in cursor.fetchall()]
     
     # ============== ТОВАРЫ В ПУТИ (goods_on_way) ==============
     
-    def get_goods_on_way(self, limit: int = 100, offset: int = 0) -> List[Goods]:
+    def get_goods_on_way(self, limit: int = 100, offset: int = 0,
+                         columns: Optional[Sequence[str]] = None) -> List[Goods]:
         """Получить товары в пути на ПВЗ (только за последние 30 дней, исключая отклонённые)"""
         # status_updated - это дата в формате ISO (2025-07-03T04:06:19Z)
         query = """
-            SELECT * FROM goods_on_way 
+            SELECT {select} FROM goods_on_way 
             WHERE date(substr(status_updated, 1, 10)) >= date('now', '-30 days')
               AND status != 'GOODS_DECLINED'
             ORDER BY buyer_sid
             LIMIT ? OFFSET ?
         """
         with self.get_connection() as conn:
-            cursor = conn.execute(query, (limit, offset))
+            select = self._select(conn, 'goods_on_way', columns)
+            cursor = conn.execute(query.format(select=select), (limit, offset))
             return [self._row_to_goods(row, is_on_way=True) for row in cursor.fetchall()]
     
     def count_goods_on_way(self) -> int:
@@ -352,7 +546,7 @@ class DatabaseManager:
                 return buyer
         return None
     
-    def search_buyers(self, query_str: str) -> List[Buyer]:
+    def search_buyers(self, query_str: str, limit: int = 50) -> List[Buyer]:
         """Поиск покупателей по телефону, имени или user_sid"""
         query = """
             SELECT b.*, bwc.cell, bwc.status_updated as cell_updated
@@ -361,11 +555,11 @@ class DatabaseManager:
             WHERE CAST(b.mobile AS TEXT) LIKE ? 
                OR b.name LIKE ? 
                OR b.user_sid LIKE ?
-            LIMIT 50
+            LIMIT ?
         """
         search_pattern = f"%{query_str}%"
         with self.get_connection() as conn:
-            cursor = conn.execute(query, (search_pattern, search_pattern, search_pattern))
+            cursor = conn.execute(query, (search_pattern, search_pattern, search_pattern, limit))
             buyers = [self._row_to_buyer(row) for row in cursor.fetchall()]
         
         # Дополнительно ищем по custom_name
@@ -379,7 +573,9 @@ class DatabaseManager:
                     if buyer:
                         buyers.append(buyer)
         
-        return buyers[:50]
+        # Кастомные имена дополняют выдачу, но не сверх limit: иначе обрезанный
+        # набор неотличим от полного (см. RefinementCache)
+        return buyers[:limit] if limit >= 0 else buyers
     
     def update_buyer_custom_data(self, user_sid: str, 
                                   custom_name: str = None,
@@ -401,7 +597,7 @@ class DatabaseManager:
     
     # ============== ИСТОРИЯ ДОСТАВОК (delivered_goods) ==============
     
-    def search_delivered_goods(self, barcode: str) -> List[Dict]:
+    def search_delivered_goods(self, barcode: str, limit: int = 100) -> List[Dict]:
         """Поиск в истории доставок по ШК или goods_uid с полной информацией о товаре"""
         # Основной запрос с JOIN для получения всей информации
         query = """
@@ -415,7 +611,8 @@ class DatabaseManager:
                 g.info,
                 g.price,
                 g.price_with_sale,
-                g.buyer_sid
+                g.buyer_sid,
+                g.shk_code
             FROM delivered_goods d
             LEFT JOIN goods_in_pick_point g ON d.goods_uid = g.item_uid
             WHERE d.goods_uid LIKE ? 
@@ -423,11 +620,11 @@ class DatabaseManager:
                OR g.scanned_code LIKE ? 
                OR CAST(g.shk_code AS TEXT) LIKE ?
             ORDER BY d.delivery_unix_timestamp DESC
-            LIMIT 100
+            LIMIT ?
         """
         
         with self.get_connection() as conn:
-            cursor = conn.execute(query, (f"%{barcode}%", f"%{barcode}%", f"%{barcode}%", f"%{barcode}%"))
+            cursor = conn.execute(query, (f"%{barcode}%", f"%{barcode}%", f"%{barcode}%", f"%{barcode}%", limit))
             results = []
             for row in cursor.fetchall():
                 item = dict(row)
@@ -582,6 +779,30 @@ class DatabaseManager:
             cursor = conn.execute(query)
             return [row[0] for row in cursor.fetchall()]
     
+    def get_prefetch_vendor_codes(self, limit: int = 2000) -> List[str]:
+        """
+        Артикулы для фоновой предзагрузки изображений в порядке важности:
+        сначала товары, готовые к выдаче, затем товары в пути
+        (недавно обновлённые - ближе к прибытию - раньше)
+        """
+        query = """
+            SELECT vendor_code FROM (
+                SELECT vendor_code, 0 AS prio, '' AS updated FROM goods_in_pick_point
+                WHERE status = 'GOODS_READY' AND vendor_code IS NOT NULL AND vendor_code != ''
+                UNION ALL
+                SELECT vendor_code, 1 AS prio, status_updated AS updated FROM goods_on_way
+                WHERE date(substr(status_updated, 1, 10)) >= date('now', '-30 days')
+                  AND status != 'GOODS_DECLINED'
+                  AND vendor_code IS NOT NULL AND vendor_code != ''
+            )
+            GROUP BY vendor_code
+            ORDER BY MIN(prio), MAX(updated) DESC
+            LIMIT ?
+        """
+        with self.get_connection() as conn:
+            cursor = conn.execute(query, (limit,))
+            return [str(row[0]) for row in cursor.fetchall()]
+    
     def get_delivered_goods(self, limit: int = 100) -> List[Dict]:
         """Получить список выданных товаров с полной информацией"""
         query = """
@@ -663,6 +884,99 @@ class DatabaseManager:
                 results.append(item)
             return results
     
+    # ============== ПРОФИЛЬ ПОКУПАТЕЛЯ ==============
+    
+    # Поля товара, которые попадают в историю выдачи
+    _DELIVERED_GOODS_COLUMNS = ('scanned_code', 'vendor_code', 'info', 'price', 'price_with_sale')
+    
+    def get_buyer_snapshot(self, user_sid: str, delivered_limit: int = 100) -> BuyerSnapshot:
+        """
+        Все данные профиля покупателя за одно подключение.
+        Каждая таблица читается один раз, строки раскладываются на
+        готовые к выдаче / в пути / все / выданные в памяти - с тем же
+        составом и порядком, что у get_goods_by_buyer, get_goods_on_way_by_buyer,
+        get_all_goods_by_buyer и get_buyer_delivered_goods.
+        delivered_limit=0 - без истории выдачи.
+        """
+        buyer_query = """
+            SELECT b.*, bwc.cell, bwc.status_updated as cell_updated
+            FROM buyers b
+            LEFT JOIN buyers_with_cells bwc ON b.user_sid = bwc.user_sid
+            WHERE b.user_sid = ?
+        """
+        pickup_query = """
+            SELECT * FROM goods_in_pick_point 
+            WHERE buyer_sid = ? 
+            ORDER BY priority_order DESC
+        """
+        # Условие "в пути" считается в SQL, чтобы не дублировать работу с датами
+        onway_query = """
+            SELECT *, (status != 'GOODS_DECLINED'
+                       AND date(substr(status_updated, 1, 10)) >= date('now', '-30 days')) AS is_recent
+            FROM goods_on_way 
+            WHERE buyer_sid = ?
+        """
+        with self.get_connection() as conn:
+            buyer_row = conn.execute(buyer_query, (user_sid,)).fetchone()
+            pickup_rows = conn.execute(pickup_query, (user_sid,)).fetchall()
+            onway_rows = conn.execute(onway_query, (user_sid,)).fetchall()
+            delivered_rows = (self._delivered_by_goods(conn, [row["item_uid"] for row in pickup_rows])
+                              if delivered_limit else [])
+        
+        snapshot = BuyerSnapshot(buyer=self._row_to_buyer(buyer_row) if buyer_row else None)
+        for row in pickup_rows:
+            goods = self._row_to_goods(row, is_on_way=False)
+            snapshot.all_goods.append(goods)
+            if goods.status == 'GOODS_READY':
+                snapshot.ready.append(goods)
+        for row in onway_rows:
+            goods = self._row_to_goods(row, is_on_way=True)
+            snapshot.all_goods.append(goods)
+            if row["is_recent"]:
+                snapshot.on_way.append(goods)
+        if snapshot.buyer:
+            snapshot.buyer.goods_count = len(snapshot.ready)
+        
+        # История выдачи: поля товара берутся из уже прочитанных строк
+        goods_rows = {row["item_uid"]: row for row in pickup_rows}
+        delivered = []
+        for d in delivered_rows:
+            row = goods_rows[d["goods_uid"]]
+            item = {
+                'goods_uid': d["goods_uid"],
+                'order_id': d["order_id"],
+                'delivery_unix_timestamp': d["delivery_unix_timestamp"],
+                'status_updated': self._safe_get(row, "status_updated"),
+            }
+            for column in self._DELIVERED_GOODS_COLUMNS:
+                item[column] = self._safe_get(row, column)
+            delivered.append(item)
+        # Как ORDER BY ... DESC в SQLite: NULL - в конце
+        delivered.sort(key=lambda item: (item['delivery_unix_timestamp'] is not None,
+                                         item['delivery_unix_timestamp'] or 0), reverse=True)
+        for item in delivered[:delivered_limit]:
+            if item.get('info'):
+                try:
+                    item['info'] = json.loads(item['info']) if isinstance(item['info'], str) else item['info']
+                except Exception:
+                    item['info'] = {}
+            delivery_ts = self._extract_delivery_timestamp(item)
+            if delivery_ts is not None:
+                item['delivery_timestamp'] = delivery_ts
+            snapshot.delivered.append(item)
+        return snapshot
+    
+    def _delivered_by_goods(self, conn, goods_uids: List[str], chunk_size: int = 500) -> list:
+        """Записи delivered_goods для набора item_uid (частями, в пределах лимита параметров SQLite)"""
+        rows = []
+        for start in range(0, len(goods_uids), chunk_size):
+            chunk = goods_uids[start:start + chunk_size]
+            placeholders = ', '.join('?' * len(chunk))
+            rows.extend(conn.execute(
+                f"SELECT goods_uid, order_id, delivery_unix_timestamp FROM delivered_goods "
+                f"WHERE goods_uid IN ({placeholders})", chunk).fetchall())
+        return rows
+    
     # ============== СТАТИСТИКА ==============
     
     def get_statistics(self) -> Dict[str, Any]:
@@ -5,11 +5,14 @@ WB Manager - Главное приложение
 """
 import sys
 import json
+import argparse
 import subprocess
 import re
 import os
 import ctypes
-import threading
+import contextvars
+import concurrent.futures
+import hmac
 from pathlib import Path
 from datetime import datetime
 import time
@@ -17,24 +20,92 @@ import time
 # Добавляем путь к модулям
 sys.path.insert(0, str(Path(__file__).parent))
 
-from flask import Flask, render_template, jsonify, request, send_file, abort, redirect
-
-from config import APP_HOST, APP_PORT, DEBUG_MODE, CUSTOM_PHOTOS_DIR, GOODS_STATUSES
+from flask import Flask, Response, render_template, jsonify, request, send_file, abort, redirect, stream_with_context
+
+from config import (
+    APP_HOST, APP_PORT, DEFAULT_HOSTS, DEBUG_MODE, SERVER_MODE, SERVER_THREADS, SERVER_CONNECTION_LIMIT,
+    SERVER_KEEPALIVE_SECONDS, SERVER_BACKLOG, EVENTS_MAX_SUBSCRIBERS,
+    COMPRESSION_MIN_BYTES, STATIC_PRECOMPRESSED_DIR,
+    SLOW_QUERY_MS, TIMING_LOG_FILE, ADMIN_TOKEN, PROFILE_MAX_SECONDS,
+    CUSTOM_PHOTOS_DIR, GOODS_STATUSES, IMAGE_JOBS_DIR,
+    IMAGE_PREFETCH_ENABLED, IMAGE_PREFETCH_WINDOWS, IMAGE_PREFETCH_IDLE_MINUTES,
+    IMAGE_PREFETCH_CONCURRENCY, IMAGE_PREFETCH_BYTES_PER_SEC,
+    IMAGE_QUARANTINE_DIR, IMAGE_INTEGRITY_INTERVAL_HOURS
+)
 from database.database_manager import db
 from api.wb_api import wb_api
+from api.image_integrity import IntegrityScanner
+from api.image_variants import VARIANT_BOXES
 from utils.qr_generator import qr_generator
 from utils.tts_manager import TTSManager
 from utils.bot_manager import BotManager
 from utils.tray_icon import TrayIconManager
+from utils.image_prefetcher import ImagePrefetcher
+from utils.image_jobs import ImageJobManager, SCOPES as IMAGE_JOB_SCOPES
+from utils.event_bus import EventBus, ChangeWatcher
+from utils.compression import Compression
+from utils.request_timing import RequestTiming, track
+from utils.profiler import StackSampler, ProfileBusyError, THREAD_GROUPS
+from utils.versioning import ResponseVersioning
+from utils.json_provider import FastJSONProvider, json_list_response
+from utils.projection import FieldSet, parse_format
+from utils.batch import BatchExecutor, BatchError
+from utils.search import (RefinementCache, goods_matches_barcode, goods_matches_name,
+                          buyer_matches, delivered_matches)
 from models import Goods
 
 
 app = Flask(__name__)
-app.config['JSON_AS_ASCII'] = False
+# orjson вместо стандартного json (кириллица без экранирования)
+app.json = FastJSONProvider(app)
+# Сжатие JSON и статики для терминалов, работающих по Wi-Fi
+compression = Compression(app, min_size=COMPRESSION_MIN_BYTES, precompressed_dir=STATIC_PRECOMPRESSED_DIR)
+# Замеры запросов по маршрутам и журнал медленных SQL-запросов
+request_timing = RequestTiming(app, slow_query_ms=SLOW_QUERY_MS, log_file=TIMING_LOG_FILE,
+                               explain=db.explain)
+db.query_observer = request_timing.on_query
+# Профилировщик по выборкам стеков (работает только во время замера)
+stack_sampler = StackSampler()
 
 # Инициализация менеджеров
 tts_manager = TTSManager()
 bot_manager = BotManager(Path(__file__).parent / 'telegram_bot')
+image_prefetcher = ImagePrefetcher(
+    wb_api,
+    get_codes=db.get_prefetch_vendor_codes,
+    windows=IMAGE_PREFETCH_WINDOWS,
+    idle_minutes=IMAGE_PREFETCH_IDLE_MINUTES,
+    concurrency=IMAGE_PREFETCH_CONCURRENCY,
+    bytes_per_second=IMAGE_PREFETCH_BYTES_PER_SEC,
+    enabled=IMAGE_PREFETCH_ENABLED,
+)
+
+
+def requeue_broken_image(entry):
+    """
+    Битое изображение №1 догружается в ближайший простой того же размера
+    (изъятая мастер-копия - даже если вариант ещё в кэше), остальные - при открытии
+    """
+    if entry.num == 1:
+        image_prefetcher.requeue(entry.vendor_code, entry.size)
+
+
+image_integrity = IntegrityScanner(
+    wb_api.cache,
+    submit=wb_api.variants.submit_call,
+    state_file=IMAGE_JOBS_DIR.parent / 'integrity.json',
+    quarantine_dir=IMAGE_QUARANTINE_DIR,
+    on_bad=requeue_broken_image,
+    interval=IMAGE_INTEGRITY_INTERVAL_HOURS * 3600,
+    should_run=image_prefetcher.is_idle,
+)
+
+# Живые обновления для открытых вкладок (SSE)
+event_bus = EventBus(max_subscribers=EVENTS_MAX_SUBSCRIBERS)
+image_jobs = ImageJobManager(
+    wb_api, IMAGE_JOBS_DIR,
+    on_update=lambda job: event_bus.publish('image-job', image_jobs.describe(job))
+)
 SOUNDS_DIR = Path(__file__).parent / 'sounds'
 TARGET_SOUNDS_DIR = Path(r"C:\Program Files (x86)\WB_PVZ\data\flutter_assets\assets\sounds")
 METADATA_FILE = SOUNDS_DIR / 'metadata.json'
@@ -50,14 +121,49 @@ def load_metadata():
 def save_metadata(data):
     METADATA_FILE.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
 
-# Кэш для часто запрашиваемых данных
-_stats_cache = {'data': None, 'time': 0}
-_STATS_CACHE_TTL = 5  # секунд
+# Статистика пересчитывается только при смене версии БД
+_stats_cache = {'data': None, 'version': None}
+# Число артикулов на момент последней проверки (для события vendor-codes)
+_vendor_codes_state = {'count': None}
+
+
+def publish_db_changes():
+    """БД изменилась - один раз пересчитать счётчики и разослать подписчикам"""
+    version = db.get_data_version()
+    stats = db.get_statistics()
+    _stats_cache['data'] = stats
+    _stats_cache['version'] = version
+    event_bus.publish('stats', stats)
+
+    count = len(db.get_all_vendor_codes())
+    previous = _vendor_codes_state['count']
+    _vendor_codes_state['count'] = count
+    if previous is not None and count > previous:
+        event_bus.publish('vendor-codes', {'count': count, 'added': count - previous})
+
+
+def current_data_version():
+    """Версия данных, от которых зависят ответы API: БД WB ПВЗ, кастомные данные, кэш картинок"""
+    return db.get_data_version(), db.custom_data_version, wb_api.cache.version
+
 
-# Активные загрузки (user_sid)
-active_downloads = set()
-# Прогресс загрузки (user_sid -> dict)
-download_progress = {}
+# ETag/304 для списков: без изменений данных ответ не пересчитывается
+api_versions = ResponseVersioning(current_data_version)
+
+# Наблюдатель работает только пока открыт хотя бы один поток /api/events
+db_watcher = ChangeWatcher(event_bus, check=db.get_data_version, on_change=publish_db_changes)
+
+# Пакетные запросы: подзапросы страницы выполняются параллельно в одном снимке БД
+api_batch = BatchExecutor(app, snapshot=db.snapshot)
+
+
+@api_batch.preset('dashboard')
+def dashboard_bootstrap(params: dict):
+    """Главная: счётчики, статусы, метрики изображений"""
+    return [
+        {'id': 'stats', 'path': '/api/stats'},
+        {'id': 'image_metrics', 'path': '/api/metrics/images'},
+    ]
 
 
 def auto_start_bot_if_needed():
@@ -76,6 +182,12 @@ def auto_start_bot_if_needed():
     print(f"[Bot] Автозапуск: {status} ({message})")
 
 
+@app.before_request
+def mark_ui_activity():
+    """Действия в интерфейсе прерывают фоновую предзагрузку изображений"""
+    image_prefetcher.note_request(request.path, request.headers)
+
+
 # ============== JINJA ФИЛЬТРЫ ==============
 
 @app.template_filter('timestamp_to_date')
@@ -92,95 +204,102 @@ def timestamp_to_date(timestamp):
 
 # ============== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ ==============
 
+def cached_image_url(vendor_code, num: int = 1, size: str = 'small'):
+    """
+    URL локальной копии изображения или None, если её нет в кэше.
+    Наличие берётся из манифеста кэша в памяти (без обращений к диску),
+    версия файла (mtime) добавляется в URL - такой URL браузер кэширует навсегда.
+    """
+    if not vendor_code:
+        return None
+    version = wb_api.url_version(str(vendor_code), num, size)
+    if version is None:
+        return None
+    return f"/api/cached_image/{vendor_code}?size={size}&num={num}&v={version}"
+
+
 def add_image_url_to_dict(item: dict) -> dict:
     """Добавить URL картинки в словарь товара/заказа, если есть в кэше"""
-    vendor_code = item.get('vendor_code')
-    if vendor_code:
-        # Проверяем наличие в кэше
-        cache_path = wb_api.get_cached_image_path(str(vendor_code), 1)
-        if cache_path.exists() and cache_path.stat().st_size > 0:
-            item['image_url'] = f"/api/cached_image/{vendor_code}?size=small&num=1"
-        else:
-            item['image_url'] = None
-    else:
-        item['image_url'] = None
+    item['image_url'] = cached_image_url(item.get('vendor_code'))
     return item
 
 
-def goods_to_dict(goods: Goods) -> dict:
-    """Преобразование объекта товара в словарь для JSON"""
-    image_url = None
-    if goods.vendor_code:
-        # Проверяем наличие в кэше перед тем как отдавать ссылку
-        # Чтобы избежать 404 ошибок на фронтенде
-        cache_path = wb_api.get_cached_image_path(str(goods.vendor_code), 1)
-        if cache_path.exists() and cache_path.stat().st_size > 0:
-            image_url = f"/api/cached_image/{goods.vendor_code}?size=small&num=1"
-
-    d = {
-        'item_uid': goods.item_uid,
-        'buyer_sid': goods.buyer_sid,
-        'scanned_code': goods.scanned_code,
-        'encoded_scanned_code': goods.encoded_scanned_code,
-        'vendor_code': goods.vendor_code,
-        'cell': goods.cell,
-        'status': goods.status,
-        'status_display': GOODS_STATUSES.get(goods.status, goods.status),
-        'price': goods.price,
-        'price_with_sale': goods.price_with_sale,
-        'is_paid': goods.is_paid,
-        'payment_type': goods.payment_type,
-        'sticker_code': goods.sticker_code,
-        'barcode': goods.barcode,
-        'is_on_way': goods.is_on_way,
-        'image_url': image_url
+# Поля товара в ответах API: имя -> (значение из Goods, колонки БД для него).
+# Ссылку на картинку отдаём только если она есть в кэше,
+# чтобы избежать 404 ошибок на фронтенде
+GOODS_FIELDS = FieldSet({
+    'item_uid': (lambda g: g.item_uid, ('item_uid',)),
+    'buyer_sid': (lambda g: g.buyer_sid, ('buyer_sid',)),
+    'scanned_code': (lambda g: g.scanned_code, ('scanned_code', 'shk_code')),
+    'encoded_scanned_code': (lambda g: g.encoded_scanned_code, ('encoded_scanned_code',)),
+    'vendor_code': (lambda g: g.vendor_code, ('vendor_code',)),
+    'cell': (lambda g: g.cell, ('cell',)),
+    'status': (lambda g: g.status, ('status',)),
+    'status_display': (lambda g: GOODS_STATUSES.get(g.status, g.status), ('status',)),
+    'price': (lambda g: g.price, ('price',)),
+    'price_with_sale': (lambda g: g.price_with_sale, ('price_with_sale',)),
+    'is_paid': (lambda g: g.is_paid, ('is_paid',)),
+    'payment_type': (lambda g: g.payment_type, ('payment_type',)),
+    'sticker_code': (lambda g: g.sticker_code, ('sticker_code',)),
+    'barcode': (lambda g: g.barcode, ('barcode',)),
+    'is_on_way': (lambda g: g.is_on_way, ()),
+    'image_url': (lambda g: cached_image_url(g.vendor_code), ('vendor_code',)),
+    # GoodsInfo сериализуется JSON-провайдером напрямую, без копии в словарь
+    'info': (lambda g: g.info or None, ('info',)),
+}, required_columns=('item_uid', 'buyer_sid'))
+
+
+def _try_on_payload(buyer):
+    if not getattr(buyer, 'try_on_timestamp', None):
+        return None
+    return {
+        'timestamp': buyer.try_on_timestamp,
+        'order_id': getattr(buyer, 'try_on_order_id', ''),
+        'buyer_code': getattr(buyer, 'try_on_buyer_code', ''),
+        'is_from_cancel': getattr(buyer, 'try_on_is_delivery_from_cancel', False),
+        'has_unread_warning': getattr(buyer, 'try_on_has_unread_warning', False),
+        'done_forced_sync': getattr(buyer, 'try_on_done_forced_sync', False)
     }
-    
-    if goods.info:
-        d['info'] = {
-            'brand': goods.info.brand,
-            'name': goods.info.name,
-            'subject_name': goods.info.subject_name,
-            'color': goods.info.color,
-            'adult': goods.info.adult,
-            'no_return': goods.info.no_return,
-            'pics_cnt': goods.info.pics_cnt
-        }
-    else:
-        d['info'] = None
-    
-    return d
 
 
-def buyer_to_dict(buyer) -> dict:
+# Поля клиента в ответах API (запросы клиентов собираются из нескольких таблиц,
+# поэтому проекция применяется только к ответу)
+BUYER_FIELDS = FieldSet({
+    'user_sid': (lambda b: b.user_sid, ()),
+    'mobile': (lambda b: b.mobile, ()),
+    'name': (lambda b: b.name, ()),
+    'user_id': (lambda b: b.user_id, ()),
+    'custom_name': (lambda b: b.custom_name, ()),
+    'custom_description': (lambda b: b.custom_description, ()),
+    'custom_photo_path': (lambda b: b.custom_photo_path, ()),
+    'cell': (lambda b: b.cell, ()),
+    'goods_count': (lambda b: b.goods_count, ()),
+    'display_name': (lambda b: b.display_name, ()),
+    'mobile_last4': (lambda b: b.mobile_last4, ()),
+    'goods_on_way_count': (lambda b: getattr(b, 'goods_on_way_count', 0), ()),
+    'ready_goods_count': (lambda b: b.goods_count, ()),
+    'try_on': (_try_on_payload, ()),
+})
+
+
+def goods_to_dict(goods: Goods, fields=None) -> dict:
+    """Преобразование объекта товара в словарь для JSON"""
+    return GOODS_FIELDS.to_dict(goods, fields)
+
+
+def buyer_to_dict(buyer, fields=None) -> dict:
     """Преобразование объекта покупателя в словарь"""
-    try_on_payload = None
-    if getattr(buyer, 'try_on_timestamp', None):
-        try_on_payload = {
-            'timestamp': buyer.try_on_timestamp,
-            'order_id': getattr(buyer, 'try_on_order_id', ''),
-            'buyer_code': getattr(buyer, 'try_on_buyer_code', ''),
-            'is_from_cancel': getattr(buyer, 'try_on_is_delivery_from_cancel', False),
-            'has_unread_warning': getattr(buyer, 'try_on_has_unread_warning', False),
-            'done_forced_sync': getattr(buyer, 'try_on_done_forced_sync', False)
-        }
+    return BUYER_FIELDS.to_dict(buyer, fields)
 
-    return {
-        'user_sid': buyer.user_sid,
-        'mobile': buyer.mobile,
-        'name': buyer.name,
-        'user_id': buyer.user_id,
-        'custom_name': buyer.custom_name,
-        'custom_description': buyer.custom_description,
-        'custom_photo_path': buyer.custom_photo_path,
-        'cell': buyer.cell,
-        'goods_count': buyer.goods_count,
-        'display_name': buyer.display_name,
-        'mobile_last4': buyer.mobile_last4,
-        'goods_on_way_count': getattr(buyer, 'goods_on_way_count', 0),
-        'ready_goods_count': buyer.goods_count,
-        'try_on': try_on_payload
-    }
+
+def list_params(field_set: FieldSet):
+    """
+    Параметры проекции из запроса: (поля, формат).
+
+    Raises:
+        ValueError: Неизвестное поле или формат
+    """
+    return field_set.parse(request.args.get('fields')), parse_format(request.args.get('format'))
 
 
 # ============== СТРАНИЦЫ ==============
@@ -212,26 +331,19 @@ def buyers_page():
 @app.route('/buyer/<user_sid>')
 def buyer_profile_page(user_sid: str):
     """Страница профиля клиента"""
-    buyer = db.get_buyer_by_sid(user_sid)
-    if not buyer:
+    snapshot = db.get_buyer_snapshot(user_sid)
+    if not snapshot.buyer:
         abort(404)
     
-    goods_pickup = db.get_goods_by_buyer(user_sid)
-    goods_onway = db.get_goods_on_way_by_buyer(user_sid)
-    goods_all = db.get_all_goods_by_buyer(user_sid)
-    delivered = db.get_buyer_delivered_goods(user_sid)
-    
-    # Преобразуем товары в словари с URL изображений
-    goods_pickup_dicts = [goods_to_dict(g) for g in goods_pickup]
-    goods_onway_dicts = [goods_to_dict(g) for g in goods_onway]
-    goods_all_dicts = [goods_to_dict(g) for g in goods_all]
+    # Каждый товар преобразуется в словарь один раз: готовые и в пути - подмножества всех
+    dicts = {id(g): goods_to_dict(g) for g in snapshot.all_goods}
     
     return render_template('buyer_profile.html', 
-                           buyer=buyer,
-                           goods_pickup=goods_pickup_dicts,
-                           goods_onway=goods_onway_dicts,
-                           goods_all=goods_all_dicts,
-                           delivered=delivered)
+                           buyer=snapshot.buyer,
+                           goods_pickup=[dicts[id(g)] for g in snapshot.ready],
+                           goods_onway=[dicts[id(g)] for g in snapshot.on_way],
+                           goods_all=[dicts[id(g)] for g in snapshot.all_goods],
+                           delivered=snapshot.delivered)
 
 
 @app.route('/history')
@@ -255,60 +367,79 @@ def voiceover_page():
 # ============== API ENDPOINTS ==============
 
 @app.route('/api/stats')
+@api_versions.versioned
 def api_stats():
     """Получить статистику ПВЗ с кэшированием"""
-    now = time.time()
-    
-    # Используем кэш если данные свежие
-    if _stats_cache['data'] and (now - _stats_cache['time']) < _STATS_CACHE_TTL:
+    version = db.get_data_version()
+
+    # Используем кэш, если БД не менялась
+    if _stats_cache['data'] and _stats_cache['version'] == version:
         return jsonify(_stats_cache['data'])
-    
+
     stats = db.get_statistics()
     _stats_cache['data'] = stats
-    _stats_cache['time'] = now
+    _stats_cache['version'] = version
     return jsonify(stats)
 
 
 @app.route('/api/goods/pickup')
+@api_versions.versioned
 def api_goods_pickup():
     """Получить товары на ПВЗ"""
     limit = request.args.get('limit', 20, type=int)
     offset = request.args.get('offset', 0, type=int)
     status = request.args.get('status', None)
+    try:
+        fields, fmt = list_params(GOODS_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    columns = GOODS_FIELDS.columns(fields)
     
     if status:
-        goods = db.get_goods_by_status(status)
+        goods = db.get_goods_by_status(status, columns)
     else:
-        goods = db.get_goods_at_pickup(limit, offset)
+        goods = db.get_goods_at_pickup(limit, offset, columns)
     
-    return jsonify({
-        'goods': [goods_to_dict(g) for g in goods],
-        'count': len(goods)
-    })
+    return GOODS_FIELDS.response('goods', goods, fields, fmt, extra={'count': len(goods)})
 
 
 @app.route('/api/goods/on-way')
+@api_versions.versioned
 def api_goods_onway():
     """Получить товары в пути"""
     limit = request.args.get('limit', 20, type=int)
     offset = request.args.get('offset', 0, type=int)
+    try:
+        fields, fmt = list_params(GOODS_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    columns = GOODS_FIELDS.columns(fields)
     
-    goods = db.get_goods_on_way(limit, offset)
+    goods = db.get_goods_on_way(limit, offset, columns)
     
-    return jsonify({
-        'goods': [goods_to_dict(g) for g in goods],
-        'count': len(goods)
-    })
+    return GOODS_FIELDS.response('goods', goods, fields, fmt, extra={'count': len(goods)})
 
 
 @app.route('/api/goods/by-cell/<cell>')
+@api_versions.versioned
 def api_goods_by_cell(cell: str):
     """Получить товары в ячейке"""
-    goods = db.get_goods_by_cell(cell)
-    return jsonify({
-        'goods': [goods_to_dict(g) for g in goods],
-        'count': len(goods)
-    })
+    try:
+        fields, fmt = list_params(GOODS_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    columns = GOODS_FIELDS.columns(fields)
+    goods = db.get_goods_by_cell(cell, columns)
+    return GOODS_FIELDS.response('goods', goods, fields, fmt, extra={'count': len(goods)})
+
+
+# Наборы кандидатов поиска по сессиям: уточнение запроса не сканирует таблицы заново
+search_cache = RefinementCache(ttl=30)
+search_pool = concurrent.futures.ThreadPoolExecutor(max_workers=6, thread_name_prefix="Search")
+# Кандидатов на один вид поиска; набор короче считается полным и годится для уточнения
+SEARCH_CANDIDATES = 200
+# Колонки, по которым уточнение повторяет условия поиска товаров
+SEARCH_GOODS_COLUMNS = ('scanned_code', 'shk_code', 'sticker_code', 'barcode', 'info')
 
 
 @app.route('/api/search')
@@ -319,31 +450,54 @@ def api_search():
     
     if len(query) < 2:
         return jsonify({'goods': [], 'buyers': [], 'delivered': []})
+    try:
+        # fields относится к товарам в результатах
+        fields = GOODS_FIELDS.parse(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    columns = GOODS_FIELDS.columns(fields)
+    if columns is not None:
+        columns += [c for c in SEARCH_GOODS_COLUMNS if c not in columns]
     
-    result = {
-        'goods': [],
-        'buyers': [],
-        'delivered': []
-    }
+    session = (request.remote_addr, request.headers.get('User-Agent', ''))
+    version = current_data_version()
+    
+    def cached(kind, fetch, matches):
+        return search_cache.search(session, kind, query, version, fetch, matches, SEARCH_CANDIDATES)
+    
+    # Набор кандидатов с урезанными колонками нельзя уточнять для полного запроса
+    projection = tuple(columns) if columns is not None else None
     
-    # Поиск товаров (по ШК и по названию)
-    if search_type in ('all', 'goods'):
-        goods = db.search_goods_by_barcode(query)
+    def search_goods():
+        goods = cached(('goods_barcode', projection),
+                       lambda limit: db.search_goods_by_barcode(query, columns, limit),
+                       goods_matches_barcode)
         # Если по ШК не нашли - ищем по названию
         if not goods:
-            goods = db.search_goods_by_name(query)
-        result['goods'] = [goods_to_dict(g) for g in goods[:20]]
+            goods = cached(('goods_name', projection),
+                           lambda limit: db.search_goods_by_name(query, columns, limit),
+                           goods_matches_name)
+        return [goods_to_dict(g, fields) for g in goods[:20]]
     
-    # Поиск клиентов
-    if search_type in ('all', 'buyers'):
-        buyers = db.search_buyers(query)
-        result['buyers'] = [buyer_to_dict(b) for b in buyers[:20]]
+    def search_buyers():
+        buyers = cached('buyers', lambda limit: db.search_buyers(query, limit), buyer_matches)
+        return [buyer_to_dict(b) for b in buyers[:20]]
     
-    # Поиск в истории
-    if search_type in ('all', 'delivered'):
-        delivered = db.search_delivered_goods(query)
+    def search_delivered():
+        delivered = cached('delivered', lambda limit: db.search_delivered_goods(query, limit),
+                           delivered_matches)
         # Добавляем картинки
-        result['delivered'] = [add_image_url_to_dict(d) for d in delivered[:20]]
+        return [add_image_url_to_dict(dict(d)) for d in delivered[:20]]
+    
+    searches = {'goods': search_goods, 'buyers': search_buyers, 'delivered': search_delivered}
+    # Виды поиска выполняются параллельно (каждый в своём подключении к БД)
+    futures = {
+        key: search_pool.submit(contextvars.copy_context().run, fn)
+        for key, fn in searches.items() if search_type in ('all', key)
+    }
+    result = {key: [] for key in searches}
+    for key, future in futures.items():
+        result[key] = future.result()
     
     return jsonify(result)
 
@@ -356,28 +510,31 @@ def api_search_goods():
     
     if len(query) < 2:
         return jsonify({'goods': [], 'count': 0})
+    try:
+        fields, fmt = list_params(GOODS_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    columns = GOODS_FIELDS.columns(fields)
     
     goods = []
     
     if search_by in ('all', 'barcode'):
-        goods.extend(db.search_goods_by_barcode(query))
+        goods.extend(db.search_goods_by_barcode(query, columns))
     
     if search_by in ('all', 'name') and len(goods) < 50:
         # Добавляем поиск по названию если не нашли по ШК
-        name_goods = db.search_goods_by_name(query)
+        name_goods = db.search_goods_by_name(query, columns)
         # Исключаем дубликаты
         existing_uids = {g.item_uid for g in goods}
         for g in name_goods:
             if g.item_uid not in existing_uids:
                 goods.append(g)
     
-    return jsonify({
-        'goods': [goods_to_dict(g) for g in goods[:50]],
-        'count': len(goods)
-    })
+    return GOODS_FIELDS.response('goods', goods[:50], fields, fmt, extra={'count': len(goods)})
 
 
 @app.route('/api/buyers')
+@api_versions.versioned
 def api_buyers():
     """Получить список клиентов"""
     limit = request.args.get('limit', 30, type=int)
@@ -385,6 +542,10 @@ def api_buyers():
     query = request.args.get('q', '').strip()
     cell_query = request.args.get('cell', '').strip()
     filter_type = request.args.get('filter', 'all')
+    try:
+        fields, fmt = list_params(BUYER_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     if filter_type == 'try-on':
         buyers = db.get_buyers_on_try_on()
@@ -398,11 +559,8 @@ def api_buyers():
             ]
         if cell_query:
             buyers = [b for b in buyers if b.cell and cell_query in str(b.cell)]
-        return jsonify({
-            'buyers': [buyer_to_dict(b) for b in buyers],
-            'count': len(buyers),
-            'has_more': False
-        })
+        return BUYER_FIELDS.response('buyers', buyers, fields, fmt,
+                                     extra={'count': len(buyers), 'has_more': False})
     
     if cell_query:
         # Поиск по номеру ячейки
@@ -416,11 +574,8 @@ def api_buyers():
     else:
         buyers = db.get_all_buyers(limit, offset)
     
-    return jsonify({
-        'buyers': [buyer_to_dict(b) for b in buyers],
-        'count': len(buyers),
-        'has_more': len(buyers) == limit
-    })
+    return BUYER_FIELDS.response('buyers', buyers, fields, fmt,
+                                 extra={'count': len(buyers), 'has_more': len(buyers) == limit})
 
 
 @app.route('/api/buyer/<user_sid>')
@@ -437,12 +592,13 @@ def api_buyer(user_sid: str):
 def api_buyer_goods(user_sid: str):
     """Получить товары клиента по типу"""
     goods_type = request.args.get('type', 'ready')
+    snapshot = db.get_buyer_snapshot(user_sid, delivered_limit=0)
     if goods_type == 'onway':
-        goods = db.get_goods_on_way_by_buyer(user_sid)
+        goods = snapshot.on_way
     elif goods_type == 'all':
-        goods = db.get_all_goods_by_buyer(user_sid)
+        goods = snapshot.all_goods
     else:
-        goods = db.get_goods_by_buyer(user_sid)
+        goods = snapshot.ready
     return jsonify({'goods': [goods_to_dict(g) for g in goods]})
 
 
@@ -489,13 +645,14 @@ def api_buyer_photo(user_sid: str):
         abort(404)
     
     photo_path = Path(buyer.custom_photo_path)
-    if not photo_path.exists():
-        abort(404)
-    
-    return send_file(photo_path)
+    with track('fs'):
+        if not photo_path.exists():
+            abort(404)
+        return send_file(photo_path)
 
 
 @app.route('/api/surplus')
+@api_versions.versioned
 def api_surplus():
     """Получить список излишков"""
     surplus = db.get_surplus_goods()
@@ -540,6 +697,7 @@ def api_surplus_delete_one(goods_uid: str):
 
 
 @app.route('/api/delivered')
+@api_versions.versioned
 def api_delivered():
     """Получить историю выданных товаров"""
     limit = request.args.get('limit', 100, type=int)
@@ -550,13 +708,8 @@ def api_delivered():
     else:
         orders = db.get_delivered_goods(limit)
     
-    # Добавляем URL картинок
-    orders = [add_image_url_to_dict(o) for o in orders]
-
-    return jsonify({
-        'orders': orders,
-        'count': len(orders)
-    })
+    # URL картинок добавляются по мере сериализации
+    return json_list_response('orders', orders, add_image_url_to_dict, extra={'count': len(orders)})
 
 
 @app.route('/api/delivered/order/<goods_uid>')
@@ -589,16 +742,42 @@ def api_buyer_custom_update(user_sid: str):
 @app.route('/api/cached_image/<vendor_code>')
 def api_serve_cached_image(vendor_code: str):
     """
-    Отдать кэшированное изображение, если оно есть локально.
+    Отдать кэшированное изображение нужного размера (thumb/small/big), если оно есть локально.
     """
     num = request.args.get('num', 1, type=int)
+    size = request.args.get('size', 'small')
 
-    # Путь к файлу в кэше
-    path = wb_api.get_cached_image_path(vendor_code, num)
+    # Запись в кэше (заодно отмечаем обращение для LRU-вытеснения)
+    entry = wb_api.cache.get(vendor_code, num, size)
+    if entry is None:
+        # Есть только мастер-копия - получаем нужный размер сейчас
+        entry = wb_api.derive_variant(vendor_code, num, size)
 
-    # Если файл есть и не пустой - отдаём
-    if path.exists() and path.stat().st_size > 0:
-        return send_file(path)
+    # Если файл есть - отдаём
+    if entry:
+        try:
+            etag = wb_api.cache.etag_for(entry)
+            if request.if_none_match.contains(etag):
+                # У браузера актуальная копия - диск не трогаем
+                response = Response(status=304)
+            else:
+                with track('fs'):
+                    data = wb_api.cache.read(entry)
+                response = Response(data, mimetype='image/webp')
+        except FileNotFoundError:
+            # Файл удалили снаружи - синхронизируем манифест
+            wb_api.cache.remove(vendor_code, num, size)
+            abort(404)
+
+        response.set_etag(etag)
+        # URL с версией файла неизменен навсегда (новый файл - новая версия),
+        # без версии - браузер перепроверяет по ETag
+        version = request.args.get('v') or request.args.get('t')
+        if version == wb_api.url_version(vendor_code, num, size):
+            response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
 
     # Если файла нет - возвращаем 404 (чтобы не парсить ссылки автоматически)
     abort(404)
@@ -613,121 +792,130 @@ def api_cache_image(vendor_code: str):
     num = request.args.get('num', 1, type=int)
 
     path, _ = wb_api.download_image_sync(vendor_code, num, size, force=True)
-    if path and path.exists():
-        # Возвращаем ссылку на локальный кэш с timestamp для сброса кэша браузера
+    url = cached_image_url(vendor_code, num, size) if path else None
+    if url:
+        # Возвращаем версионированную ссылку на локальный кэш (новая версия сбрасывает кэш браузера)
         return jsonify({
             'success': True,
-            'url': f"/api/cached_image/{vendor_code}?num={num}&t={int(time.time())}"
+            'url': url
         })
     else:
         return jsonify({'success': False, 'error': 'Not found'}), 404
 
 
+def image_job_vendor_codes(scope: str, target=None, goods_type: str = 'all'):
+    """Артикулы для задания кэширования в порядке загрузки"""
+    if scope == 'all':
+        return db.get_all_vendor_codes()
+    if scope == 'cell':
+        return [g.vendor_code for g in db.get_goods_by_cell(target)]
+
+    all_goods = db.get_all_goods_by_buyer(target)
+    # Фильтруем товары
+    if goods_type == 'ready':
+        goods = [g for g in all_goods if g.status == 'GOODS_READY']
+    elif goods_type == 'onway':
+        goods = [g for g in all_goods if g.is_on_way]
+    else:
+        goods = all_goods
+    # Сначала готовы к выдаче, потом в пути, потом остальные
+    goods.sort(key=lambda g: (
+        0 if g.status == 'GOODS_READY' else
+        1 if g.is_on_way else
+        2
+    ))
+    return [g.vendor_code for g in goods]
+
+
 @app.route('/api/buyer/<user_sid>/cache-images', methods=['POST'])
 def api_buyer_cache_images(user_sid: str):
     """
-    Скачать изображения для всех товаров клиента (в фоне)
+    Скачать изображения для всех товаров клиента (в фоне, через задание)
     """
-    # Очистка старого прогресса (старше 5 минут)
-    now = time.time()
-    to_remove = [sid for sid, p in download_progress.items() if p.get('finished') and (now - p.get('finished_at', 0)) > 300]
-    for sid in to_remove:
-        download_progress.pop(sid, None)
-
-    if user_sid in active_downloads:
-        return jsonify({'success': False, 'message': 'Загрузка уже запущена', 'count': 0})
+    current = image_jobs.find('buyer', user_sid)
+    if current and current.is_active:
+        return jsonify({'success': False, 'message': 'Загрузка уже запущена', 'count': 0,
+                        'job_id': current.id})
 
     # Получаем тип товаров для загрузки
     data = request.get_json(silent=True) or {}
     goods_type = data.get('type', 'all')  # all, ready, onway
 
-    all_goods = db.get_all_goods_by_buyer(user_sid)
-
-    # Фильтруем товары
-    if goods_type == 'ready':
-        goods_to_process = [g for g in all_goods if g.status == 'GOODS_READY']
-    elif goods_type == 'onway':
-        goods_to_process = [g for g in all_goods if g.is_on_way]
-    else:
-        goods_to_process = all_goods
-
-    if not goods_to_process:
+    codes = image_job_vendor_codes('buyer', user_sid, goods_type)
+    if not codes:
         return jsonify({'success': True, 'count': 0})
 
-    # Блокируем сразу, чтобы избежать race condition
-    active_downloads.add(user_sid)
-
-    # Инициализируем прогресс
-    download_progress[user_sid] = {
-        'total': len(goods_to_process),
-        'current': 0,
-        'finished': False
-    }
-
-    def download_task():
-        try:
-            print(f"[BulkUpdate] Starting for {user_sid}, items: {len(goods_to_process)}")
-            # Сортируем: сначала готовы к выдаче, потом в пути, потом остальные
-            sorted_goods = sorted(goods_to_process, key=lambda g: (
-                0 if g.status == 'GOODS_READY' else
-                1 if g.is_on_way else
-                2
-            ))
-
-            # Добавляем задержку чтобы не спамить запросами
-            for i, g in enumerate(sorted_goods):
-                # Обновляем прогресс
-                if user_sid in download_progress:
-                    download_progress[user_sid]['current'] = i
-
-                if g.vendor_code:
-                    try:
-                        # Используем force=False, чтобы пропускать уже скачанные
-                        # Но если файла нет - он скачается
-                        path, downloaded = wb_api.download_image_sync(g.vendor_code, 1, 'small', force=False)
-
-                        if downloaded:
-                            print(f"[BulkUpdate] Downloaded {g.vendor_code} ({i+1}/{len(sorted_goods)})")
-                            time.sleep(0.2)  # Баланс скорости и стабильности
-                        else:
-                            # Если не скачали - либо уже есть, либо ошибка
-                            if path and path.exists():
-                                # Уже есть в кэше
-                                time.sleep(0.02)
-                            else:
-                                print(f"[BulkUpdate] Failed to download {g.vendor_code} ({i+1}/{len(sorted_goods)})")
-                                time.sleep(0.2) # Пауза при ошибке
-                    except Exception as e:
-                        print(f"[BulkUpdate] Error processing {g.vendor_code}: {e}")
-                        time.sleep(0.5)
-
-            # Финальный прогресс
-            if user_sid in download_progress:
-                download_progress[user_sid]['current'] = len(sorted_goods)
-
-            print(f"[BulkUpdate] Finished for {user_sid}")
-        except Exception as e:
-            print(f"[BulkUpdate] Fatal error for {user_sid}: {e}")
-        finally:
-            active_downloads.discard(user_sid)
-            if user_sid in download_progress:
-                download_progress[user_sid]['finished'] = True
-                download_progress[user_sid]['finished_at'] = time.time()
-
-    # Запускаем в отдельном потоке
-    threading.Thread(target=download_task, daemon=True).start()
-
-    return jsonify({'success': True, 'count': len(goods_to_process), 'message': 'Фоновая загрузка запущена'})
+    job = image_jobs.create('buyer', user_sid, codes, goods_type=goods_type)
+    return jsonify({'success': True, 'count': job.total, 'job_id': job.id,
+                    'message': 'Фоновая загрузка запущена'})
 
 
 @app.route('/api/buyer/<user_sid>/download-progress')
 def api_buyer_download_progress(user_sid: str):
     """Получить статус загрузки картинок"""
-    if user_sid in download_progress:
-        return jsonify(download_progress[user_sid])
+    job = image_jobs.find('buyer', user_sid)
+    if job:
+        return jsonify(image_jobs.describe(job))
     return jsonify({'total': 0, 'current': 0, 'finished': True})
 
 
+@app.route('/api/jobs/images', methods=['GET'])
+def api_image_jobs():
+    """Список заданий кэширования изображений"""
+    return jsonify({'jobs': [image_jobs.describe(job) for job in image_jobs.list_jobs()]})
+
+
+@app.route('/api/jobs/images', methods=['POST'])
+def api_create_image_job():
+    """
+    Создать задание кэширования: {scope: buyer|cell|all, target, type, size}
+    """
+    data = request.get_json(silent=True) or {}
+    scope = data.get('scope', 'all')
+    target = data.get('target')
+    goods_type = data.get('type', 'all')
+    size = data.get('size', 'small')
+
+    if scope not in IMAGE_JOB_SCOPES:
+        return jsonify({'success': False, 'error': 'Неизвестная область'}), 400
+    if scope != 'all' and not target:
+        return jsonify({'success': False, 'error': 'Не указан target'}), 400
+    target = str(target) if scope != 'all' else None
+
+    codes = image_job_vendor_codes(scope, target, goods_type)
+    if not codes:
+        return jsonify({'success': True, 'job': None, 'count': 0})
+
+    job = image_jobs.create(scope, target, codes, goods_type=goods_type, size=size)
+    return jsonify({'success': True, 'job': image_jobs.describe(job), 'count': job.total})
+
+
+@app.route('/api/jobs/images/<job_id>')
+def api_image_job(job_id: str):
+    """Состояние задания"""
+    job = image_jobs.get(job_id)
+    if not job:
+        abort(404)
+    return jsonify(image_jobs.describe(job))
+
+
+@app.route('/api/jobs/images/<job_id>/<action>', methods=['POST'])
+def api_image_job_action(job_id: str, action: str):
+    """Управление заданием: pause / resume / cancel / retry"""
+    actions = {
+        'pause': image_jobs.pause,
+        'resume': image_jobs.resume,
+        'cancel': image_jobs.cancel,
+        'retry': image_jobs.retry,
+    }
+    if action not in actions:
+        abort(404)
+    job = actions[action](job_id)
+    if not job:
+        abort(404)
+    return jsonify({'success': True, 'job': image_jobs.describe(job)})
+
+
 @app.route('/api/images/check-status', methods=['POST'])
 def api_check_images_status():
     """Массовая проверка наличия картинок в кэше"""
@@ -737,14 +925,159 @@ def api_check_images_status():
     result = {}
     for code in set(codes):
         str_code = str(code)
-        # Проверяем наличие в кэше
-        path = wb_api.get_cached_image_path(str_code, 1)
-        if path.exists() and path.stat().st_size > 0:
-            result[str_code] = f"/api/cached_image/{str_code}?num=1&t={int(path.stat().st_mtime)}"
+        # Проверяем наличие в кэше (по манифесту в памяти)
+        url = cached_image_url(str_code)
+        if url:
+            result[str_code] = url
 
     return jsonify(result)
 
 
+@app.route('/api/images/resolve', methods=['POST'])
+def api_resolve_images():
+    """
+    Пакетное разрешение картинок для очереди на фронтенде.
+    Закэшированные возвращаются сразу, отсутствующие ставятся в фоновую загрузку.
+    Повторный вызов с теми же кодами (можно с wait=N секунд) отдаёт завершившиеся.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Ожидается JSON-объект'}), 400
+    codes = data.get('codes', [])
+    if not isinstance(codes, list) or not all(isinstance(c, str) and c for c in codes):
+        return jsonify({'error': 'codes - список артикулов (строк)'}), 400
+    size = data.get('size', 'small')
+    if size not in VARIANT_BOXES:
+        return jsonify({'error': f"Неизвестный размер: {size}"}), 400
+    wait = data.get('wait') or 0
+    if isinstance(wait, bool) or not isinstance(wait, (int, float)):
+        return jsonify({'error': 'wait - число секунд'}), 400
+    codes = codes[:200]
+    wait = min(max(float(wait), 0), 10)
+
+    resolved = wb_api.resolve_images(codes, size, wait=wait)
+
+    results = {}
+    for code, info in resolved.items():
+        results[code] = {
+            'status': info['status'],
+            'url': cached_image_url(code, 1, size) if info['status'] == 'cached' else None
+        }
+    return jsonify({'results': results})
+
+
+@app.route('/api/events')
+def api_events():
+    """
+    Поток Server-Sent Events: прогресс заданий изображений (image-job),
+    изменения статистики (stats) и появление новых артикулов (vendor-codes).
+    Поток закрывается сервером через несколько минут, EventSource переподключается.
+    """
+    sub = event_bus.subscribe()
+    if sub is None:
+        # Лимит соединений - клиент остаётся на опросе и пробует позже
+        return jsonify({'error': 'Лимит потоков событий исчерпан', 'fallback': 'polling',
+                        'retry_after': 30}), 503, {'Retry-After': '30'}
+    return Response(
+        stream_with_context(event_bus.stream(sub)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/api/images/prefetch')
+def api_image_prefetch_status():
+    """Состояние фоновой предзагрузки изображений"""
+    return jsonify(image_prefetcher.status())
+
+
+@app.route('/api/images/integrity')
+def api_image_integrity_status():
+    """Результат последней проверки целостности кэша изображений"""
+    return jsonify(image_integrity.status())
+
+
+@app.route('/api/images/integrity/scan', methods=['POST'])
+def api_image_integrity_scan():
+    """Запустить проверку кэша: {full: true} - весь кэш, иначе только изменённые файлы"""
+    data = request.get_json(silent=True) or {}
+    started = image_integrity.scan_background(full=bool(data.get('full')))
+    return jsonify({'success': started, 'status': image_integrity.status()})
+
+
+@app.route('/api/diagnostics/hosts')
+def api_diagnostics_hosts():
+    """Таблица здоровья basket-серверов WB (circuit breaker)"""
+    health = wb_api.host_health
+    return jsonify({
+        'hosts': health.snapshot(),
+        'failure_threshold': health.failure_threshold,
+        'open_seconds': health.open_seconds,
+        'connections': wb_api.fetcher.stats()
+    })
+
+
+def _is_admin() -> bool:
+    """Запрос с этого компьютера или с верным X-Admin-Token"""
+    token = request.headers.get('X-Admin-Token')
+    if ADMIN_TOKEN and token:
+        return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+
+@app.route('/api/diagnostics/profile')
+def api_diagnostics_profile():
+    """
+    Профиль по выборкам стеков за seconds секунд.
+
+    threads: web (по умолчанию) / pools / all; idle=1 - учитывать ожидание;
+    format=collapsed - файл свёрнутых стеков для flamegraph.pl / speedscope
+    """
+    if not _is_admin():
+        return jsonify({'error': 'Доступ запрещён'}), 403
+    seconds = request.args.get('seconds', 10, type=float)
+    interval_ms = request.args.get('interval_ms', 5, type=float)
+    top = request.args.get('top', 25, type=int)
+    group = request.args.get('threads', 'web')
+    fmt = request.args.get('format', 'json')
+    if group not in THREAD_GROUPS or fmt not in ('json', 'collapsed'):
+        return jsonify({'error': 'Неверные параметры'}), 400
+    seconds = min(max(seconds, 0.1), PROFILE_MAX_SECONDS)
+    interval_ms = min(max(interval_ms, 1), 100)
+    try:
+        profile = stack_sampler.sample(seconds, interval_ms / 1000, group,
+                                       include_idle=request.args.get('idle') == '1')
+    except ProfileBusyError as e:
+        return jsonify({'error': str(e)}), 409
+    if fmt == 'collapsed':
+        filename = f"profile-{datetime.now():%Y%m%d-%H%M%S}.folded"
+        return Response(profile.collapsed(), mimetype='text/plain',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+    return jsonify(profile.to_dict(limit=min(max(top, 1), 200)))
+
+
+@app.route('/api/metrics/images')
+def api_image_metrics():
+    """Метрики конвейера изображений: кэш, перебор серверов, задержки, соединения"""
+    metrics = wb_api.metrics.snapshot()
+    metrics['cache'] = wb_api.cache.stats()
+    metrics['connections'] = wb_api.fetcher.stats()
+    return jsonify(metrics)
+
+
+@app.route('/api/metrics/requests')
+def api_request_metrics():
+    """Задержки по маршрутам (БД / сериализация / файлы) и медленные SQL-запросы"""
+    return jsonify(request_timing.snapshot())
+
+
+@app.route('/api/metrics/requests/reset', methods=['POST'])
+def api_request_metrics_reset():
+    """Сбросить накопленные замеры"""
+    request_timing.reset()
+    return jsonify({'success': True})
+
+
 @app.route('/api/qr/<encoded_code>')
 def api_qr_code(encoded_code: str):
     """Сгенерировать QR-код с кэшированием браузером"""
@@ -793,7 +1126,29 @@ def api_find_product_image(vendor_code: str):
         return jsonify({'url': fallback_url, 'found': False})
 
 
+@app.route('/api/image/gallery/<vendor_code>')
+def api_image_gallery(vendor_code: str):
+    """
+    Галерея товара (изображения 2..count) построчно в NDJSON по мере загрузки:
+    {"num": 2, "url": "/api/cached_image/..."} или url = null, если изображения нет
+    """
+    count = min(max(request.args.get('count', 1, type=int), 1), 10)
+    size = request.args.get('size', 'big')
+
+    def generate():
+        for num, entry in wb_api.iter_gallery(vendor_code, count, size):
+            url = cached_image_url(vendor_code, num, size) if entry else None
+            yield json.dumps({'num': num, 'url': url}) + '\n'
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
 @app.route('/api/vendor-codes')
+@api_versions.versioned
 def api_vendor_codes():
     """Получить все уникальные vendor_code для предзагрузки картинок"""
     codes = db.get_all_vendor_codes()
@@ -819,6 +1174,7 @@ def api_all_product_image_urls(vendor_code: str):
 
 
 @app.route('/api/deliveries')
+@api_versions.versioned
 def api_deliveries():
     """Получить историю доставок"""
     limit = request.args.get('limit', 50, type=int)
@@ -1055,6 +1411,38 @@ def api_voiceover_patch():
         return jsonify({'error': str(e)}), 500
 
 
+# ============== ПАКЕТНЫЕ ЗАПРОСЫ ==============
+
+def _batch_headers():
+    """Заголовки, которые передаются подзапросам пакета"""
+    return {key: value for key, value in request.headers.items()
+            if key in ('X-Background-Request', 'Cookie', 'User-Agent')}
+
+
+@app.route('/api/batch', methods=['POST'])
+def api_batch_execute():
+    """
+    Выполнить несколько GET-запросов к API за один вызов.
+    Тело: {"requests": [{"id": "stats", "path": "/api/stats"}, ...]}
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        return api_batch.execute(data.get('requests'), _batch_headers())
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@app.route('/api/batch/<preset>')
+def api_batch_preset(preset: str):
+    """Всё, что нужно странице для первого показа, одним ответом (dashboard)"""
+    if preset not in api_batch.presets:
+        return jsonify({'error': 'Неизвестный набор'}), 404
+    try:
+        return api_batch.execute_preset(preset, request.args.to_dict(), _batch_headers())
+    except BatchError as e:
+        return jsonify({'error': str(e)}), 400
+
+
 # ============== BOT MANAGER ==============
 
 @app.route('/bot')
@@ -1158,13 +1546,61 @@ def server_error(e):
 def stop_services():
     """Stop all background services."""
     print("[Main] Stopping services...")
+    image_prefetcher.stop()
+    image_integrity.stop()
+    event_bus.close_all()
     try:
         bot_manager.stop()
     except Exception as e:
         print(f"[Main] Error stopping bot: {e}")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="WB Manager")
+    parser.add_argument('--mode', choices=('development', 'production'), default=SERVER_MODE,
+                        help="development - сервер Flask с автоперезагрузкой, production - waitress")
+    parser.add_argument('--host', default=APP_HOST,
+                        help="адрес сервера (по умолчанию 127.0.0.1, в production - 0.0.0.0)")
+    parser.add_argument('--port', type=int, default=APP_PORT, help="порт сервера")
+    args = parser.parse_args()
+    args.host = args.host or DEFAULT_HOSTS[args.mode]
+    return args
+
+
+def browser_host(host: str) -> str:
+    """Адрес для браузера на этом компьютере (0.0.0.0 в браузере не открыть)"""
+    return '127.0.0.1' if host in ('0.0.0.0', '::', '') else host
+
+
+def run_server(mode: str, host: str, port: int):
+    """Запустить HTTP-сервер в выбранном режиме (блокирует до остановки)"""
+    if mode == 'production':
+        try:
+            from waitress import serve
+        except ImportError:
+            print("[Server] waitress не установлен (pip install waitress), "
+                  "используется встроенный сервер без автоперезагрузки")
+            app.run(host=host, port=port, debug=False, threaded=True)
+            return
+        print(f"[Server] waitress: {host}:{port}, потоков {SERVER_THREADS}, "
+              f"соединений до {SERVER_CONNECTION_LIMIT}")
+        serve(
+            app,
+            host=host,
+            port=port,
+            threads=SERVER_THREADS,
+            connection_limit=SERVER_CONNECTION_LIMIT,
+            channel_timeout=SERVER_KEEPALIVE_SECONDS,
+            backlog=SERVER_BACKLOG,
+            ident="WB Manager",
+        )
+        return
+    app.run(host=host, port=port, debug=DEBUG_MODE, threaded=True)
+
+
 if __name__ == '__main__':
+    args = parse_args()
+
     # Запрос прав администратора (Windows)
     if os.name == 'nt':
         try:
@@ -1186,29 +1622,29 @@ if __name__ == '__main__':
 ║   Интерфейс управления ПВЗ Wildberries     ║
 ╠════════════════════════════════════════════╣
 ║   Открой в браузере:                       ║
-║   http://{APP_HOST}:{APP_PORT}                       ║
+║   {f'http://{browser_host(args.host)}:{args.port}':<41}║
 ╚════════════════════════════════════════════╝
     """)
-    is_primary_process = (not DEBUG_MODE) or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'
+    # Автоперезагрузчик Flask запускает второй процесс; фоновые службы - только в рабочем
+    is_primary_process = (args.mode == 'production' or not DEBUG_MODE
+                          or os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
     if is_primary_process:
         auto_start_bot_if_needed()
+        image_prefetcher.start()
+        image_integrity.start()
+        image_jobs.resume_interrupted()
 
     tray_icon = None
     if is_primary_process:
         try:
-            tray_icon = TrayIconManager(APP_HOST, APP_PORT, on_exit=stop_services)
+            tray_icon = TrayIconManager(browser_host(args.host), args.port, on_exit=stop_services)
             tray_icon.start()
         except Exception as exc:
             tray_icon = None
             print(f"[Tray] Не удалось запустить значок: {exc}")
 
     try:
-        app.run(
-            host=APP_HOST,
-            port=APP_PORT,
-            debug=DEBUG_MODE,
-            threaded=True
-        )
+        run_server(args.mode, args.host, args.port)
     finally:
         if tray_icon:
             tray_icon.stop()
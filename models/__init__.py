@@ -7,7 +7,8 @@ from .data_models import (
     GoodsInfo,
     Buyer,
     DeliveredOrder,
-    SurplusGoods
+    SurplusGoods,
+    BuyerSnapshot
 )
 
 __all__ = [
@@ -15,5 +16,6 @@ __all__ = [
     "GoodsInfo", 
     "Buyer",
     "DeliveredOrder",
-    "SurplusGoods"
+    "SurplusGoods",
+    "BuyerSnapshot"
 ]
@@ -157,3 +157,13 @@ class SurplusGoods:
     cell: Optional[str] = None
     acceptance_timestamp: Optional[int] = None
     is_dbs: bool = False
+
+
+@dataclass
+class BuyerSnapshot:
+    """Все данные профиля покупателя, прочитанные за один проход по таблицам"""
+    buyer: Optional[Buyer]
+    ready: List[Goods] = field(default_factory=list)  # На ПВЗ, готовы к выдаче
+    on_way: List[Goods] = field(default_factory=list)  # В пути (без отклонённых, за 30 дней)
+    all_goods: List[Goods] = field(default_factory=list)  # Все товары на ПВЗ и в пути
+    delivered: List[Dict[str, Any]] = field(default_factory=list)  # История выдачи (до 100)
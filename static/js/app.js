@@ -6,8 +6,11 @@
 // ========== API HELPERS ==========
 
 const API = {
-    async get(endpoint) {
-        const response = await fetch(`/api${endpoint}`);
+    // background: запрос по таймеру, не считается действием пользователя
+    async get(endpoint, { background = false, signal } = {}) {
+        const options = background ? { headers: { 'X-Background-Request': '1' } } : {};
+        if (signal) options.signal = signal;
+        const response = await fetch(`/api${endpoint}`, options);
         if (!response.ok) throw new Error(`HTTP ${response.status}`);
         return response.json();
     },
@@ -26,9 +29,133 @@ const API = {
         const response = await fetch(`/api${endpoint}`, { method: 'DELETE' });
         if (!response.ok) throw new Error(`HTTP ${response.status}`);
         return response.json();
+    },
+
+    // Данные для первого показа страницы одним запросом: { id: тело ответа | null }
+    async bootstrap(page, params = {}) {
+        const query = new URLSearchParams(params).toString();
+        const data = await this.get(`/batch/${page}${query ? `?${query}` : ''}`);
+        const bodies = {};
+        for (const [id, result] of Object.entries(data.responses)) {
+            bodies[id] = result.status === 200 ? result.body : null;
+        }
+        return bodies;
+    }
+};
+
+// Пакет первого показа страницы (<body data-bootstrap="...">): один запрос на
+// все виджеты, общий для навигации и самой страницы; null - страница без пакета
+const PageBootstrap = {
+    promise: null,
+
+    get() {
+        if (!this.promise) {
+            const page = document.body.dataset.bootstrap;
+            this.promise = page
+                ? API.bootstrap(page).catch(err => {
+                    console.error('Page bootstrap error:', err);
+                    return {};
+                })
+                : Promise.resolve(null);
+        }
+        return this.promise;
+    }
+};
+
+// ========== LIVE EVENTS (SSE) ==========
+
+// Один поток /api/events на вкладку; при его недоступности - опрос по таймеру
+const LiveEvents = {
+    source: null,
+    connected: false,
+    handlers: {},
+
+    on(type, handler) {
+        if (!this.handlers[type]) {
+            this.handlers[type] = new Set();
+            if (this.source) this.listen(type);
+        }
+        this.handlers[type].add(handler);
+        this.connect();
+        return () => this.handlers[type].delete(handler);
+    },
+
+    connect() {
+        if (this.source || typeof EventSource === 'undefined') return;
+        this.source = new EventSource('/api/events');
+        this.source.onopen = () => { this.connected = true; };
+        // EventSource переподключается сам (сервер закрывает поток раз в несколько минут)
+        this.source.onerror = () => {
+            this.connected = false;
+            if (this.source.readyState === EventSource.CLOSED) {
+                // Ответ не поток (503 - лимит потоков сервера): EventSource сдался,
+                // вкладка обновляется опросом и пробует подключиться позже
+                console.warn('Live events unavailable, falling back to polling');
+                this.source = null;
+                setTimeout(() => this.connect(), 30000);
+            }
+        };
+        Object.keys(this.handlers).forEach(type => this.listen(type));
+    },
+
+    listen(type) {
+        this.source.addEventListener(type, (event) => {
+            let data = null;
+            try {
+                data = JSON.parse(event.data);
+            } catch (e) {
+                return;
+            }
+            this.handlers[type].forEach(handler => handler(data));
+        });
     }
 };
 
+// Опрос, который выполняется только пока нет живого потока событий
+function pollUnlessLive(fn, interval) {
+    return setInterval(() => {
+        if (!LiveEvents.connected) fn();
+    }, interval);
+}
+
+// Следить за заданием загрузки картинок: события image-job, при их отсутствии - опрос прогресса
+function watchImageJob(jobId, progressEndpoint, { onProgress, onFinish, timeout = 300000 }) {
+    let done = false;
+    let unsubscribe = () => {};
+    let pollTimer = null;
+    let guardTimer = null;
+
+    const finish = (status, timedOut = false) => {
+        if (done) return;
+        done = true;
+        unsubscribe();
+        clearInterval(pollTimer);
+        clearTimeout(guardTimer);
+        onFinish(status, timedOut);
+    };
+    const handle = (status) => {
+        if (done || !status) return;
+        if (status.finished) finish(status);
+        else onProgress(status);
+    };
+
+    unsubscribe = LiveEvents.on('image-job', (job) => {
+        if (job.id === jobId) handle(job);
+    });
+    const poll = async () => {
+        try {
+            handle(await API.get(progressEndpoint, { background: true }));
+        } catch (e) {
+            console.error('Progress poll error', e);
+        }
+    };
+    // Первый запрос сразу: задание могло завершиться до подписки (или оказаться пустым)
+    poll();
+    pollTimer = pollUnlessLive(poll, 1000);
+    // Предохранитель: дальше задание продолжается в фоне без индикации
+    guardTimer = setTimeout(() => finish(null, true), timeout);
+}
+
 // ========== TOAST NOTIFICATIONS ==========
 
 const Toast = {
@@ -260,6 +387,7 @@ let autoImageLoadingEnabled = false;
 const backgroundVendorPool = new Set();
 let idlePreloadHandle = null;
 let vendorRefreshTimer = null;
+let unsubscribeVendorCodes = () => {};
 let vendorCodesFetchPromise = null;
 const BACKGROUND_BATCH_SIZE = 40;
 const BACKGROUND_IDLE_TIMEOUT = 1500;
@@ -471,7 +599,9 @@ function startGlobalImagePreload(forceFetch = false) {
     if (!isAutoImageLoadingEnabled()) return;
     checkForNewProducts(forceFetch);
     if (!vendorRefreshTimer) {
-        vendorRefreshTimer = setInterval(() => checkForNewProducts(), VENDOR_CODES_CHECK_INTERVAL);
+        // Новые артикулы приходят событием, опрос - только без потока событий
+        unsubscribeVendorCodes = LiveEvents.on('vendor-codes', () => checkForNewProducts(true));
+        vendorRefreshTimer = pollUnlessLive(() => checkForNewProducts(), VENDOR_CODES_CHECK_INTERVAL);
     }
     scheduleBackgroundBatch();
 }
@@ -480,6 +610,7 @@ function stopGlobalImagePreload() {
     if (vendorRefreshTimer) {
         clearInterval(vendorRefreshTimer);
         vendorRefreshTimer = null;
+        unsubscribeVendorCodes();
     }
     if (idlePreloadHandle !== null) {
         cancelIdle(idlePreloadHandle);
@@ -488,6 +619,7 @@ function stopGlobalImagePreload() {
     backgroundVendorPool.clear();
     priorityImageQueue.length = 0;
     backgroundImageQueue.length = 0;
+    pendingResolveCodes.clear();
     activeRequests = 0;
 }
 
@@ -559,8 +691,9 @@ function setVendorImagesSource(vendorCode, url) {
             unregisterVendorImage(img);
             return;
         }
-        if (url && img.src !== url) {
-            img.src = url;
+        const target = imageVariantUrl(url, img.dataset.imageSize);
+        if (target && img.src !== target) {
+            img.src = target;
         }
         img.classList.remove('pending-image');
         updated++;
@@ -625,90 +758,95 @@ function processImageQueue() {
     processNextBatch();
 }
 
+// Пакетное разрешение картинок на сервере: одним запросом уходит до
+// IMAGE_RESOLVE_BATCH_SIZE артикулов, сервер отдаёт закэшированные сразу,
+// а отсутствующие ставит в фоновую загрузку (без дублей по артикулу)
+const IMAGE_RESOLVE_BATCH_SIZE = 40;
+const IMAGE_RESOLVE_WAIT_SECONDS = 5;
+const pendingResolveCodes = new Set();
+let resolvePollActive = false;
+
+function applyResolvedImages(results) {
+    let cacheChanged = false;
+    Object.entries(results || {}).forEach(([code, info]) => {
+        if (!info) return;
+        if (info.status === 'cached' && info.url) {
+            pendingResolveCodes.delete(code);
+            failedImageUrls.delete(code);
+            workingImageUrls[code] = info.url;
+            setVendorImagesSource(code, info.url);
+            cacheChanged = true;
+        } else if (info.status === 'missing') {
+            pendingResolveCodes.delete(code);
+            failedImageUrls.add(code);
+        } else {
+            pendingResolveCodes.add(code);
+        }
+    });
+    if (cacheChanged) {
+        saveImageCache();
+    }
+}
+
 function processNextBatch() {
     if (!isAutoImageLoadingEnabled()) {
         isProcessingQueue = false;
         return;
     }
-    // Обрабатываем по одному за раз с небольшой задержкой
     if (activeRequests >= MAX_CONCURRENT_REQUESTS) {
         isProcessingQueue = false;
         return;
     }
     
-    let item = priorityImageQueue.shift() || backgroundImageQueue.shift();
-    if (!item) {
-        isProcessingQueue = false;
-        return;
-    }
-    
-    const { img, vendorCode } = item;
-    
-    // Пропускаем если уже знаем что картинки нет или уже в кэше
-    if (failedImageUrls.has(vendorCode)) {
-        processNextBatch(); // Без задержки
-        return;
+    const batch = [];
+    while (batch.length < IMAGE_RESOLVE_BATCH_SIZE) {
+        const item = priorityImageQueue.shift() || backgroundImageQueue.shift();
+        if (!item) break;
+        const code = item.vendorCode;
+        // Пропускаем если уже знаем что картинки нет, она уже в кэше или ждёт загрузки
+        if (failedImageUrls.has(code) || pendingResolveCodes.has(code)) continue;
+        if (workingImageUrls[code]) {
+            setVendorImagesSource(code, workingImageUrls[code]);
+            continue;
+        }
+        if (!batch.includes(code)) batch.push(code);
     }
-    if (workingImageUrls[vendorCode]) {
-        setVendorImagesSource(vendorCode, workingImageUrls[vendorCode]);
-        processNextBatch(); // Без задержки
+    if (!batch.length) {
+        isProcessingQueue = false;
         return;
     }
     
     activeRequests++;
-    
-    // Быстрый запрос - получаем URL по алгоритму (без проверки)
-    fetch(`/api/image/${vendorCode}?size=small`)
-        .then(res => res.json())
+    API.post('/images/resolve', { codes: batch, size: 'small' })
         .then(data => {
-            if (data.url) {
-                // Проверяем что картинка реально загружается
-                const testImg = new Image();
-                testImg.onload = function() {
-                    if (this.naturalWidth > 0 && this.naturalHeight > 0) {
-                        // Картинка загрузилась успешно
-                        workingImageUrls[vendorCode] = data.url;
-                        saveImageCache();
-                        setVendorImagesSource(vendorCode, data.url);
-                    } else {
-                        // Пустая картинка - ищем рабочий URL
-                        findWorkingUrl(vendorCode);
-                    }
-                };
-                testImg.onerror = function() {
-                    // Ошибка загрузки - ищем рабочий URL
-                    findWorkingUrl(vendorCode);
-                };
-                testImg.src = data.url;
-            } else {
-                failedImageUrls.add(vendorCode);
-            }
+            applyResolvedImages(data.results);
+            pollPendingImages();
         })
         .catch(() => {
             // При ошибке сети - не помечаем как failed, может попробуем позже
         })
         .finally(() => {
             activeRequests--;
-            // Задержка между запросами для избежания перегрузки TCP
-            setTimeout(processNextBatch, 100);
+            processNextBatch();
         });
 }
 
-// Поиск рабочего URL через сервер (проверяет разные basket серверы)
-function findWorkingUrl(vendorCode) {
-    fetch(`/api/image/find/${vendorCode}?size=small`)
-        .then(res => res.json())
-        .then(data => {
-            if (data.found && data.url) {
-                workingImageUrls[vendorCode] = data.url;
-                saveImageCache();
-                setVendorImagesSource(vendorCode, data.url);
-            } else {
-                failedImageUrls.add(vendorCode);
-            }
-        })
+// Дожидаемся фоновых загрузок: сервер держит запрос до IMAGE_RESOLVE_WAIT_SECONDS
+// и отвечает, как только завершится хотя бы одна из них
+function pollPendingImages() {
+    if (resolvePollActive || !pendingResolveCodes.size) return;
+    resolvePollActive = true;
+    const codes = Array.from(pendingResolveCodes).slice(0, 200);
+    API.post('/images/resolve', { codes, size: 'small', wait: IMAGE_RESOLVE_WAIT_SECONDS })
+        .then(data => applyResolvedImages(data.results))
         .catch(() => {
-            failedImageUrls.add(vendorCode);
+            codes.forEach(code => pendingResolveCodes.delete(code));
+        })
+        .finally(() => {
+            resolvePollActive = false;
+            if (pendingResolveCodes.size && isAutoImageLoadingEnabled()) {
+                pollPendingImages();
+            }
         });
 }
 
@@ -807,6 +945,17 @@ function getInitialImageSrc(vendorCode, fallbackUrl) {
     return '/static/img/no-image.svg';
 }
 
+// Ссылка на нужный размер картинки из локального кэша (thumb / small / big).
+// Сервер хранит одну мастер-копию и сам получает из неё уменьшенные варианты;
+// версия v в ссылке - версия мастер-копии, поэтому при замене size она остаётся верной
+function imageVariantUrl(url, size) {
+    if (!url || !size || !url.startsWith('/api/cached_image/')) return url;
+    if (/[?&]size=/.test(url)) {
+        return url.replace(/([?&]size=)[^&]*/, `$1${size}`);
+    }
+    return url + (url.includes('?') ? '&' : '?') + `size=${size}`;
+}
+
 function hydrateVendorImages(scope, selector, priority = false, options = {}) {
     if (!scope) return;
     const images = scope.querySelectorAll(selector);
@@ -819,7 +968,7 @@ function hydrateVendorImages(scope, selector, priority = false, options = {}) {
             const fallbackUrl = img.dataset.fallback;
             if (!vendorCode) {
                 if (loadingAllowed && fallbackUrl && !fallbackUrl.includes('no-image')) {
-                    img.src = fallbackUrl;
+                    img.src = imageVariantUrl(fallbackUrl, img.dataset.imageSize);
                     img.classList.remove('pending-image');
                 }
                 return;
@@ -833,7 +982,7 @@ function hydrateVendorImages(scope, selector, priority = false, options = {}) {
             }
 
             if (fallbackUrl && !fallbackUrl.includes('no-image')) {
-                img.src = fallbackUrl;
+                img.src = imageVariantUrl(fallbackUrl, img.dataset.imageSize);
                 img.classList.remove('pending-image');
                 return;
             }
@@ -962,7 +1111,7 @@ function loadVisiblePendingImages() {
                 const fallbackUrl = img.dataset.fallback;
                 if (!vendorCode) {
                     if (loadingAllowed && fallbackUrl && !fallbackUrl.includes('no-image')) {
-                        img.src = fallbackUrl;
+                        img.src = imageVariantUrl(fallbackUrl, img.dataset.imageSize);
                         img.classList.remove('pending-image');
                     }
                     return;
@@ -976,7 +1125,7 @@ function loadVisiblePendingImages() {
                 }
 
                 if (fallbackUrl && !fallbackUrl.includes('no-image')) {
-                    img.src = fallbackUrl;
+                    img.src = imageVariantUrl(fallbackUrl, img.dataset.imageSize);
                     img.classList.remove('pending-image');
                     return;
                 }
@@ -1131,12 +1280,20 @@ function initSearch() {
     });
 }
 
+// Ответ на устаревший запрос не должен перерисовать результаты нового
+let searchController = null;
+
 async function performSearch(query) {
+    if (searchController) searchController.abort();
+    const controller = new AbortController();
+    searchController = controller;
     try {
-        const data = await API.get(`/search?q=${encodeURIComponent(query)}`);
+        const data = await API.get(`/search?q=${encodeURIComponent(query)}`, { signal: controller.signal });
         displaySearchResults(data);
     } catch (err) {
-        console.error('Search error:', err);
+        if (err.name !== 'AbortError') console.error('Search error:', err);
+    } finally {
+        if (searchController === controller) searchController = null;
     }
 }
 
@@ -1198,7 +1355,7 @@ function renderGoodsResult(goods) {
     const div = document.createElement('div');
     div.className = 'search-result-item';
     div.innerHTML = `
-        <img src="${goods.image_url || '/static/img/no-image.svg'}" 
+        <img src="${imageVariantUrl(goods.image_url, 'thumb') || '/static/img/no-image.svg'}" 
              onerror="this.src='/static/img/no-image.svg'" alt="">
         <div class="search-result-info">
             <div class="search-result-title">${goods.info?.brand || ''} ${goods.info?.name || 'Товар'}</div>
@@ -1640,7 +1797,8 @@ function openGoodsModal(goods) {
     }
     
     const modalImage = modal.querySelector('.goods-modal-image');
-    modalImage.src = imageUrl;
+    modalImage.dataset.imageSize = 'big';
+    modalImage.src = imageVariantUrl(imageUrl, 'big');
     modalImage.dataset.vendor = vendorCode || '';
     modalImage.onerror = function() { 
         if(window.retryImage) window.retryImage(this); 
@@ -1652,6 +1810,9 @@ function openGoodsModal(goods) {
         queueImage(modalImage, vendorCode, true);
         processImageQueue();
     }
+
+    // Остальные фото товара подгружаются по мере открытия карточки
+    loadGoodsGallery(modal, vendorCode, goods.info?.pics_cnt || 1);
     
     modal.querySelector('.goods-modal-brand').textContent = goods.info?.brand || 'Бренд';
     modal.querySelector('.goods-modal-name').textContent = goods.info?.name || 'Товар';
@@ -1869,6 +2030,92 @@ function openProfileGoodsCard(node) {
     }
 }
 
+// ========== ГАЛЕРЕЯ В КАРТОЧКЕ ТОВАРА ==========
+
+let galleryAbortController = null;
+
+async function loadGoodsGallery(modal, vendorCode, picsCount) {
+    const strip = modal.querySelector('.goods-modal-gallery');
+    if (!strip) return;
+    if (galleryAbortController) galleryAbortController.abort();
+    galleryAbortController = null;
+    strip.innerHTML = '';
+    strip.style.display = 'none';
+
+    const count = Math.min(picsCount, 10);
+    if (!vendorCode || count < 2) return;
+
+    const mainImage = modal.querySelector('.goods-modal-image');
+    const firstImageUrl = mainImage.src;
+    const thumbs = new Map();
+
+    const select = (thumb) => {
+        strip.querySelectorAll('.goods-modal-thumb').forEach(t => t.classList.toggle('active', t === thumb));
+        const url = thumb.dataset.full;
+        // Первое фото управляется общей загрузкой картинок, остальные - только галереей
+        mainImage.dataset.vendor = thumb.dataset.num === '1' ? vendorCode : '';
+        mainImage.src = url;
+    };
+    const addThumb = (num, url) => {
+        const thumb = document.createElement('button');
+        thumb.type = 'button';
+        thumb.className = 'goods-modal-thumb' + (url ? '' : ' loading');
+        thumb.dataset.num = num;
+        if (url) {
+            thumb.dataset.full = url;
+            thumb.innerHTML = `<img src="${imageVariantUrl(url, 'thumb')}" alt="">`;
+        }
+        thumb.onclick = () => { if (thumb.dataset.full) select(thumb); };
+        strip.appendChild(thumb);
+        thumbs.set(num, thumb);
+        return thumb;
+    };
+
+    addThumb(1, firstImageUrl).classList.add('active');
+    for (let num = 2; num <= count; num++) addThumb(num, null);
+    strip.style.display = '';
+
+    const controller = new AbortController();
+    galleryAbortController = controller;
+    try {
+        const response = await fetch(
+            `/api/image/gallery/${encodeURIComponent(vendorCode)}?count=${count}&size=big`,
+            { signal: controller.signal }
+        );
+        if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+
+        // Ответ приходит построчно (NDJSON) - показываем фото по мере загрузки
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(Boolean).forEach(line => {
+                const { num, url } = JSON.parse(line);
+                const thumb = thumbs.get(num);
+                if (!thumb) return;
+                if (!url) {
+                    thumb.remove();
+                    return;
+                }
+                thumb.classList.remove('loading');
+                thumb.dataset.full = url;
+                thumb.innerHTML = `<img src="${imageVariantUrl(url, 'thumb')}" alt="">`;
+            });
+        }
+    } catch (e) {
+        if (e.name === 'AbortError') return;
+        console.error('Gallery load error', e);
+    }
+    // Фото, которые так и не пришли, убираем
+    strip.querySelectorAll('.goods-modal-thumb.loading').forEach(t => t.remove());
+    if (strip.children.length < 2) strip.style.display = 'none';
+}
+
 function createGoodsModal() {
     const modal = document.createElement('div');
     modal.id = 'goods-modal';
@@ -1892,6 +2139,7 @@ function createGoodsModal() {
                                 <svg fill="none" stroke="currentColor" stroke-width="2" viewBox="0 0 24 24"><path stroke-linecap="round" stroke-linejoin="round" d="M4 4v5h.582m15.356 2A8.001 8.001 0 004.582 9m0 0H9m11 11v-5h-.581m0 0a8.003 8.003 0 01-15.357-2m15.357 2H15"/></svg>
                             </button>
                         </div>
+                        <div class="goods-modal-gallery" style="display:none"></div>
                         <div class="goods-modal-actions">
                             <a class="btn btn-secondary btn-buyer-link" href="#" data-field="buyer-link">
                                 <svg width="18" height="18" fill="none" stroke="currentColor" stroke-width="2" viewBox="0 0 24 24">
@@ -2427,21 +2675,24 @@ function getPlural(n) {
 
 // ========== STATS ==========
 
-async function loadStats() {
+// background: опрос по таймеру (не мешает предзагрузке изображений в простое)
+async function loadStats({ background = false } = {}) {
     try {
-        const stats = await API.get('/stats');
-        
-        document.querySelectorAll('[data-stat]').forEach(el => {
-            const key = el.dataset.stat;
-            if (stats[key] !== undefined) {
-                animateNumber(el, stats[key]);
-            }
-        });
+        applyStats(await API.get('/stats', { background }));
     } catch (err) {
         console.error('Load stats error:', err);
     }
 }
 
+function applyStats(stats) {
+    document.querySelectorAll('[data-stat]').forEach(el => {
+        const key = el.dataset.stat;
+        if (stats[key] !== undefined) {
+            animateNumber(el, stats[key]);
+        }
+    });
+}
+
 function animateNumber(element, target) {
     const duration = 600;
     const start = parseInt(element.textContent) || 0;
@@ -2790,60 +3041,43 @@ async function updateAllBuyerImages(userSid, type = 'all') {
                 });
             }
 
-            // Запускаем поллинг прогресса
-            let isFinished = false;
-            const pollInterval = setInterval(async () => {
-                try {
-                    const status = await API.get(`/buyer/${userSid}/download-progress`);
-
-                    if (status.finished) {
-                        isFinished = true;
-                        clearInterval(pollInterval);
-                        if (progressToast) progressToast.remove();
-                        Toast.success(`Загрузка завершена (${status.total} товаров)`);
-                        // Финальное обновление
-                        if (typeof failedImageUrls !== 'undefined') {
-                            document.querySelectorAll('img[data-vendor]').forEach(img => {
-                                const code = img.dataset.vendor;
-                                if (code) failedImageUrls.delete(code);
-                            });
-                        }
-                        await checkVisibleImagesStatus();
-                        loadVisiblePendingImages();
-                        return;
-                    }
+            // Следим за прогрессом (события SSE, без них - опрос)
+            let lastImagesRefresh = 0;
+            const refreshVisibleImages = async () => {
+                // Сбрасываем кэш ошибок для видимых картинок, чтобы они перепроверились
+                if (typeof failedImageUrls !== 'undefined') {
+                    document.querySelectorAll('img[data-vendor]').forEach(img => {
+                        const code = img.dataset.vendor;
+                        if (code) failedImageUrls.delete(code);
+                    });
+                }
+                // Проверяем статус картинок на сервере и обновляем картинки на экране
+                await checkVisibleImagesStatus();
+                loadVisiblePendingImages();
+            };
 
+            watchImageJob(res.job_id, `/buyer/${userSid}/download-progress`, {
+                onProgress: (status) => {
                     if (progressToast) {
                         progressToast.update(`Скачано ${status.current} из ${status.total}`);
                     }
-
-                    // Сбрасываем кэш ошибок для видимых картинок, чтобы они перепроверились
-                    if (typeof failedImageUrls !== 'undefined') {
-                        document.querySelectorAll('img[data-vendor]').forEach(img => {
-                            const code = img.dataset.vendor;
-                            if (code) failedImageUrls.delete(code);
-                        });
+                    // События идут чаще опроса - картинки перепроверяем не чаще раза в секунду
+                    if (Date.now() - lastImagesRefresh >= 1000) {
+                        lastImagesRefresh = Date.now();
+                        refreshVisibleImages();
                     }
-
-                    // Проверяем статус картинок на сервере
-                    await checkVisibleImagesStatus();
-
-                    // Обновляем картинки на экране
-                    loadVisiblePendingImages();
-
-                } catch (e) {
-                    console.error('Progress poll error', e);
-                }
-            }, 1000);
-
-            // Предохранитель на 5 минут
-            setTimeout(() => {
-                if (!isFinished) {
-                    clearInterval(pollInterval);
+                },
+                onFinish: async (status, timedOut) => {
                     if (progressToast) progressToast.remove();
-                    Toast.info('Загрузка продолжается в фоне...');
+                    if (timedOut) {
+                        Toast.info('Загрузка продолжается в фоне...');
+                        return;
+                    }
+                    Toast.success(`Загрузка завершена (${status.total} товаров)`);
+                    // Финальное обновление
+                    await refreshVisibleImages();
                 }
-            }, 300000);
+            });
 
         } else {
             if (progressToast) progressToast.remove();
@@ -2876,7 +3110,11 @@ document.addEventListener('DOMContentLoaded', () => {
     
     // Загрузка статистики на главной
     if (document.querySelector('[data-stat]')) {
-        scheduleHydrationTask(() => loadStats(), { timeout: 200 });
+        // Со страничным пакетом счётчики заполняет сама страница
+        if (!document.body.dataset.bootstrap) {
+            scheduleHydrationTask(() => loadStats(), { timeout: 200 });
+        }
+        LiveEvents.on('stats', applyStats);
     }
     
     // Загрузка товаров
@@ -3006,10 +3244,10 @@ function showOrderModal(orders) {
     const modalItems = orders.map(item => {
         const vendorCode = item.vendor_code ? String(item.vendor_code) : '';
         const fallbackUrl = item.image_url || '';
-        const imgSrc = getInitialImageSrc(vendorCode, fallbackUrl);
+        const imgSrc = imageVariantUrl(getInitialImageSrc(vendorCode, fallbackUrl), 'thumb');
         return `
             <div class="order-modal-item" onclick="openDeliveredGoodsModal(${JSON.stringify(item).replace(/"/g, '&quot;')})">
-                <img src="${imgSrc}" alt="" data-vendor="${vendorCode}" data-fallback="${fallbackUrl}" loading="lazy"
+                <img src="${imgSrc}" alt="" data-vendor="${vendorCode}" data-fallback="${fallbackUrl}" data-image-size="thumb" loading="lazy"
                      onerror="if(window.retryImage) window.retryImage(this); else this.src='/static/img/no-image.svg';">
                 <div class="order-modal-item-info">
                     <div class="order-modal-item-brand">${item.info?.brand || ''}</div>
@@ -3075,69 +3313,54 @@ async function updateBuyerCategoryImages(userSid, type) {
                 });
             }
 
-            // Запускаем поллинг прогресса
-            let isFinished = false;
-            const pollInterval = setInterval(async () => {
-                try {
-                    const status = await API.get(`/buyer/${userSid}/download-progress`);
-
-                    if (status.finished) {
-                        isFinished = true;
-                        clearInterval(pollInterval);
-                        if (progressToast) progressToast.remove();
-                        Toast.success(`Загрузка завершена (${status.total} товаров)`);
-
-                        // Финальное обновление
-                        if (typeof failedImageUrls !== 'undefined') {
-                            document.querySelectorAll('img[data-vendor]').forEach(img => {
-                                const code = img.dataset.vendor;
-                                if (code) failedImageUrls.delete(code);
-                            });
-                        }
-
-                        // Если есть функции обновления UI
-                        if (typeof checkVisibleImagesStatus === 'function') {
-                            await checkVisibleImagesStatus();
-                        }
-                        if (typeof loadVisiblePendingImages === 'function') {
-                            loadVisiblePendingImages();
-                        }
-
-                        // Обновляем список товаров в секции если она открыта
-                        const section = document.querySelector(`.tryon-goods-section[data-buyer="${userSid}"][data-type="${type}"]`);
-                        if (section && section.classList.contains('expanded')) {
-                            // Перезагружаем список чтобы отобразить картинки
-                            const list = section.querySelector('.tryon-goods-list');
-                            if (list) {
-                                // Сбрасываем кэш списка чтобы он перерисовался
-                                if (typeof tryOnGoodsCache !== 'undefined') {
-                                    const cacheKey = `${userSid}:${type}`;
-                                    tryOnGoodsCache.delete(cacheKey);
-                                }
-                                section.dataset.loaded = 'false';
-                                toggleTryOnGoodsSection(section, { user_sid: userSid }, type);
-                            }
-                        }
+            // Следим за прогрессом (события SSE, без них - опрос)
+            watchImageJob(res.job_id, `/buyer/${userSid}/download-progress`, {
+                onProgress: (status) => {
+                    if (progressToast) {
+                        progressToast.update(`Скачано ${status.current} из ${status.total}`);
+                    }
+                },
+                onFinish: async (status, timedOut) => {
+                    if (progressToast) progressToast.remove();
+                    if (timedOut) {
+                        Toast.info('Загрузка продолжается в фоне...');
                         return;
                     }
+                    Toast.success(`Загрузка завершена (${status.total} товаров)`);
 
-                    if (progressToast) {
-                        progressToast.update(`Скачано ${status.current} из ${status.total}`);
+                    // Финальное обновление
+                    if (typeof failedImageUrls !== 'undefined') {
+                        document.querySelectorAll('img[data-vendor]').forEach(img => {
+                            const code = img.dataset.vendor;
+                            if (code) failedImageUrls.delete(code);
+                        });
                     }
 
-                } catch (e) {
-                    console.error('Progress poll error', e);
-                }
-            }, 1000);
+                    // Если есть функции обновления UI
+                    if (typeof checkVisibleImagesStatus === 'function') {
+                        await checkVisibleImagesStatus();
+                    }
+                    if (typeof loadVisiblePendingImages === 'function') {
+                        loadVisiblePendingImages();
+                    }
 
-            // Предохранитель на 5 минут
-            setTimeout(() => {
-                if (!isFinished) {
-                    clearInterval(pollInterval);
-                    if (progressToast) progressToast.remove();
-                    Toast.info('Загрузка продолжается в фоне...');
+                    // Обновляем список товаров в секции если она открыта
+                    const section = document.querySelector(`.tryon-goods-section[data-buyer="${userSid}"][data-type="${type}"]`);
+                    if (section && section.classList.contains('expanded')) {
+                        // Перезагружаем список чтобы отобразить картинки
+                        const list = section.querySelector('.tryon-goods-list');
+                        if (list) {
+                            // Сбрасываем кэш списка чтобы он перерисовался
+                            if (typeof tryOnGoodsCache !== 'undefined') {
+                                const cacheKey = `${userSid}:${type}`;
+                                tryOnGoodsCache.delete(cacheKey);
+                            }
+                            section.dataset.loaded = 'false';
+                            toggleTryOnGoodsSection(section, { user_sid: userSid }, type);
+                        }
+                    }
                 }
-            }, 300000);
+            });
 
         } else {
             if (progressToast) progressToast.remove();
@@ -0,0 +1,171 @@
+"""
+Локальный стенд basket-серверов WB для офлайн-замеров.
+
+Отдаёт сгенерированные webp по той же схеме URL, что и basket-NN.wbbasket.ru,
+с настраиваемой задержкой, долей ошибок и диапазонами nm_id на каждом хосте.
+Клиент подключается через WildberriesAPI.map_hosts(stub.base_url): запросы
+приходят как /{basket-хост}/vol{vol}/part{part}/{nm_id}/images/{размер}/{num}.webp
+"""
+import io
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.wb_api import WildberriesAPI
+
+IMAGE_PATH = re.compile(
+    r"^/(?P<host>[^/]+)/vol(?P<vol>\d+)/part(?P<part>\d+)/(?P<nm>\d+)"
+    r"/images/(?P<size>c\d+x\d+)/(?P<num>\d+)\.webp$"
+)
+
+
+class _QuietServer(ThreadingHTTPServer):
+    """Клиент рвёт соединения отменённых проб - это не ошибка стенда"""
+
+    def handle_error(self, request, client_address):
+        pass
+
+
+@dataclass
+class StubHost:
+    """Поведение одного basket-хоста"""
+    latency: float = 0.0                # задержка ответа (сек)
+    error_rate: float = 0.0             # доля ответов 503
+    nm_ranges: List[Tuple[int, int]] = field(default_factory=list)  # [от, до) nm_id
+    pics: int = 10                      # изображений у каждого товара
+
+    def serves(self, nm_id: int, num: int) -> bool:
+        return num <= self.pics and any(lo <= nm_id < hi for lo, hi in self.nm_ranges)
+
+
+def table_layout(vendor_codes: Iterable[str], shift: int = 0, **host_options) -> Dict[str, StubHost]:
+    """
+    Разложить артикулы по хостам согласно расчётной таблице WildberriesAPI.
+
+    Args:
+        vendor_codes: Артикулы, которые должен отдавать стенд
+        shift: Смещение номера basket (не 0 - таблица клиента "устарела")
+        host_options: Параметры StubHost для всех хостов
+    """
+    hosts: Dict[str, StubHost] = {}
+    for vc in vendor_codes:
+        basket = WildberriesAPI.get_basket_number(vc) + shift
+        host = f"basket-{basket:02d}.wbbasket.ru"
+        hosts.setdefault(host, StubHost(**host_options)).nm_ranges.append((int(vc), int(vc) + 1))
+    return hosts
+
+
+class BasketStub:
+    """
+    HTTP-стенд (поток на соединение, keep-alive).
+
+    with BasketStub(table_layout(codes, latency=0.02)) as stub:
+        api.map_hosts(stub.base_url)
+    """
+
+    SIZES = {"c516x688": (516, 688), "c246x328": (246, 328), "c100x100": (100, 100)}
+
+    def __init__(self, hosts: Optional[Dict[str, StubHost]] = None, seed: int = 0):
+        self.hosts = hosts or {}
+        self.requests: Counter = Counter()  # хост -> число запросов
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._images: Dict[str, bytes] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def image(self, size: str) -> bytes:
+        """Настоящий webp нужного размера (генерируется один раз)"""
+        with self._lock:
+            data = self._images.get(size)
+            if data is None:
+                from PIL import Image
+                buffer = io.BytesIO()
+                Image.new("RGB", self.SIZES[size], (203, 17, 171)).save(buffer, "WEBP", quality=80)
+                data = self._images[size] = buffer.getvalue()
+            return data
+
+    def _fails(self, host: StubHost) -> bool:
+        with self._lock:
+            return self._random.random() < host.error_rate
+
+    def respond(self, path: str) -> Tuple[int, bytes]:
+        """Статус и тело ответа на путь запроса"""
+        hostname = path.strip("/").split("/", 1)[0]
+        host = self.hosts.get(hostname)
+        with self._lock:
+            self.requests[hostname] += 1
+        if host is None:
+            return 404, b""
+        if host.latency:
+            time.sleep(host.latency)
+        if self._fails(host):
+            return 503, b""
+        match = IMAGE_PATH.match(path)
+        if match is None:
+            # Корень хоста (прогрев соединений)
+            return (200, b"") if path.rstrip("/") == f"/{hostname}" else (404, b"")
+        nm_id, num = int(match["nm"]), int(match["num"])
+        vol, part = WildberriesAPI.get_vol_part(nm_id)
+        if (int(match["vol"]), int(match["part"])) != (vol, part) or not host.serves(nm_id, num):
+            return 404, b""
+        return 200, self.image(match["size"])
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Заголовки и тело уходят разными записями - без Nagle нет задержки ACK
+            disable_nagle_algorithm = True
+
+            def _reply(self, with_body: bool):
+                status, body = stub.respond(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", "image/webp" if body else "text/plain")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if with_body:
+                    self.wfile.write(body)
+
+            def do_GET(self):
+                self._reply(True)
+
+            def do_HEAD(self):
+                self._reply(False)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "BasketStub":
+        self._server = _QuietServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="Basket_Stub", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "BasketStub":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
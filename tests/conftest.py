@@ -0,0 +1,33 @@
+import sqlite3
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database.database_manager import DatabaseManager
+
+
+@pytest.fixture
+def make_manager(tmp_path):
+    """
+    Фабрика DatabaseManager над временной БД: make_manager(seed),
+    где seed(conn) создаёт и заполняет нужные тесту таблицы
+    """
+    def make(seed) -> DatabaseManager:
+        path = tmp_path / "wb.sqlite"
+        conn = sqlite3.connect(path)
+        seed(conn)
+        conn.commit()
+        conn.close()
+        # Мимо синглтона: у каждого теста своя БД
+        manager = object.__new__(DatabaseManager)
+        manager._initialized = False
+        with patch('database.database_manager.DATABASE_PATH', path), \
+                patch('database.database_manager.CUSTOM_BUYERS_FILE', tmp_path / "custom.json"):
+            manager.__init__()
+        return manager
+    return make
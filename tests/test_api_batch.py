@@ -0,0 +1,76 @@
+import sqlite3
+import sys
+import threading
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flask import Flask, jsonify
+
+from utils.batch import BatchExecutor
+from utils.json_provider import FastJSONProvider
+
+
+def seed(conn):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE surplus_goods (goods_uid TEXT)")
+    conn.execute("INSERT INTO surplus_goods VALUES ('a')")
+
+
+def test_batch_runs_concurrently_over_one_snapshot(tmp_path, make_manager):
+    manager = make_manager(seed)
+    path = tmp_path / "wb.sqlite"
+    app = Flask(__name__, static_folder=None)
+    app.json = FastJSONProvider(app)
+    batch = BatchExecutor(app, snapshot=manager.snapshot)
+    first_read = threading.Event()
+
+    @app.route('/api/first')
+    def first():
+        count = manager.get_surplus_count()
+        # Пока пакет выполняется, WB ПВЗ добавляет строку
+        writer = sqlite3.connect(path)
+        writer.execute("INSERT INTO surplus_goods VALUES ('b')")
+        writer.commit()
+        writer.close()
+        first_read.set()
+        return jsonify({'count': count})
+
+    @app.route('/api/second')
+    def second():
+        assert first_read.wait(5)
+        return jsonify({'count': manager.get_surplus_count()})
+
+    @app.route('/api/text')
+    def text():
+        return 'plain'
+
+    with app.test_request_context('/api/batch'):
+        response = batch.execute([{'id': 'first', 'path': '/api/first'}, {'id': 'second', 'path': '/second'},
+                                  {'id': 'text', 'path': '/api/text'}, {'id': 'missing', 'path': '/api/nope'}])
+    responses = response.get_json()['responses']
+    # Оба подзапроса видят одно состояние БД; вне пакета строка уже видна
+    assert responses['first'] == {'status': 200, 'body': {'count': 1}}
+    assert responses['second'] == {'status': 200, 'body': {'count': 1}}
+    assert responses['text'] == {'status': 200, 'body': 'plain'}
+    assert responses['missing']['status'] == 404
+    assert manager.get_surplus_count() == 2
+
+
+def test_batch_rejects_unsafe_requests(tmp_path):
+    app = Flask(__name__, static_folder=None)
+    batch = BatchExecutor(app)
+    for items in ([], [{'path': '/api/batch'}], [{'path': '/api/events'}],
+                  [{'path': '/api/surplus/clear', 'method': 'POST'}],
+                  [{'path': 'http://example.com/api/stats'}],
+                  [{'id': 'a', 'path': '/api/stats'}, {'id': 'a', 'path': '/api/stats'}]):
+        try:
+            batch.normalize(items)
+        except ValueError:
+            continue
+        raise AssertionError(f"accepted: {items}")
+    assert batch.normalize(['stats', {'path': '/api/images/check-status', 'method': 'post',
+                                      'json': {'codes': []}}]) == [
+        ('0', 'GET', '/api/stats', None),
+        ('1', 'POST', '/api/images/check-status', {'codes': []})]
@@ -0,0 +1,72 @@
+import asyncio
+import concurrent.futures
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import pytest
+
+from api.async_fetcher import AsyncImageFetcher
+
+
+class ImageHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "3")
+        self.end_headers()
+        self.wfile.write(b"img")
+
+    def log_message(self, *args):
+        pass
+
+
+def test_keepalive_reuse_and_dns_cache_are_counted():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ImageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    fetcher = AsyncImageFetcher()
+    url = f"http://localhost:{server.server_port}/1.webp"
+    try:
+        for _ in range(3):
+            assert fetcher.run(fetcher.fetch(url), timeout=5) == (200, b"img")
+        stats = fetcher.stats()
+    finally:
+        fetcher.close()
+        server.shutdown()
+
+    assert stats["connections_created"] == 1
+    assert stats["connections_reused"] == 2
+    assert stats["dns_misses"] == 1
+    assert stats["dns_cached_hosts"] == 1
+
+
+def test_run_is_cancelled_by_flag_before_timeout():
+    fetcher = AsyncImageFetcher()
+    cancel = threading.Event()
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    threading.Timer(0.1, cancel.set).start()
+    started = time.monotonic()
+    try:
+        with pytest.raises(concurrent.futures.CancelledError):
+            fetcher.run(slow(), timeout=20, cancel=cancel)
+        elapsed = time.monotonic() - started
+        time.sleep(0.1)
+    finally:
+        fetcher.close()
+    # Отмена срабатывает сразу, корутина в цикле движка тоже отменена
+    assert elapsed < 1
+    assert cancelled == [True]
@@ -0,0 +1,51 @@
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def seed(conn):
+    conn.executescript("""
+        CREATE TABLE buyers (user_sid TEXT, mobile TEXT, name TEXT, user_id TEXT);
+        CREATE TABLE buyers_with_cells (user_sid TEXT, cell TEXT, status_updated TEXT);
+        CREATE TABLE goods_in_pick_point (item_uid TEXT, buyer_sid TEXT, scanned_code TEXT, vendor_code INTEGER,
+            cell TEXT, status TEXT, price INTEGER, price_with_sale INTEGER, priority_order INTEGER,
+            info TEXT, status_updated TEXT);
+        CREATE TABLE goods_on_way (item_uid TEXT, buyer_sid TEXT, shk_code INTEGER, vendor_code INTEGER,
+            status TEXT, status_updated TEXT, info TEXT);
+        CREATE TABLE delivered_goods (goods_uid TEXT, order_id TEXT, delivery_unix_timestamp INTEGER);
+    """)
+    conn.execute("INSERT INTO buyers VALUES ('sid', '79991234567', '', '1')")
+    conn.execute("INSERT INTO buyers_with_cells VALUES ('sid', '42', '')")
+    statuses = ['GOODS_READY', 'GOODS_DELIVERED', 'GOODS_READY', 'GOODS_DELIVERED', 'GOODS_RECIEVED']
+    for i, status in enumerate(statuses):
+        conn.execute("INSERT INTO goods_in_pick_point VALUES (?,?,?,?,?,?,?,?,?,?,?)",
+                     (f"p{i}", 'sid', f"*{i}", 100 + i, '42', status, 900, 800, i % 3,
+                      '{"brand": "B"}', f"2025-07-0{i + 1}T10:00:00Z"))
+    conn.execute("INSERT INTO goods_in_pick_point VALUES ('x', 'other', '', 1, '1', 'GOODS_READY', 0, 0, 0, '', '')")
+    recent = (datetime.now(timezone.utc) - timedelta(days=2)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    for i, (status, updated) in enumerate([('GOODS_RECIEVED', recent), ('GOODS_DECLINED', recent),
+                                            ('GOODS_RECIEVED', '2020-01-01T00:00:00Z')]):
+        conn.execute("INSERT INTO goods_on_way VALUES (?,?,?,?,?,?,?)",
+                     (f"w{i}", 'sid', 5000 + i, 200 + i, status, updated, ''))
+    conn.execute("INSERT INTO delivered_goods VALUES ('p1', 'o1', 1751300000)")
+    conn.execute("INSERT INTO delivered_goods VALUES ('p3', 'o2', 1751400000)")
+    conn.execute("INSERT INTO delivered_goods VALUES ('p4', 'o3', NULL)")
+
+
+def test_snapshot_matches_separate_queries(make_manager):
+    manager = make_manager(seed)
+    snapshot = manager.get_buyer_snapshot('sid')
+
+    assert snapshot.buyer == manager.get_buyer_by_sid('sid')
+    assert snapshot.ready == manager.get_goods_by_buyer('sid')
+    assert snapshot.on_way == manager.get_goods_on_way_by_buyer('sid')
+    assert snapshot.all_goods == manager.get_all_goods_by_buyer('sid')
+    assert snapshot.delivered == manager.get_buyer_delivered_goods('sid')
+    assert [g.item_uid for g in snapshot.on_way] == ['w0']
+    assert [d['order_id'] for d in snapshot.delivered] == ['o2', 'o1', 'o3']
+
+    assert manager.get_buyer_snapshot('sid', delivered_limit=0).delivered == []
+    assert manager.get_buyer_snapshot('nobody').buyer is None
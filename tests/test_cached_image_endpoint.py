@@ -0,0 +1,75 @@
+import io
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+with patch('database.database_manager.DatabaseManager'):
+    import main
+
+from PIL import Image
+
+from api.image_cache import ImageCache
+
+
+def test_cached_image_etag_and_immutable_headers(tmp_path):
+    cache = ImageCache(tmp_path, hot_bytes=1024 * 1024)
+    with patch.object(main.wb_api, 'cache', cache):
+        cache.put("100", 1, "small", b"RIFF....WEBPdata")
+        url = main.cached_image_url("100")
+        client = main.app.test_client()
+
+        first = client.get(url)
+        assert first.status_code == 200
+        assert first.data == b"RIFF....WEBPdata"
+        assert 'immutable' in first.headers['Cache-Control']
+        etag = first.headers['ETag']
+
+        unversioned = client.get("/api/cached_image/100?size=small&num=1")
+        assert unversioned.headers['Cache-Control'] == 'no-cache'
+
+        revalidated = client.get(url, headers={'If-None-Match': etag})
+        assert revalidated.status_code == 304
+        assert revalidated.data == b""
+
+
+def test_cached_image_missing_returns_404(tmp_path):
+    with patch.object(main.wb_api, 'cache', ImageCache(tmp_path)):
+        response = main.app.test_client().get("/api/cached_image/404404?size=small")
+    assert response.status_code == 404
+
+
+def test_resolve_images_rejects_malformed_input():
+    client = main.app.test_client()
+    for body in ({'codes': 'abc'}, {'codes': {'a': 1}}, {'codes': [1, 2]}, {'codes': ['1'], 'wait': 'x'},
+                 {'codes': ['1'], 'size': 'huge'}, ['1']):
+        response = client.post("/api/images/resolve", json=body)
+        assert response.status_code == 400
+        assert 'error' in response.get_json()
+
+    with patch.object(main.wb_api, 'resolve_images', return_value={'1': {'status': 'missing'}}) as resolve:
+        response = client.post("/api/images/resolve", json={'codes': ['1'], 'wait': 30})
+    assert response.status_code == 200
+    resolve.assert_called_once_with(['1'], 'small', wait=10)
+
+
+def test_variant_urls_share_the_master_version(tmp_path):
+    cache = ImageCache(tmp_path)
+    try:
+        with patch.object(main.wb_api, 'cache', cache):
+            master = io.BytesIO()
+            Image.new("RGB", (516, 688), (20, 120, 200)).save(master, format="WEBP")
+            cache.put("700", 1, "big", master.getvalue())
+            small_url = main.cached_image_url("700", 1, "small")
+            assert small_url == main.cached_image_url("700", 1, "big").replace("size=big", "size=small")
+
+            # Как imageVariantUrl на фронтенде: меняется только size, v остаётся
+            client = main.app.test_client()
+            for size in ("small", "thumb"):
+                response = client.get(small_url.replace("size=small", f"size={size}"))
+                assert response.status_code == 200
+                assert 'immutable' in response.headers['Cache-Control']
+    finally:
+        main.wb_api.variants.shutdown()
@@ -0,0 +1,69 @@
+import gzip
+import sys
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flask import Flask, Response, jsonify
+
+from utils.compression import Compression, choose_encoding
+
+
+def make_app(tmp_path):
+    static = tmp_path / "static"
+    (static / "js").mkdir(parents=True)
+    (static / "js" / "app.js").write_text("console.log('wb');\n" * 500)
+    app = Flask(__name__, static_folder=str(static))
+    Compression(app, min_size=1024, precompressed_dir=tmp_path / "precompressed")
+
+    @app.route('/big')
+    def big():
+        return jsonify({'goods': [{'vendor_code': str(i), 'cell': i % 50} for i in range(500)]})
+
+    @app.route('/small')
+    def small():
+        return jsonify({'ok': True})
+
+    @app.route('/lines')
+    def lines():
+        return Response((f'{{"num": {i}}}\n' for i in range(100)), mimetype='application/x-ndjson')
+
+    @app.route('/events')
+    def events():
+        return Response(iter(["event: stats\ndata: {}\n\n"]), mimetype='text/event-stream')
+
+    return app
+
+
+def test_json_and_streams_are_gzipped_above_threshold(tmp_path):
+    client = make_app(tmp_path).test_client()
+    headers = {'Accept-Encoding': 'gzip, deflate'}
+
+    big = client.get('/big', headers=headers)
+    assert big.headers['Content-Encoding'] == 'gzip'
+    assert b'"vendor_code":"499"' in gzip.decompress(big.data).replace(b' ', b'')
+    assert 'Accept-Encoding' in big.headers['Vary']
+
+    assert 'Content-Encoding' not in client.get('/small', headers=headers).headers
+    assert 'Content-Encoding' not in client.get('/big').headers
+
+    lines = client.get('/lines', headers=headers)
+    assert gzip.decompress(lines.data).count(b'\n') == 100
+    assert 'Content-Encoding' not in client.get('/events', headers=headers).headers
+
+
+def test_static_served_precompressed(tmp_path):
+    client = make_app(tmp_path).test_client()
+    assert (tmp_path / "precompressed" / "js" / "app.js.gz").exists()
+
+    response = client.get('/static/js/app.js', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.mimetype in ('text/javascript', 'application/javascript')
+    assert gzip.decompress(response.data).startswith(b"console.log")
+    response.close()
+
+    plain = client.get('/static/js/app.js', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    plain.close()
+    assert choose_encoding('gzip;q=0, br;q=0') is None
@@ -0,0 +1,45 @@
+import sys
+import threading
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.event_bus import EventBus, ChangeWatcher
+
+
+def test_stream_delivers_events_and_ends_after_lifetime():
+    bus = EventBus(heartbeat=0.05, max_lifetime=0.3)
+    sub = bus.subscribe()
+    bus.publish("stats", {"goods": 1})
+
+    chunks = list(bus.stream(sub))
+
+    assert chunks[0].startswith("retry:")
+    assert chunks[1] == 'event: stats\ndata: {"goods":1}\n\n'
+    assert ": ping\n\n" in chunks
+    # Поток закрылся по времени жизни и освободил место
+    assert bus.subscriber_count == 0
+
+
+def test_subscriber_limit():
+    bus = EventBus(max_subscribers=1)
+    assert bus.subscribe() is not None
+    assert bus.subscribe() is None
+    assert bus.rejected == 1
+
+
+def test_watcher_runs_only_with_subscribers_and_publishes_changes():
+    bus = EventBus()
+    version = [1]
+    changed = threading.Event()
+    watcher = ChangeWatcher(bus, check=lambda: version[0], on_change=changed.set, interval=0.01)
+
+    sub = bus.subscribe()
+    # Дожидаемся исходной версии, затем меняем её
+    while watcher._version is None:
+        threading.Event().wait(0.01)
+    version[0] = 2
+    assert changed.wait(2)
+
+    bus.unsubscribe(sub)
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+with patch('database.database_manager.DatabaseManager'):
+    import main
+
+
+def seed(conn):
+    conn.execute("""CREATE TABLE goods_in_pick_point (item_uid TEXT, buyer_sid TEXT, scanned_code TEXT,
+        encoded_scanned_code TEXT, vendor_code INTEGER, cell TEXT, status TEXT, price INTEGER,
+        price_with_sale INTEGER, is_paid INTEGER, priority_order INTEGER, payment_type TEXT,
+        info TEXT, sticker_code TEXT, barcode TEXT)""")
+    conn.execute("""CREATE TABLE goods_on_way (item_uid TEXT, buyer_sid TEXT, shk_code INTEGER,
+        vendor_code INTEGER, status TEXT, status_updated TEXT, info TEXT, sticker_code TEXT, barcode TEXT)""")
+    for i in range(3):
+        conn.execute("INSERT INTO goods_in_pick_point VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)",
+                     (f"uid{i}", "sid", f"*{i}", "", 1000 + i, str(10 + i), 'GOODS_READY', 500, 450,
+                      1, i, 'card', '{"brand": "Бренд", "name": "Платье"}', '', ''))
+
+
+def test_projection_pushed_into_select(make_manager):
+    manager = make_manager(seed)
+    columns = main.GOODS_FIELDS.columns(['scanned_code', 'image_url', 'status_display'])
+    assert columns == ['item_uid', 'buyer_sid', 'scanned_code', 'shk_code', 'vendor_code', 'status']
+    with manager.get_connection() as conn:
+        # shk_code есть только в goods_on_way, scanned_code - только на ПВЗ
+        assert manager._select(conn, 'goods_in_pick_point', columns) == \
+            'item_uid, buyer_sid, scanned_code, vendor_code, status'
+        assert manager._select(conn, 'goods_on_way', columns) == \
+            'item_uid, buyer_sid, shk_code, vendor_code, status'
+        assert manager._select(conn, 'goods_on_way', None) == '*'
+    assert [g.scanned_code for g in manager.get_goods_at_pickup(10, 0, columns)] == ['*2', '*1', '*0']
+
+
+def test_fields_and_compact_format(make_manager):
+    manager = make_manager(seed)
+    client = main.app.test_client()
+    with patch.object(main, 'db', manager), patch.object(main, 'cached_image_url', lambda *a, **k: None):
+        full = client.get('/api/goods/pickup?fields=vendor_code,cell,info').get_json()
+        assert full['goods'][0] == {'vendor_code': '1002', 'cell': '12',
+                                    'info': {'brand': 'Бренд', 'name': 'Платье', 'subject_name': '',
+                                             'color': '', 'adult': False, 'no_return': False,
+                                             'pics_cnt': 1}}
+
+        compact = client.get('/api/goods/pickup?fields=vendor_code,cell&format=compact').get_json()
+        assert compact == {'count': 3, 'columns': ['vendor_code', 'cell'],
+                           'goods': [['1002', '12'], ['1001', '11'], ['1000', '10']]}
+
+        assert client.get('/api/goods/pickup?fields=password').status_code == 400
+        assert client.get('/api/goods/pickup?format=xml').status_code == 400
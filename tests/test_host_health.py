@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api import host_health
+from api.host_health import HostHealthTable
+
+
+def test_breaker_opens_then_half_open_allows_single_probe(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(host_health.time, "time", lambda: now[0])
+    table = HostHealthTable(failure_threshold=2, open_seconds=30)
+
+    table.record_failure("basket-01.wbbasket.ru", "timeout")
+    assert table.allow("basket-01.wbbasket.ru")
+    table.record_failure("basket-01.wbbasket.ru", "timeout")
+    assert not table.allow("basket-01.wbbasket.ru")
+
+    now[0] += 31
+    # Пауза прошла - пропускается ровно одна проба
+    assert table.allow("basket-01.wbbasket.ru")
+    assert not table.allow("basket-01.wbbasket.ru")
+
+    table.record_success("basket-01.wbbasket.ru", 50)
+    assert table.allow("basket-01.wbbasket.ru")
+    assert table.snapshot()[0]["state"] == host_health.CLOSED
+
+
+def test_rank_skips_open_and_prefers_healthy_hosts():
+    table = HostHealthTable(failure_threshold=1, open_seconds=30)
+    table.record_failure("bad", "timeout")
+    table.record_success("slow", 900)
+    table.record_success("fast", 40)
+
+    assert table.rank(["bad", "slow", "new", "fast"]) == ["new", "fast", "slow"]
@@ -0,0 +1,115 @@
+import statistics
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.image_cache import ImageCache
+from api.wb_api import WildberriesAPI
+from basket_stub import BasketStub, StubHost, table_layout
+
+# Артикулы из разных диапазонов basket (несколько товаров на хост)
+VENDOR_CODES = [str(nm) for base in (12_000_000, 50_000_000, 150_000_000, 400_000_000)
+                for nm in range(base, base + 10)]
+
+
+def make_api(tmp_path, stub: BasketStub) -> WildberriesAPI:
+    api = WildberriesAPI()
+    api.cache = ImageCache(tmp_path)
+    api.map_hosts(stub.base_url)
+    return api
+
+
+def report(name: str, latencies, elapsed: float):
+    latencies = sorted(latencies)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"\n{name}: {len(latencies) / elapsed:.1f} шт/с, "
+          f"p50 {statistics.median(latencies) * 1000:.0f} мс, p95 {p95 * 1000:.0f} мс")
+
+
+def test_bench_download_image_sync(tmp_path):
+    with BasketStub(table_layout(VENDOR_CODES, latency=0.01)) as stub:
+        api = make_api(tmp_path, stub)
+        latencies = []
+        started = time.monotonic()
+        for vc in VENDOR_CODES:
+            t = time.monotonic()
+            path, downloaded = api.download_image_sync(vc, 1, "big")
+            latencies.append(time.monotonic() - t)
+            assert path and downloaded
+        report("download_image_sync", latencies, time.monotonic() - started)
+        api.fetcher.close()
+
+    counters = api.metrics.snapshot()["counters"]
+    assert counters["primary_success"] == len(VENDOR_CODES)
+    assert counters["fanout"] == 0
+    assert api.fetcher.stats()["connections_reused"] > 0
+
+
+def test_bench_find_working_url_with_stale_table(tmp_path):
+    # Товары переехали на соседний basket - каждый поиск идёт перебором
+    codes = VENDOR_CODES[::5]
+    with BasketStub(table_layout(codes, shift=1, latency=0.01)) as stub:
+        api = make_api(tmp_path, stub)
+        latencies = []
+        started = time.monotonic()
+        for vc in codes:
+            t = time.monotonic()
+            url = api.find_working_image_url_sync(vc, 1, "big")
+            latencies.append(time.monotonic() - t)
+            expected = f"basket-{api.get_basket_number(vc) + 1:02d}.wbbasket.ru"
+            assert url and expected in url
+        report("find_working_image_url_sync (fan-out)", latencies, time.monotonic() - started)
+        api.fetcher.close()
+
+    assert api.metrics.snapshot()["ratios"]["fanout"] == 1.0
+
+
+def test_bench_prefetch_images_with_flaky_host(tmp_path):
+    hosts = table_layout(VENDOR_CODES, latency=0.02)
+    # Посторонний хост с ошибками попадает только под перебор и не мешает загрузке
+    hosts["basket-30.wbbasket.ru"] = StubHost(latency=0.05, error_rate=0.5)
+    with BasketStub(hosts) as stub:
+        api = make_api(tmp_path, stub)
+        started = time.monotonic()
+        results = api.prefetch_images(VENDOR_CODES, "big")
+        elapsed = time.monotonic() - started
+        api.fetcher.close()
+
+    assert all(results.values())
+    waits = api.metrics.snapshot()["histograms"]["queue_wait_ms"]
+    print(f"\nprefetch_images: {len(results) / elapsed:.1f} шт/с, "
+          f"ожидание в очереди p95 {waits['p95']} мс")
+
+
+def test_bench_bulk_cache_endpoint(tmp_path):
+    with patch('database.database_manager.DatabaseManager'):
+        import main
+    from utils.image_jobs import ImageJobManager
+
+    with BasketStub(table_layout(VENDOR_CODES, latency=0.01)) as stub:
+        api = make_api(tmp_path / "images", stub)
+        jobs = ImageJobManager(api, tmp_path / "jobs")
+        # Замеряется конвейер, а не паузы между загрузками
+        jobs.DELAY_DOWNLOADED = jobs.DELAY_CACHED = jobs.DELAY_FAILED = 0
+        db = MagicMock()
+        db.get_all_vendor_codes.return_value = VENDOR_CODES
+
+        with patch.object(main, 'wb_api', api), patch.object(main, 'image_jobs', jobs), \
+                patch.object(main, 'db', db):
+            client = main.app.test_client()
+            started = time.monotonic()
+            response = client.post('/api/jobs/images', json={'scope': 'all', 'size': 'big'})
+            job_id = response.get_json()['job']['id']
+            while not jobs.get(job_id).to_dict()['finished'] and time.monotonic() - started < 30:
+                time.sleep(0.02)
+            elapsed = time.monotonic() - started
+            status = client.get(f'/api/jobs/images/{job_id}').get_json()
+        api.fetcher.close()
+
+    assert status['state'] == 'finished'
+    assert status['downloaded'] == len(VENDOR_CODES)
+    print(f"\nмассовое кэширование: {len(VENDOR_CODES) / elapsed:.1f} шт/с")
@@ -0,0 +1,59 @@
+import sys
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.image_cache import ImageCache
+
+
+def test_put_is_sharded_and_listed_in_manifest(tmp_path):
+    cache = ImageCache(tmp_path)
+    entry = cache.put("123456", 1, "small", b"x" * 10)
+
+    assert entry.path.parent.name == ImageCache.shard_for("123456")
+    assert entry.path.read_bytes() == b"x" * 10
+    assert cache.contains("123456", 1, "small")
+    assert not cache.contains("123456", 1, "big")
+    # Временные файлы не остаются в шарде
+    assert [p.name for p in entry.path.parent.iterdir()] == [entry.path.name]
+
+
+def test_lru_eviction_respects_budget(tmp_path):
+    cache = ImageCache(tmp_path, max_bytes=25)
+    cache.put("1", 1, "small", b"a" * 10)
+    cache.put("2", 1, "small", b"b" * 10)
+    # Обращение к "1" делает "2" самым старым
+    assert cache.get("1") is not None
+    cache.put("3", 1, "small", b"c" * 10)
+
+    assert cache.contains("1")
+    assert not cache.contains("2")
+    assert cache.contains("3")
+    assert cache.stats()["bytes"] == 20
+    assert cache.stats()["evictions"] == 1
+
+
+def test_rescan_migrates_legacy_files_and_drops_temp(tmp_path):
+    (tmp_path / "777_1.webp").write_bytes(b"legacy")
+    (tmp_path / "broken.tmp").write_bytes(b"partial")
+
+    cache = ImageCache(tmp_path)
+
+    entry = cache.peek("777", 1, "small")
+    assert entry is not None
+    assert entry.path == cache.path_for("777", 1, "small")
+    assert entry.path.read_bytes() == b"legacy"
+    assert not (tmp_path / "777_1.webp").exists()
+    assert not (tmp_path / "broken.tmp").exists()
+
+
+def test_remove_single_vendor(tmp_path):
+    cache = ImageCache(tmp_path)
+    cache.put("1", 1, "small", b"a")
+    cache.put("1", 2, "small", b"a")
+    cache.put("2", 1, "small", b"a")
+
+    assert cache.remove("1") == 2
+    assert cache.stats()["files"] == 1
+    assert cache.contains("2")
@@ -20,8 +20,9 @@ with patch('database.database_manager.DatabaseManager') as MockDB, \
      patch('api.wb_api.WildberriesAPI') as MockAPI:
     import main
     from models import Goods
+    from utils.image_jobs import ImageJobManager
 
-def test_background_download_speed():
+def test_background_download_speed(tmp_path):
     # Mock DB instance
     mock_db = MagicMock()
     main.db = mock_db
@@ -39,8 +40,8 @@ def test_background_download_speed():
     mock_wb_api.download_image_sync.return_value = (Path("somepath"), True) # Downloaded = True
     main.wb_api = mock_wb_api
 
-    # Reset active_downloads
-    main.active_downloads = set()
+    # Задания пишутся во временный каталог
+    main.image_jobs = ImageJobManager(mock_wb_api, tmp_path)
 
     with app.test_request_context(json={'type': 'all'}):
         with patch('main.time.sleep') as mock_sleep:
@@ -58,7 +59,7 @@ def test_background_download_speed():
                 mock_wb_api.download_image_sync.assert_called_with("100", 1, 'small', force=False)
                 mock_sleep.assert_called_with(0.2)
 
-def test_background_download_skip_speed():
+def test_background_download_skip_speed(tmp_path):
     mock_db = MagicMock()
     main.db = mock_db
 
@@ -76,7 +77,7 @@ def test_background_download_skip_speed():
     mock_wb_api.download_image_sync.return_value = (mock_path, False) # Downloaded = False
     main.wb_api = mock_wb_api
 
-    main.active_downloads = set()
+    main.image_jobs = ImageJobManager(mock_wb_api, tmp_path)
 
     with app.test_request_context(json={'type': 'all'}):
         with patch('main.time.sleep') as mock_sleep:
@@ -91,6 +92,8 @@ def test_background_download_skip_speed():
                 mock_sleep.assert_called_with(0.02)
 
 if __name__ == "__main__":
-    test_background_download_speed()
-    test_background_download_skip_speed()
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        test_background_download_speed(Path(tmp) / "a")
+        test_background_download_skip_speed(Path(tmp) / "b")
     print("Tests passed!")
@@ -0,0 +1,66 @@
+import asyncio
+import sys
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.image_cache import ImageCache
+from api.wb_api import WildberriesAPI
+
+
+def test_gallery_fetches_missing_from_known_host_only(tmp_path):
+    api = WildberriesAPI()
+    api.cache = ImageCache(tmp_path)
+    api.cache.put("123", 2, "big", b"cached")
+    api._image_hosts["123"] = "basket-07.wbbasket.ru"
+    requested = []
+
+    async def fake_fetch(url):
+        requested.append(url)
+        # Изображение 3 отвечает последним
+        await asyncio.sleep(0.05 if url.endswith("/3.webp") else 0)
+        if url.endswith("/5.webp"):
+            return 404, None
+        return 200, b"img"
+
+    async def no_fan_out(*args, **kwargs):
+        raise AssertionError("перебор серверов не нужен")
+
+    api.fetcher.fetch = fake_fetch
+    api._find_fallback_url = no_fan_out
+
+    results = list(api.iter_gallery("123", 5, "big"))
+
+    # Закэшированное - сразу, остальные - по мере готовности
+    assert [num for num, _ in results][0] == 2
+    assert [num for num, _ in results][-1] == 3
+    assert dict(results)[5] is None
+    assert api.cache.contains("123", 3, "big")
+    assert all("basket-07.wbbasket.ru" in url for url in requested)
+    assert len(requested) == 3
+
+
+def test_gallery_timeout_yields_unresolved_and_hosts_are_bounded(tmp_path):
+    api = WildberriesAPI()
+    api.cache = ImageCache(tmp_path)
+    api._remember_host("123", 1, "https://basket-07.wbbasket.ru/vol0/part1/123/images/c516x688/1.webp")
+    api.DOWNLOAD_TIMEOUT = 0.2
+
+    async def slow_fetch(url):
+        await asyncio.sleep(0 if url.endswith("/2.webp") else 5)
+        return 200, b"img"
+
+    api.fetcher.fetch = slow_fetch
+    results = list(api.iter_gallery("123", 4, "big"))
+    # Не дождались 3 и 4 - они всё равно в ответе, клиент может повторить
+    assert results[0][0] == 2 and results[0][1] is not None
+    assert results[1:] == [(3, None), (4, None)]
+
+    api.IMAGE_HOSTS_LIMIT = 2
+    for vc in ("1", "2"):
+        api._remember_host(vc, 1, f"https://basket-01.wbbasket.ru/{vc}/1.webp")
+    assert api.host_for("1") == "basket-01.wbbasket.ru"
+    api._remember_host("3", 1, "https://basket-02.wbbasket.ru/3/1.webp")
+    # Вытеснен давно не использованный артикул, недавний "1" остался
+    assert list(api._image_hosts) == ["1", "3"]
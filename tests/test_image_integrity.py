@@ -0,0 +1,62 @@
+import io
+import sys
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+
+from api.image_cache import ImageCache
+from api.image_integrity import IntegrityScanner, header_problem
+from api.image_variants import VariantRenderer
+
+
+def webp_bytes() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (20, 20), (10, 200, 30)).save(buffer, "WEBP")
+    return buffer.getvalue()
+
+
+def test_header_problem_detects_html_and_truncation():
+    good = webp_bytes()
+    assert header_problem(good) is None
+    assert header_problem(b"<!DOCTYPE html><html>503</html>") == "html page"
+    assert header_problem(good[:len(good) // 2]).startswith("truncated")
+    assert header_problem(b"") == "empty"
+
+
+def test_incremental_scan_quarantines_and_requeues(tmp_path):
+    cache = ImageCache(tmp_path / "images")
+    cache.put("100", 1, "big", webp_bytes())
+    cache.put("200", 1, "big", b"<html>Service Unavailable</html>")
+    # Поле размера RIFF верное, но данные испорчены - ловится только декодированием
+    corrupt = bytearray(webp_bytes())
+    corrupt[20:] = b"\x00" * (len(corrupt) - 20)
+    cache.put("300", 2, "big", bytes(corrupt))
+
+    requeued = []
+    renderer = VariantRenderer(1)
+    scanner = IntegrityScanner(
+        cache, renderer.submit_call,
+        state_file=tmp_path / "integrity.json",
+        quarantine_dir=tmp_path / "quarantine",
+        on_bad=lambda entry: requeued.append((entry.vendor_code, entry.num)),
+    )
+    try:
+        report = scanner.scan()
+        assert report["scanned"] == 3
+        assert sorted(b["vendor_code"] for b in report["bad"]) == ["200", "300"]
+        assert cache.contains("100", 1, "big")
+        assert not cache.contains("200", 1, "big")
+        assert sorted(requeued) == [("200", 1), ("300", 2)]
+        assert len(list((tmp_path / "quarantine").iterdir())) == 2
+
+        # Второй проход видит только файлы, изменённые после первого
+        cache.put("400", 1, "big", webp_bytes())
+        again = IntegrityScanner(cache, renderer.submit_call, tmp_path / "integrity.json",
+                                 tmp_path / "quarantine").scan()
+        assert again["scanned"] == 1
+        assert again["quarantined"] == 0
+    finally:
+        renderer.shutdown()
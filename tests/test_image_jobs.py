@@ -0,0 +1,113 @@
+import sys
+import threading
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils import image_jobs
+from utils.image_jobs import ImageJobManager
+
+
+class FakeApi:
+    def __init__(self, missing=(), gate=None):
+        self.missing = set(missing)
+        self.gate = gate
+        self.calls = []
+
+    def warm_up(self, vendor_codes):
+        pass
+
+    def download_image_sync(self, vendor_code, image_num=1, size="small", force=False):
+        self.calls.append(vendor_code)
+        if self.gate:
+            self.gate(vendor_code)
+        if vendor_code in self.missing:
+            return None, False
+        return Path(vendor_code), True
+
+    def prefetch_images(self, vendor_codes, size="small"):
+        self.calls.extend(f"retry:{vc}" for vc in vendor_codes)
+        return {vc: None for vc in vendor_codes}
+
+
+def wait_done(manager, job_id, timeout=5):
+    job = manager.get(job_id)
+    for _ in range(int(timeout / 0.01)):
+        if job.state in image_jobs.DONE_STATES + (image_jobs.PAUSED,) \
+                and job.id not in manager._runners:
+            return job
+        threading.Event().wait(0.01)
+    raise AssertionError(f"job stuck in {job.state}")
+
+
+def test_job_finishes_and_batches_failed_retry(tmp_path, monkeypatch):
+    monkeypatch.setattr(ImageJobManager, "DELAY_DOWNLOADED", 0)
+    monkeypatch.setattr(ImageJobManager, "DELAY_FAILED", 0)
+    api = FakeApi(missing={"2"})
+    manager = ImageJobManager(api, tmp_path)
+
+    job = manager.create("buyer", "sid", ["1", "2", "3", "1"])
+    job = wait_done(manager, job.id)
+
+    assert job.state == image_jobs.FINISHED
+    assert job.total == 3 and job.cursor == 3
+    assert job.downloaded == 2
+    assert list(job.failed) == ["2"]
+    assert api.calls == ["1", "2", "3", "retry:2"]
+
+
+def test_paused_job_resumes_from_checkpoint_after_restart(tmp_path, monkeypatch):
+    monkeypatch.setattr(ImageJobManager, "DELAY_DOWNLOADED", 0)
+    monkeypatch.setattr(ImageJobManager, "CHECKPOINT_EVERY", 1)
+    manager = None
+
+    def pause_after_second(vendor_code):
+        if vendor_code == "b":
+            manager.pause(job.id)
+
+    api = FakeApi(gate=pause_after_second)
+    manager = ImageJobManager(api, tmp_path)
+    job = manager.create("cell", "12", ["a", "b", "c", "d"])
+    job = wait_done(manager, job.id)
+    assert job.state == image_jobs.PAUSED
+    assert job.cursor == 2
+
+    # "Перезапуск": новый менеджер читает состояние с диска
+    restarted_api = FakeApi()
+    restarted = ImageJobManager(restarted_api, tmp_path)
+    restarted.resume(job.id)
+    job = wait_done(restarted, job.id)
+
+    assert job.state == image_jobs.FINISHED
+    assert restarted_api.calls == ["c", "d"]
+    assert job.downloaded == 4
+
+
+def test_pause_during_retry_stops_between_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(ImageJobManager, "DELAY_FAILED", 0)
+    monkeypatch.setattr(ImageJobManager, "RETRY_CHUNK", 2)
+    manager = None
+
+    class PausingApi(FakeApi):
+        def prefetch_images(self, vendor_codes, size="small"):
+            self.calls.extend(f"retry:{vc}" for vc in vendor_codes)
+            manager.pause(job.id)
+            return {vc: Path(vc) for vc in vendor_codes}
+
+    api = PausingApi(missing={"a", "b", "c", "d", "e"})
+    manager = ImageJobManager(api, tmp_path)
+    job = manager.create("cell", "1", ["a", "b", "c", "d", "e"])
+    job = wait_done(manager, job.id)
+
+    # Пауза во время первого пакета: следующий пакет не запускается,
+    # результат завершённого пакета учтён, остаток очереди сохранён
+    assert job.state == image_jobs.PAUSED
+    assert api.calls[5:] == ["retry:a", "retry:b"]
+    assert sorted(job.failed) == ["c", "d", "e"]
+    assert job.retry_items == ["c", "d", "e"]
+
+    manager.resume(job.id)
+    job = wait_done(manager, job.id)
+    assert api.calls[7:] == ["retry:c", "retry:d"]
+    assert job.retry_items == ["e"] and job.retry_rounds == 1
@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.image_cache import ImageCache
+from api.image_metrics import Histogram
+from api.wb_api import WildberriesAPI
+
+
+def test_histogram_quantiles_use_bucket_bounds():
+    histogram = Histogram((10, 100, 1000))
+    for value in (5, 8, 50, 70, 90, 5000):
+        histogram.observe(value)
+
+    data = histogram.to_dict()
+    assert data["count"] == 6
+    assert data["buckets"] == {"10": 2, "100": 3, "1000": 0, "inf": 1}
+    assert histogram.quantile(0.5) == 100
+    assert histogram.quantile(1.0) == 5000
+
+
+def test_download_counts_cache_hits_primary_and_fanout(tmp_path):
+    api = WildberriesAPI()
+    api.cache = ImageCache(tmp_path)
+    api.cache.put("111", 1, "big", b"cached")
+
+    async def fake_fetch(url):
+        # Расчётный сервер отвечает только для 222, 333 находится перебором
+        if "/222/" in url or url.endswith("#found"):
+            return 200, b"image"
+        return 404, None
+
+    async def fake_fallback(vendor_code, image_num, size, exclude=None):
+        api.metrics.inc("fanout")
+        return exclude + "#found"
+
+    api.fetcher.fetch = fake_fetch
+    api._find_fallback_url = fake_fallback
+
+    for vc in ("111", "222", "333"):
+        path, _ = api.download_image_sync(vc, 1, "big")
+        assert path
+
+    snapshot = api.metrics.snapshot()
+    assert snapshot["counters"]["cache_hits"] == 1
+    assert snapshot["counters"]["downloads"] == 2
+    assert snapshot["counters"]["primary_success"] == 1
+    assert snapshot["ratios"]["fanout"] == 0.5
+    assert snapshot["histograms"]["download_ms"]["count"] == 2
@@ -0,0 +1,150 @@
+import concurrent.futures
+import sys
+import threading
+from datetime import datetime
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.image_cache import ImageCache
+from utils.image_prefetcher import ImagePrefetcher
+
+
+class FakeApi:
+    master_size = "small"
+
+    def __init__(self, cache, on_download=None):
+        self.cache = cache
+        self.on_download = on_download
+        self.calls = []
+
+    def cached_entry(self, vendor_code, image_num=1, size="small"):
+        return self.cache.peek(vendor_code, image_num, size)
+
+    def warm_up(self, vendor_codes):
+        pass
+
+    def download_image_sync(self, vendor_code, image_num=1, size="small", force=False, cancel=None):
+        self.calls.append(vendor_code)
+        if self.on_download:
+            self.on_download(vendor_code)
+        entry = self.cache.put(vendor_code, image_num, size, b"x" * 100)
+        return entry.path, True
+
+
+def test_prefetch_skips_cached_and_stops_on_activity(tmp_path):
+    cache = ImageCache(tmp_path)
+    cache.put("1", 1, "small", b"cached")
+    prefetcher = None
+
+    def on_download(vendor_code):
+        if vendor_code == "3":
+            prefetcher.mark_activity()
+
+    api = FakeApi(cache, on_download)
+    prefetcher = ImagePrefetcher(api, lambda: ["1", "2", "3", "4", "5"],
+                                 concurrency=1, bytes_per_second=10 ** 9)
+
+    assert prefetcher.run_once() == 2
+    assert api.calls == ["2", "3"]
+    assert prefetcher.stats["interrupted"] == 1
+
+
+def test_bandwidth_budget_pauses_between_downloads(tmp_path):
+    api = FakeApi(ImageCache(tmp_path))
+    prefetcher = ImagePrefetcher(api, lambda: ["1", "2", "3"],
+                                 concurrency=1, bytes_per_second=100)
+    # Бюджет 100 Б/с и файлы по 100 Б: вторая загрузка уводит в долг на секунду,
+    # действие пользователя во время паузы прерывает обход до третьей загрузки
+    timer = threading.Timer(0.3, prefetcher.mark_activity)
+    timer.start()
+    try:
+        assert prefetcher.run_once() == 2
+    finally:
+        timer.cancel()
+    assert api.calls == ["1", "2"]
+
+
+def test_idle_windows_and_background_requests(tmp_path):
+    prefetcher = ImagePrefetcher(FakeApi(ImageCache(tmp_path)), list,
+                                 windows=[(22, 7)], idle_minutes=20)
+    assert prefetcher.in_window(datetime(2025, 1, 1, 23))
+    assert prefetcher.in_window(datetime(2025, 1, 1, 3))
+    assert not prefetcher.in_window(datetime(2025, 1, 1, 12))
+
+    prefetcher._last_activity -= 3600
+    prefetcher.note_request("/api/images/resolve", {})
+    prefetcher.note_request("/api/goods/pickup", {"X-Background-Request": "1"})
+    assert prefetcher.is_idle(datetime(2025, 1, 1, 12))
+
+    prefetcher.note_request("/api/search", {})
+    assert not prefetcher.is_idle(datetime(2025, 1, 1, 12))
+
+
+def test_failed_codes_back_off_and_spend_budget(tmp_path):
+    class FailingApi(FakeApi):
+        def download_image_sync(self, vendor_code, image_num=1, size="small", force=False, cancel=None):
+            if vendor_code == "404":
+                self.calls.append(vendor_code)
+                return None, False
+            return super().download_image_sync(vendor_code, image_num, size, force)
+
+    api = FailingApi(ImageCache(tmp_path))
+    prefetcher = ImagePrefetcher(api, lambda: ["404", "1"], concurrency=1,
+                                 bytes_per_second=ImagePrefetcher.FAILED_ATTEMPT_BYTES)
+    consumed = []
+    original = prefetcher._fetch_one
+    prefetcher._fetch_one = lambda *item: consumed.append(original(*item)) or consumed[-1]
+
+    assert prefetcher.run_once() == 1
+    assert consumed == [(False, ImagePrefetcher.FAILED_ATTEMPT_BYTES), (True, 100)]
+    # Следующий простой не перебирает серверы для недоступного артикула заново
+    assert prefetcher.run_once() == 0
+    assert api.calls == ["404", "1"]
+    assert prefetcher.status()["backing_off"] == 1 and prefetcher.stats["failed"] == 1
+
+    prefetcher._failures["404"] = (1, 0)
+    prefetcher.run_once()
+    assert api.calls == ["404", "1", "404"]
+    assert prefetcher._failures["404"][0] == 2
+
+
+def test_requeued_master_is_fetched_even_if_variant_is_cached(tmp_path):
+    class SizedApi(FakeApi):
+        def download_image_sync(self, vendor_code, image_num=1, size="small", force=False, cancel=None):
+            self.calls.append((vendor_code, size))
+            entry = self.cache.put(vendor_code, image_num, size, b"x" * 100)
+            return entry.path, True
+
+    cache = ImageCache(tmp_path)
+    cache.put("7", 1, "small", b"variant")
+    api = SizedApi(cache)
+    prefetcher = ImagePrefetcher(api, lambda: ["7"], concurrency=1, bytes_per_second=10 ** 9)
+
+    assert prefetcher.run_once() == 0
+    prefetcher.requeue("7", "big")
+    assert prefetcher.run_once() == 1
+    assert api.calls == [("7", "big")]
+    # Следующий проход видит мастер-копию в кэше и снимает артикул с повторной загрузки
+    assert prefetcher._pending_codes() == []
+    assert prefetcher.status()["requeued"] == 0
+
+
+def test_activity_cancels_download_in_flight_without_backoff(tmp_path):
+    prefetcher = None
+
+    class BlockingApi(FakeApi):
+        def download_image_sync(self, vendor_code, image_num=1, size="small", force=False, cancel=None):
+            self.calls.append(vendor_code)
+            prefetcher.mark_activity()
+            # Загрузка ждёт флаг прерывания, как fetcher.run
+            assert cancel is not None and cancel.wait(5)
+            raise concurrent.futures.CancelledError()
+
+    api = BlockingApi(ImageCache(tmp_path))
+    prefetcher = ImagePrefetcher(api, lambda: ["1", "2"], concurrency=1, bytes_per_second=10 ** 9)
+    assert prefetcher.run_once() == 0
+    assert api.calls == ["1"]
+    # Прерванная загрузка - не неудача: артикул не уходит в отложенные
+    assert prefetcher.stats["failed"] == 0 and prefetcher.status()["backing_off"] == 0
@@ -0,0 +1,56 @@
+import sys
+import threading
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from api.image_cache import ImageCache
+from api.wb_api import WildberriesAPI
+
+
+def make_api(tmp_path):
+    api = WildberriesAPI()
+    api.cache = ImageCache(tmp_path)
+    return api
+
+
+def test_resolve_returns_cached_and_queues_missing_once(tmp_path):
+    api = make_api(tmp_path)
+    api.cache.put("100", 1, "small", b"img")
+
+    release = threading.Event()
+    calls = []
+
+    def fake_download(vendor_code, image_num=1, size="small", force=False):
+        calls.append(vendor_code)
+        release.wait(5)
+        entry = api.cache.put(vendor_code, image_num, size, b"new")
+        return entry.path, True
+
+    api.download_image_sync = fake_download
+
+    first = api.resolve_images(["100", "200", "200"])
+    second = api.resolve_images(["200"])
+
+    assert first["100"]["status"] == "cached"
+    assert first["200"]["status"] == "pending"
+    assert second["200"]["status"] == "pending"
+
+    release.set()
+    done = api.resolve_images(["200"], wait=5)
+    if done["200"]["status"] == "pending":
+        done = api.resolve_images(["200"], wait=5)
+
+    assert done["200"]["status"] == "cached"
+    assert calls == ["200"]
+
+
+def test_resolve_reports_missing_after_failure(tmp_path):
+    api = make_api(tmp_path)
+    api.download_image_sync = lambda *args, **kwargs: (None, False)
+
+    api.resolve_images(["300"], wait=5)
+    result = api.resolve_images(["300"])
+
+    assert result["300"]["status"] == "missing"
@@ -0,0 +1,67 @@
+import io
+import sys
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+
+from api.image_cache import ImageCache
+from api.image_variants import render_variant
+from api.wb_api import WildberriesAPI
+
+
+def make_webp(width=516, height=688):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 10, 150)).save(out, format="WEBP")
+    return out.getvalue()
+
+
+def test_render_variant_fits_box():
+    data = render_variant(make_webp(), "thumb")
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.format == "WEBP"
+        assert img.size == (75, 100)
+
+
+def test_small_is_derived_from_cached_master(tmp_path):
+    api = WildberriesAPI()
+    api.cache = ImageCache(tmp_path)
+    api.cache.put("555", 1, "big", make_webp())
+    api.find_working_image_url_sync = lambda *a, **k: (_ for _ in ()).throw(AssertionError("network"))
+
+    try:
+        path, downloaded = api.download_image_sync("555", 1, "small")
+    finally:
+        api.variants.shutdown()
+
+    assert downloaded is False
+    assert path == api.cache.path_for("555", 1, "small")
+    with Image.open(path) as img:
+        assert img.size == (246, 328)
+
+
+def test_forced_master_refresh_drops_stale_variants(tmp_path):
+    api = WildberriesAPI()
+    api.cache = ImageCache(tmp_path)
+    api.cache.put("555", 1, "big", make_webp())
+    api.cache.put("555", 1, "small", b"old small")
+    api.cache.put("555", 1, "thumb", b"old thumb")
+    api.cache.put("555", 2, "small", b"other image")
+    fresh = make_webp(400, 600)
+
+    async def download(vendor_code, image_num, size):
+        return fresh
+
+    api._download = download
+    try:
+        path, downloaded = api.download_image_sync("555", 1, "big", force=True)
+    finally:
+        api.variants.shutdown()
+
+    assert downloaded is True and path.read_bytes() == fresh
+    # Варианты прежней мастер-копии удалены и будут получены заново из новой
+    assert not api.cache.contains("555", 1, "small")
+    assert not api.cache.contains("555", 1, "thumb")
+    assert api.cache.contains("555", 2, "small")
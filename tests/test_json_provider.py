@@ -0,0 +1,45 @@
+import json
+import sys
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flask import Flask, jsonify
+
+from models.data_models import GoodsInfo
+from utils.json_provider import FastJSONProvider, json_list_response
+
+
+def make_app():
+    app = Flask(__name__, static_folder=None)
+    app.json = FastJSONProvider(app)
+    goods = [{'vendor_code': str(i), 'info': GoodsInfo(brand='Бренд', pics_cnt=i)} for i in range(1200)]
+
+    @app.route('/one')
+    def one():
+        return jsonify(goods[0])
+
+    @app.route('/list')
+    def goods_list():
+        return json_list_response('goods', goods, extra={'count': len(goods), 'has_more': False},
+                                  chunk_size=500)
+
+    return app
+
+
+def test_dataclasses_and_cyrillic_serialized_directly():
+    client = make_app().test_client()
+    response = client.get('/one')
+    assert 'Бренд'.encode('utf-8') in response.data
+    assert response.get_json() == {'vendor_code': '0', 'info': {
+        'brand': 'Бренд', 'name': '', 'subject_name': '', 'color': '',
+        'adult': False, 'no_return': False, 'pics_cnt': 0}}
+
+
+def test_long_list_streamed_as_valid_json():
+    response = make_app().test_client().get('/list')
+    assert response.is_streamed
+    data = json.loads(response.data)
+    assert data['count'] == 1200 and data['has_more'] is False
+    assert [g['info']['pics_cnt'] for g in data['goods']] == list(range(1200))
@@ -0,0 +1,57 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from utils.profiler import StackSampler, ProfileBusyError
+
+
+def busy_handler(stop):
+    while not stop.is_set():
+        sum(range(200))
+
+
+def test_samples_busy_web_threads_and_skips_idle():
+    stop = threading.Event()
+    busy = threading.Thread(target=busy_handler, args=(stop,), name="waitress-0", daemon=True)
+    idle = threading.Thread(target=stop.wait, name="waitress-1", daemon=True)
+    other = threading.Thread(target=busy_handler, args=(stop,), name="Unrelated", daemon=True)
+    for thread in (busy, idle, other):
+        thread.start()
+    try:
+        profile = StackSampler().sample(0.3, interval=0.002, group='web')
+    finally:
+        stop.set()
+
+    assert profile.samples > 10
+    threads = {stack[0] for stack in profile.stacks}
+    assert threads == {"waitress-0"}
+
+    top = {row['function']: row for row in profile.top()}
+    assert top['test_profiler:busy_handler']['total_pct'] == 100.0
+    lines = profile.collapsed().splitlines()
+    assert lines and all(line.startswith("waitress;") for line in lines)
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+
+def test_one_profile_at_a_time():
+    sampler = StackSampler()
+    started = threading.Event()
+    original = sampler._select
+
+    def select(*args, **kwargs):
+        started.set()
+        return original(*args, **kwargs)
+
+    sampler._select = select
+    worker = threading.Thread(target=sampler.sample, args=(0.5,), daemon=True)
+    worker.start()
+    assert started.wait(2)
+    with pytest.raises(ProfileBusyError):
+        sampler.sample(0.1)
+    worker.join()
+    assert not sampler.busy
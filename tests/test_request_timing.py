@@ -0,0 +1,81 @@
+import sys
+import threading
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flask import Flask, jsonify
+
+from utils.json_provider import FastJSONProvider
+from utils.request_timing import RequestTiming, track
+
+
+def seed(conn):
+    conn.execute("CREATE TABLE surplus_goods (goods_uid TEXT, acceptance_unix_timestamp INTEGER)")
+    conn.executemany("INSERT INTO surplus_goods VALUES (?, ?)", [(str(i), i) for i in range(50)])
+
+
+def test_route_phases_and_slow_query_log(tmp_path, make_manager):
+    manager = make_manager(seed)
+    app = Flask(__name__, static_folder=None)
+    app.json = FastJSONProvider(app)
+    log_file = tmp_path / "logs" / "timing.log"
+    timing = RequestTiming(app, slow_query_ms=0, log_file=log_file, explain=manager.explain)
+    manager.query_observer = timing.on_query
+
+    @app.route('/api/surplus/<int:limit>')
+    def surplus(limit):
+        with track('fs'):
+            (tmp_path / "wb.sqlite").stat()
+        return jsonify({'count': manager.get_surplus_count(), 'items': len(manager.get_surplus_goods())})
+
+    client = app.test_client()
+    response = client.get('/api/surplus/5')
+    assert response.get_json() == {'count': 50, 'items': 50}
+    header = response.headers['Server-Timing']
+    assert all(f"{phase};dur=" in header for phase in ('db', 'serialize', 'fs', 'total'))
+    client.get('/api/surplus/7')
+    timing.flush()
+
+    snapshot = timing.snapshot()
+    route = snapshot['routes']['GET /api/surplus/<int:limit>']
+    assert route['latency_ms']['count'] == 2
+    assert route['avg_ms']['db'] > 0
+
+    slow = snapshot['slow_queries'][0]
+    assert slow['route'] == 'GET /api/surplus/7'
+    assert slow['sql'].startswith('SELECT * FROM surplus_goods ORDER BY')
+    assert any('surplus_goods' in step for step in slow['plan'])
+    assert 'surplus_goods' in log_file.read_text(encoding='utf-8')
+
+    # Вне запроса замер фаз не ведётся, но медленные запросы журналируются
+    manager.get_surplus_count()
+    timing.flush()
+    assert timing.snapshot()['slow_queries'][0]['route'] is None
+
+
+def test_slow_query_plan_is_built_off_the_request_thread(make_manager):
+    manager = make_manager(seed)
+    app = Flask(__name__, static_folder=None)
+    release = threading.Event()
+    explained = []
+
+    def explain(sql, params):
+        explained.append(threading.current_thread().name)
+        release.wait(5)
+        return manager.explain(sql, params)
+
+    timing = RequestTiming(app, slow_query_ms=0, explain=explain)
+    manager.query_observer = timing.on_query
+
+    @app.route('/count')
+    def count():
+        return jsonify({'count': manager.get_surplus_count()})
+
+    # Ответ не ждёт EXPLAIN: поток плана ещё заблокирован
+    assert app.test_client().get('/count').get_json() == {'count': 50}
+    release.set()
+    timing.flush()
+    assert explained == ['Slow_Query_Log']
+    assert timing.snapshot()['slow_queries'][0]['route'] == 'GET /count'
@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from flask import Flask, jsonify
+
+from utils.compression import Compression
+from utils.versioning import ResponseVersioning
+
+
+def test_unchanged_version_answers_304_without_running_view():
+    version = [1]
+    calls = []
+    app = Flask(__name__, static_folder=None)
+    Compression(app, min_size=10)
+    versions = ResponseVersioning(lambda: version[0])
+
+    @app.route('/api/goods')
+    @versions.versioned
+    def goods():
+        calls.append(1)
+        return jsonify({'goods': ['x' * 50]})
+
+    client = app.test_client()
+    first = client.get('/api/goods?limit=20')
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    again = client.get('/api/goods?limit=20', headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert len(calls) == 1
+
+    # Другие параметры - другой ETag
+    assert client.get('/api/goods?limit=50', headers={'If-None-Match': etag}).status_code == 200
+
+    # Сжатое представление сверяется по своему ETag
+    gzipped = client.get('/api/goods?limit=20', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['ETag'].endswith('-gzip"')
+    revalidated = client.get('/api/goods?limit=20', headers={
+        'Accept-Encoding': 'gzip', 'If-None-Match': gzipped.headers['ETag']})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == gzipped.headers['ETag']
+
+    version[0] = 2
+    changed = client.get('/api/goods?limit=20', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
@@ -0,0 +1,82 @@
+import sys
+from pathlib import Path
+
+# Add repo root to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from models import Goods, GoodsInfo
+from utils.search import RefinementCache, buyer_matches, goods_matches_barcode, goods_matches_name, like
+
+
+def make_goods(code, name=''):
+    return Goods(item_uid=code, buyer_sid='sid', scanned_code=code, encoded_scanned_code='',
+                 vendor_code='1', info=GoodsInfo(name=name))
+
+
+def test_refinement_filters_previous_candidates_without_db():
+    table = [make_goods(c) for c in ('*12345', '*12346', '*99123', '*55555')]
+    calls = []
+
+    def fetch(query):
+        def run(limit):
+            calls.append((query, limit))
+            return [g for g in table if goods_matches_barcode(g, query)][:limit]
+        return run
+
+    cache = RefinementCache(ttl=30)
+    search = lambda q, version=1: [g.item_uid for g in cache.search(  # noqa: E731
+        'session', 'goods_barcode', q, version, fetch(q), goods_matches_barcode, cap=10)]
+
+    assert search('123') == ['*12345', '*12346', '*99123']
+    assert search('1234') == ['*12345', '*12346']
+    assert search('12345') == ['*12345']
+    assert calls == [('123', 10)]
+
+    # Новый запрос, не содержащий прошлый, и смена данных идут в БД
+    assert search('555') == ['*55555']
+    assert search('5555', version=2) == ['*55555']
+    assert len(calls) == 3
+    assert cache.stats()['hits'] == 2
+
+
+def test_truncated_candidates_are_not_refined():
+    table = [make_goods(f'*10{i}') for i in range(5)]
+    calls = []
+
+    def fetch(limit):
+        calls.append(limit)
+        return table[:limit]
+
+    cache = RefinementCache()
+    cache.search('s', 'goods_barcode', '10', 1, fetch, goods_matches_barcode, cap=3)
+    refined = cache.search('s', 'goods_barcode', '104', 1, lambda limit: [table[4]],
+                           goods_matches_barcode, cap=3)
+    # Набор был обрезан LIMIT: '*104' в него не попал, поэтому снова идём в БД
+    assert [g.item_uid for g in refined] == ['*104']
+    assert calls == [3] and cache.stats()['misses'] == 2
+
+    # LIKE в SQLite: латиница без учёта регистра, кириллица - с учётом
+    assert like('Nike', 'nIK') and not like('Платье', 'платье') and not like(None, '')
+    assert goods_matches_name(make_goods('x', 'Air MAX'), 'max')
+
+
+def seed_buyers(conn):
+    conn.executescript("""
+        CREATE TABLE buyers (user_sid TEXT, mobile TEXT, name TEXT, user_id TEXT);
+        CREATE TABLE buyers_with_cells (user_sid TEXT, cell TEXT, status_updated TEXT);
+    """)
+    conn.executemany("INSERT INTO buyers VALUES (?, ?, '', '1')",
+                     [(f"sid{i}", f"7999{i % 6}{i:04d}") for i in range(120)])
+
+
+def test_buyer_candidates_honour_limit(make_manager):
+    manager = make_manager(seed_buyers)
+
+    cache = RefinementCache()
+    search = lambda q: cache.search('s', 'buyers', q, 1,  # noqa: E731
+                                    lambda limit: manager.search_buyers(q, limit), buyer_matches, cap=200)
+    assert len(search('7999')) == 120
+    # Больше 50 совпадений: набор полный, уточнение совпадает с SQL
+    assert len(search('79991')) == len(manager.search_buyers('79991', 200)) == 20
+    assert cache.stats()['hits'] == 1
+    assert len(manager.search_buyers('7999')) == 50
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Пакетные запросы к API
+Страница при открытии делает несколько запросов (статистика, списки,
+проверка картинок); пакет выполняет их на сервере параллельно, в одном
+снимке БД, и возвращает все ответы одним JSON
+"""
+import concurrent.futures
+import contextvars
+import logging
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from flask import Flask, Response, current_app
+from werkzeug.test import EnvironBuilder
+
+logger = logging.getLogger(__name__)
+
+# Подзапросы без побочных эффектов, разрешённые методом POST
+READONLY_POST = ('/api/images/check-status',)
+# Потоковые и служебные эндпоинты в пакет не входят
+FORBIDDEN_PREFIXES = ('/api/batch', '/api/events', '/api/diagnostics/profile')
+
+
+class BatchError(ValueError):
+    """Некорректный пакет запросов"""
+
+
+class BatchExecutor:
+    """
+    Выполнение пакета GET-подзапросов через обычную обработку Flask.
+
+    Подзапрос проходит все хуки и декораторы эндпоинта, кроме сжатия:
+    сжимается только итоговый ответ пакета. Тело ответа подзапроса
+    вставляется в итоговый JSON как есть, без повторного разбора.
+    """
+
+    def __init__(self, app: Flask, snapshot: Optional[Callable] = None,
+                 max_workers: int = 6, max_requests: int = 20):
+        """
+        Args:
+            app: Приложение Flask
+            snapshot: Фабрика контекстного менеджера общего снимка БД
+            max_workers: Потоков на пакет
+            max_requests: Максимум подзапросов в пакете
+        """
+        self.app = app
+        self.snapshot = snapshot
+        self.max_workers = max_workers
+        self.max_requests = max_requests
+        self.presets: Dict[str, Callable[[dict], List[dict]]] = {}
+
+    def preset(self, name: str):
+        """Декоратор набора подзапросов для страницы: fn(params) -> список подзапросов"""
+        def register(fn):
+            self.presets[name] = fn
+            return fn
+        return register
+
+    # ============== РАЗБОР ==============
+
+    def normalize(self, items: List[dict]) -> List[Tuple[str, str, str, Optional[dict]]]:
+        """
+        Проверка подзапросов: [(id, метод, путь, json)].
+
+        Raises:
+            BatchError: Неверный формат, метод или путь
+        """
+        if not isinstance(items, list) or not items:
+            raise BatchError("Пустой пакет")
+        if len(items) > self.max_requests:
+            raise BatchError(f"Не больше {self.max_requests} запросов в пакете")
+        result = []
+        for index, item in enumerate(items):
+            if isinstance(item, str):
+                item = {'path': item}
+            if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+                raise BatchError(f"Запрос {index}: не указан path")
+            path = item['path']
+            raw = urlsplit(path)
+            if raw.scheme or raw.netloc:
+                raise BatchError(f"Запрос {index}: допускаются только пути API")
+            if not path.startswith('/api/'):
+                path = '/api' + (path if path.startswith('/') else '/' + path)
+            parts = urlsplit(path)
+            if parts.path.startswith(FORBIDDEN_PREFIXES):
+                raise BatchError(f"Запрос {index}: путь недоступен в пакете")
+            method = str(item.get('method', 'GET')).upper()
+            if method == 'POST' and parts.path not in READONLY_POST:
+                raise BatchError(f"Запрос {index}: POST {parts.path} недоступен в пакете")
+            if method not in ('GET', 'POST'):
+                raise BatchError(f"Запрос {index}: метод {method} недоступен в пакете")
+            request_id = str(item.get('id', index))
+            result.append((request_id, method, path, item.get('json')))
+        ids = [r[0] for r in result]
+        if len(set(ids)) != len(ids):
+            raise BatchError("Повторяющиеся id запросов")
+        return result
+
+    # ============== ВЫПОЛНЕНИЕ ==============
+
+    def _dispatch(self, method: str, path: str, body: Optional[dict],
+                  headers: Dict[str, str]) -> Tuple[int, bytes, str]:
+        builder = EnvironBuilder(path=path, method=method, json=body, headers=headers)
+        try:
+            environ = builder.get_environ()
+        finally:
+            builder.close()
+        with self.app.request_context(environ):
+            try:
+                response = self.app.full_dispatch_request()
+            except Exception as e:
+                logger.error(f"Пакет: ошибка {method} {path}: {e}")
+                response = self.app.make_response(({'error': 'Внутренняя ошибка'}, 500))
+            data = response.get_data()
+            mimetype = response.mimetype or ''
+            response.close()
+            return response.status_code, data, mimetype
+
+    def execute(self, items: List[dict], headers: Optional[Dict[str, str]] = None) -> Response:
+        """
+        Выполнить пакет и собрать ответ {"responses": {id: {"status", "body"}}}.
+
+        Raises:
+            BatchError: Некорректный пакет
+        """
+        requests = self.normalize(items)
+        # Подзапросы не должны сжиматься: сжимается только итоговый ответ
+        headers = {key: value for key, value in (headers or {}).items()
+                   if key.lower() != 'accept-encoding'}
+        provider = current_app.json
+
+        with (self.snapshot() if self.snapshot else nullcontext()):
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=min(self.max_workers, len(requests)),
+                    thread_name_prefix="API_Batch") as pool:
+                # Каждый поток получает копию контекста - и вместе с ней общий снимок БД
+                futures = [
+                    pool.submit(contextvars.copy_context().run, self._dispatch, method, path, body, headers)
+                    for _, method, path, body in requests
+                ]
+                results = [f.result() for f in futures]
+
+        parts = []
+        for (request_id, *_), (status, data, mimetype) in zip(requests, results):
+            if mimetype == 'application/json' and data:
+                body = data
+            else:
+                body = provider.dump_bytes(data.decode('utf-8', 'replace') if data else None)
+            parts.append(provider.dump_bytes(request_id) + b':{"status":'
+                         + str(status).encode() + b',"body":' + body + b'}')
+        payload = b'{"responses":{' + b','.join(parts) + b'}}'
+        return current_app.response_class(payload, mimetype='application/json')
+
+    def execute_preset(self, name: str, params: dict,
+                       headers: Optional[Dict[str, str]] = None) -> Response:
+        """
+        Raises:
+            KeyError: Неизвестный набор
+            BatchError: Набор не собрался из параметров
+        """
+        return self.execute(self.presets[name](params), headers)
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Сжатие ответов
+gzip (и brotli, если установлен пакет brotli) по заголовку Accept-Encoding:
+JSON-ответы сжимаются на лету, потоковые - по частям, а статика
+(app.js, styles.css) сжимается один раз при запуске и отдаётся готовой
+"""
+import gzip
+import mimetypes
+import zlib
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+from flask import Flask, request, send_file
+
+try:
+    import brotli
+    HAS_BROTLI = True
+except ImportError:
+    HAS_BROTLI = False
+
+logger = logging.getLogger(__name__)
+
+# Типы содержимого, которые имеет смысл сжимать
+COMPRESSIBLE_TYPES = (
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'text/html',
+    'text/css',
+    'text/javascript',
+    'text/plain',
+    'image/svg+xml',
+)
+# Потоки событий сжимать нельзя: браузер получит события только после сброса буфера
+EXCLUDED_TYPES = ('text/event-stream',)
+
+# Расширение предсжатого файла по кодировке
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def supported_encodings():
+    return ('br', 'gzip') if HAS_BROTLI else ('gzip',)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Лучшая кодировка из принимаемых клиентом (br предпочтительнее gzip)"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0
+        if name:
+            accepted[name.strip().lower()] = q
+    for encoding in supported_encodings():
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=5 if level is None else level)
+    return gzip.compress(data, compresslevel=6 if level is None else level, mtime=0)
+
+
+def compress_stream(chunks: Iterable, encoding: str) -> Iterator[bytes]:
+    """
+    Сжатие потокового ответа по частям.
+    Каждая часть сбрасывается сразу, чтобы клиент получал строки NDJSON без задержки.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip-обёртка
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+class Compression:
+    """
+    Подключение сжатия к приложению Flask.
+
+    Ответы меньше min_size не сжимаются: заголовки gzip и затраты CPU
+    на маленьких ответах не окупаются.
+    """
+
+    def __init__(self, app: Optional[Flask] = None, min_size: int = 1024,
+                 precompressed_dir: Optional[Path] = None):
+        """
+        Args:
+            app: Приложение Flask
+            min_size: Минимальный размер тела для сжатия (байт)
+            precompressed_dir: Каталог для предсжатой статики (None - сжимать статику на лету не будем)
+        """
+        self.min_size = min_size
+        self.precompressed_dir = Path(precompressed_dir) if precompressed_dir else None
+        self.static_dir: Optional[Path] = None
+        # путь относительно static -> {кодировка: путь к сжатому файлу}
+        self._static: Dict[str, Dict[str, Path]] = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask):
+        self.static_dir = Path(app.static_folder) if app.static_folder else None
+        if self.precompressed_dir and self.static_dir:
+            try:
+                self.build_static()
+            except OSError as e:
+                logger.error(f"Не удалось подготовить сжатую статику: {e}")
+        app.before_request(self._serve_precompressed)
+        app.after_request(self._compress_response)
+
+    # ============== СТАТИКА ==============
+
+    def build_static(self) -> int:
+        """
+        Сжать статические файлы (максимальный уровень, один раз).
+        Файлы пересобираются, только если исходник новее сжатой копии.
+
+        Returns:
+            Количество пересобранных файлов
+        """
+        built = 0
+        self._static = {}
+        for source in self.static_dir.rglob('*'):
+            if not source.is_file() or source.stat().st_size < self.min_size:
+                continue
+            mimetype = mimetypes.guess_type(source.name)[0] or ''
+            if not mimetype.startswith(COMPRESSIBLE_TYPES):
+                continue
+            relative = source.relative_to(self.static_dir).as_posix()
+            variants = {}
+            for encoding in supported_encodings():
+                target = self.precompressed_dir / (relative + SUFFIXES[encoding])
+                if not target.exists() or target.stat().st_mtime < source.stat().st_mtime:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    level = 11 if encoding == 'br' else 9
+                    tmp = target.with_name(target.name + '.tmp')
+                    tmp.write_bytes(compress(source.read_bytes(), encoding, level))
+                    tmp.replace(target)
+                    built += 1
+                variants[encoding] = target
+            self._static[relative] = variants
+        if built:
+            logger.info(f"Сжато статических файлов: {built}")
+        return built
+
+    def _serve_precompressed(self):
+        if not self._static or request.method not in ('GET', 'HEAD'):
+            return None
+        path = request.path
+        if not path.startswith('/static/'):
+            return None
+        relative = path[len('/static/'):]
+        variants = self._static.get(relative)
+        if not variants:
+            return None
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding not in variants:
+            return None
+        source = self.static_dir / relative
+        target = variants[encoding]
+        if not target.exists() or target.stat().st_mtime < source.stat().st_mtime:
+            # Исходник изменился после запуска - отдаём как обычно
+            return None
+        response = send_file(target, mimetype=mimetypes.guess_type(source.name)[0],
+                             conditional=True, max_age=None)
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
+
+    # ============== ДИНАМИЧЕСКИЕ ОТВЕТЫ ==============
+
+    def _compress_response(self, response):
+        if (response.status_code != 200
+                or 'Content-Encoding' in response.headers
+                or response.direct_passthrough):
+            return response
+        mimetype = response.mimetype or ''
+        if mimetype.startswith(EXCLUDED_TYPES) or not mimetype.startswith(COMPRESSIBLE_TYPES):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoding)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(compress(data, encoding))
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            # Сжатое представление - другая сущность, у неё свой ETag
+            response.set_etag(f"{etag}-{encoding}", weak=weak)
+        return response
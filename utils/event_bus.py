@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""
+Шина событий для Server-Sent Events
+Фоновые задачи публикуют события, открытые вкладки получают их
+через один поток /api/events вместо периодических опросов
+"""
+import json
+import queue
+import threading
+import time
+import logging
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """Очередь событий одного подписчика"""
+
+    def __init__(self, max_queue: int):
+        self.queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max_queue)
+        self.created_at = time.monotonic()
+        self.dropped = 0
+
+    def put(self, message: str):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # Медленный клиент: старые события теряются, поток не блокируется
+            self.dropped += 1
+
+
+class EventBus:
+    """
+    Публикация событий подписчикам SSE.
+
+    Каждое соединение SSE занимает поток сервера Flask, поэтому поток
+    ограничен по времени жизни (max_lifetime) - браузерный EventSource
+    сам переподключается, а закрытые вкладки освобождают поток не позже
+    следующего heartbeat. Переподключение поток сервера не освобождает,
+    поэтому max_subscribers должен быть малой долей потоков сервера:
+    сверх лимита вкладки получают 503 и обновляются опросом.
+    """
+
+    def __init__(self, max_subscribers: int = 8, heartbeat: float = 15,
+                 max_lifetime: float = 300, max_queue: int = 100, retry_ms: int = 3000):
+        """
+        Args:
+            max_subscribers: Максимум одновременных потоков SSE
+            heartbeat: Период комментария-пинга (сек), выявляет закрытые соединения
+            max_lifetime: Время жизни одного потока (сек), затем клиент переподключается
+            max_queue: Размер очереди событий подписчика
+            retry_ms: Пауза переподключения EventSource (мс)
+        """
+        self.max_subscribers = max_subscribers
+        self.heartbeat = heartbeat
+        self.max_lifetime = max_lifetime
+        self.max_queue = max_queue
+        self.retry_ms = retry_ms
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+        # Отказы по лимиту (вкладки, оставшиеся на опросе)
+        self.rejected = 0
+        self._on_subscribe: List[Callable[[], None]] = []
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def on_subscribe(self, callback: Callable[[], None]):
+        """Вызывать callback при появлении подписчика (ленивый запуск наблюдателей)"""
+        self._on_subscribe.append(callback)
+
+    def subscribe(self) -> Optional[Subscription]:
+        """Новый подписчик или None, если лимит исчерпан"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self.rejected += 1
+                rejected = self.rejected
+                sub = None
+            else:
+                sub = Subscription(self.max_queue)
+                self._subscribers.append(sub)
+        if sub is None:
+            if rejected == 1 or rejected % 50 == 0:
+                logger.warning(f"Лимит потоков событий ({self.max_subscribers}) исчерпан, "
+                               f"вкладки переходят на опрос (отказов: {rejected})")
+            return None
+        for callback in self._on_subscribe:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Ошибка обработчика подписки: {e}")
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            if sub in self._subscribers:
+                self._subscribers.remove(sub)
+
+    @staticmethod
+    def format(event: str, data) -> str:
+        payload = json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+        return f"event: {event}\ndata: {payload}\n\n"
+
+    def publish(self, event: str, data) -> int:
+        """
+        Разослать событие всем подписчикам
+
+        Returns:
+            Количество получателей
+        """
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return 0
+        message = self.format(event, data)
+        for sub in subscribers:
+            sub.put(message)
+        return len(subscribers)
+
+    def stream(self, sub: Subscription):
+        """Генератор тела ответа text/event-stream"""
+        try:
+            yield f"retry: {self.retry_ms}\n\n"
+            deadline = sub.created_at + self.max_lifetime
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    message = sub.queue.get(timeout=min(self.heartbeat, remaining))
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(sub)
+
+    def close_all(self):
+        """Завершить все потоки (при остановке приложения)"""
+        with self._lock:
+            subscribers, self._subscribers = self._subscribers, []
+        for sub in subscribers:
+            try:
+                sub.queue.put_nowait(None)
+            except queue.Full:
+                pass
+
+
+class ChangeWatcher:
+    """
+    Фоновая проверка изменений, пока есть подписчики.
+
+    check() должна быть дешёвой (например, PRAGMA data_version) и
+    возвращать маркер версии; при его смене вызывается on_change().
+    Тяжёлая работа выполняется один раз на изменение, а не на каждый опрос клиентов.
+    """
+
+    def __init__(self, bus: EventBus, check: Callable[[], object],
+                 on_change: Callable[[], None], interval: float = 2):
+        self.bus = bus
+        self.check = check
+        self.on_change = on_change
+        self.interval = interval
+        self._version = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        bus.on_subscribe(self.ensure_running)
+
+    def ensure_running(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="Change_Watcher", daemon=True)
+            self._thread.start()
+
+    def _has_subscribers(self) -> bool:
+        # Решение о завершении принимается под блокировкой, чтобы
+        # новый подписчик не остался без наблюдателя
+        with self._lock:
+            if self.bus.subscriber_count:
+                return True
+            self._thread = None
+            return False
+
+    def _loop(self):
+        if self._version is None:
+            try:
+                self._version = self.check()
+            except Exception as e:
+                logger.error(f"Ошибка проверки изменений: {e}")
+        # Поток живёт, пока есть подписчики; следующий подписчик запустит новый
+        while self._has_subscribers():
+            time.sleep(self.interval)
+            try:
+                version = self.check()
+                if version != self._version:
+                    self._version = version
+                    self.on_change()
+            except Exception as e:
+                logger.error(f"Ошибка проверки изменений: {e}")
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""
+Задания на массовое кэширование изображений
+Состояние каждого задания (список артикулов, позиция, ошибки) хранится
+на диске, поэтому после перезапуска загрузка продолжается с места остановки
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+import logging
+from dataclasses import dataclass, field, asdict, fields
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Состояния задания
+QUEUED = "queued"
+RUNNING = "running"
+PAUSED = "paused"
+CANCELLED = "cancelled"
+FINISHED = "finished"
+
+ACTIVE_STATES = (QUEUED, RUNNING)
+DONE_STATES = (CANCELLED, FINISHED)
+
+# Области заданий
+SCOPES = ("buyer", "cell", "all")
+
+
+@dataclass
+class ImageJob:
+    """Задание на кэширование изображений"""
+    id: str
+    scope: str                      # buyer / cell / all
+    target: Optional[str] = None    # user_sid или ячейка
+    goods_type: str = "all"         # all / ready / onway
+    size: str = "small"
+    items: List[str] = field(default_factory=list)  # артикулы в порядке загрузки
+    cursor: int = 0                 # сколько артикулов уже обработано (контрольная точка)
+    downloaded: int = 0
+    cached: int = 0
+    failed: Dict[str, str] = field(default_factory=dict)  # артикул -> причина
+    retry_items: List[str] = field(default_factory=list)  # очередь пакетного повтора
+    retry_rounds: int = 0
+    state: str = QUEUED
+    created_at: float = 0
+    updated_at: float = 0
+    finished_at: Optional[float] = None
+
+    @property
+    def total(self) -> int:
+        return len(self.items)
+
+    @property
+    def is_active(self) -> bool:
+        return self.state in ACTIVE_STATES
+
+    def to_dict(self, with_items: bool = False) -> dict:
+        data = asdict(self)
+        if not with_items:
+            data.pop("items")
+            data.pop("retry_items")
+        data["total"] = self.total
+        data["current"] = self.cursor
+        data["failed_count"] = len(self.failed)
+        data["finished"] = not self.is_active
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ImageJob":
+        known = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in known})
+
+
+class ImageJobManager:
+    """
+    Менеджер заданий.
+
+    Каждое активное задание выполняется в своём фоновом потоке. Позиция
+    сохраняется на диск каждые CHECKPOINT_EVERY артикулов и при смене
+    состояния. Неудачные артикулы после основного прохода повторяются
+    пакетами по RETRY_CHUNK через пул загрузчика; между пакетами
+    проверяются пауза и отмена.
+    """
+
+    CHECKPOINT_EVERY = 10
+    # Сколько хранить завершённые задания (сек)
+    RETENTION_SECONDS = 24 * 3600
+    # Автоматических пакетных повторов после основного прохода
+    AUTO_RETRY_ROUNDS = 1
+    # Артикулов в одном пакете повтора
+    RETRY_CHUNK = 16
+
+    # Паузы между загрузками (баланс скорости и нагрузки на WB)
+    DELAY_DOWNLOADED = 0.2
+    DELAY_CACHED = 0.02
+    DELAY_FAILED = 0.2
+    DELAY_ERROR = 0.5
+
+    # Не чаще чем раз в столько секунд уведомлять о прогрессе задания
+    NOTIFY_INTERVAL = 0.25
+
+    def __init__(self, wb_api, jobs_dir: Path,
+                 on_update: Optional[Callable[["ImageJob"], None]] = None):
+        """
+        Args:
+            wb_api: Клиент WildberriesAPI
+            jobs_dir: Каталог с состоянием заданий
+            on_update: Вызывается при изменении прогресса или состояния задания
+        """
+        self.wb_api = wb_api
+        self.jobs_dir = Path(jobs_dir)
+        self.on_update = on_update
+        self._notified_at: Dict[str, float] = {}
+        self._jobs: Dict[str, ImageJob] = {}
+        # Текущий поток-исполнитель задания: job_id -> токен запуска
+        # (поток, заставший чужой токен, завершается - так пауза и
+        # быстрое возобновление не дают двух исполнителей одного задания)
+        self._runners: Dict[str, object] = {}
+        self._lock = threading.RLock()
+        self._load()
+
+    # ============== ХРАНЕНИЕ ==============
+
+    def _path(self, job_id: str) -> Path:
+        return self.jobs_dir / f"{job_id}.json"
+
+    def _load(self):
+        if not self.jobs_dir.exists():
+            return
+        for path in self.jobs_dir.glob("*.json"):
+            try:
+                job = ImageJob.from_dict(json.loads(path.read_text(encoding="utf-8")))
+            except (OSError, ValueError, TypeError) as e:
+                logger.warning(f"Повреждённое задание {path.name}: {e}")
+                path.unlink(missing_ok=True)
+                continue
+            self._jobs[job.id] = job
+        self._prune()
+
+    def _save(self, job: ImageJob):
+        """Атомарная запись состояния задания"""
+        with self._lock:
+            job.updated_at = time.time()
+            data = json.dumps(job.to_dict(with_items=True), ensure_ascii=False)
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.jobs_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp_name, self._path(job.id))
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        self._notify(job, force=True)
+
+    def _notify(self, job: ImageJob, force: bool = False):
+        if self.on_update is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._notified_at.get(job.id, 0) < self.NOTIFY_INTERVAL:
+            return
+        self._notified_at[job.id] = now
+        try:
+            self.on_update(job)
+        except Exception as e:
+            logger.error(f"Ошибка уведомления о задании {job.id}: {e}")
+
+    def _prune(self):
+        """Удалить давно завершённые задания"""
+        now = time.time()
+        with self._lock:
+            expired = [
+                job.id for job in self._jobs.values()
+                if job.state in DONE_STATES
+                and now - (job.finished_at or job.updated_at) > self.RETENTION_SECONDS
+            ]
+            for job_id in expired:
+                self._jobs.pop(job_id, None)
+                self._path(job_id).unlink(missing_ok=True)
+
+    # ============== ЗАПРОСЫ ==============
+
+    def get(self, job_id: str) -> Optional[ImageJob]:
+        return self._jobs.get(job_id)
+
+    def describe(self, job: ImageJob) -> dict:
+        """Согласованный снимок задания для API"""
+        with self._lock:
+            return job.to_dict()
+
+    def list_jobs(self) -> List[ImageJob]:
+        self._prune()
+        return sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+
+    def find(self, scope: str, target: Optional[str] = None) -> Optional[ImageJob]:
+        """Последнее задание для области (активное - в приоритете)"""
+        self._prune()
+        matches = [j for j in self._jobs.values() if j.scope == scope and j.target == target]
+        if not matches:
+            return None
+        return max(matches, key=lambda job: (job.is_active, job.created_at))
+
+    # ============== УПРАВЛЕНИЕ ==============
+
+    def create(self, scope: str, target: Optional[str], items: List[str],
+               goods_type: str = "all", size: str = "small") -> ImageJob:
+        """
+        Создать и запустить задание.
+        Если для области уже есть активное - возвращается оно (без дублей).
+        """
+        with self._lock:
+            current = self.find(scope, target)
+            if current and current.is_active:
+                return current
+            now = time.time()
+            job = ImageJob(
+                id=uuid.uuid4().hex[:12],
+                scope=scope,
+                target=target,
+                goods_type=goods_type,
+                size=size,
+                items=list(dict.fromkeys(str(vc) for vc in items if vc)),
+                created_at=now,
+            )
+            self._jobs[job.id] = job
+            self._save(job)
+        self._spawn(job)
+        return job
+
+    def pause(self, job_id: str) -> Optional[ImageJob]:
+        return self._set_state(job_id, PAUSED, allowed=ACTIVE_STATES)
+
+    def cancel(self, job_id: str) -> Optional[ImageJob]:
+        job = self._set_state(job_id, CANCELLED, allowed=ACTIVE_STATES + (PAUSED,))
+        if job and job.state == CANCELLED and not job.finished_at:
+            job.finished_at = time.time()
+            self._save(job)
+        return job
+
+    def resume(self, job_id: str) -> Optional[ImageJob]:
+        job = self._set_state(job_id, QUEUED, allowed=(PAUSED,))
+        if job and job.state == QUEUED:
+            self._spawn(job)
+        return job
+
+    def retry(self, job_id: str) -> Optional[ImageJob]:
+        """Поставить неудачные артикулы на пакетный повтор"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.is_active or not job.failed:
+                return job
+            job.retry_items = list(job.failed)
+            job.retry_rounds += 1
+            job.state = QUEUED
+            job.finished_at = None
+            self._save(job)
+        self._spawn(job)
+        return job
+
+    def _set_state(self, job_id: str, state: str, allowed) -> Optional[ImageJob]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.state in allowed:
+                job.state = state
+                self._save(job)
+            return job
+
+    def resume_interrupted(self) -> int:
+        """Продолжить задания, прерванные перезапуском приложения"""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if job.is_active]
+        for job in jobs:
+            job.state = QUEUED
+            self._spawn(job)
+        if jobs:
+            logger.info(f"Возобновлено заданий загрузки изображений: {len(jobs)}")
+        return len(jobs)
+
+    # ============== ВЫПОЛНЕНИЕ ==============
+
+    def _spawn(self, job: ImageJob):
+        token = object()
+        with self._lock:
+            self._runners[job.id] = token
+        threading.Thread(target=lambda: self._run(job, token), daemon=True).start()
+
+    def _should_stop(self, job: ImageJob, token: object) -> bool:
+        return job.state != RUNNING or self._runners.get(job.id) is not token
+
+    def _run(self, job: ImageJob, token: object):
+        with self._lock:
+            if job.state != QUEUED or self._runners.get(job.id) is not token:
+                return
+            job.state = RUNNING
+            self._save(job)
+        try:
+            self._run_items(job, token)
+            self._run_retries(job, token)
+            with self._lock:
+                if not self._should_stop(job, token):
+                    job.state = FINISHED
+                    job.finished_at = time.time()
+        except Exception as e:
+            logger.error(f"Ошибка задания {job.id}: {e}")
+            with self._lock:
+                if job.state == RUNNING:
+                    job.state = PAUSED
+        finally:
+            with self._lock:
+                if self._runners.get(job.id) is token:
+                    self._runners.pop(job.id, None)
+                self._save(job)
+
+    def _run_items(self, job: ImageJob, token: object):
+        """Основной проход: с контрольной точки до конца списка"""
+        if job.cursor < job.total:
+            self.wb_api.warm_up(job.items[job.cursor:])
+        while job.cursor < job.total:
+            if self._should_stop(job, token):
+                return
+            vendor_code = job.items[job.cursor]
+            error = None
+            try:
+                path, downloaded = self.wb_api.download_image_sync(vendor_code, 1, job.size, force=False)
+                delay = (self.DELAY_DOWNLOADED if downloaded
+                         else self.DELAY_CACHED if path else self.DELAY_FAILED)
+            except Exception as e:
+                path, downloaded, error = None, False, str(e)
+                delay = self.DELAY_ERROR
+
+            with self._lock:
+                # Пока шла загрузка, задание могли передать другому исполнителю
+                if self._runners.get(job.id) is not token:
+                    return
+                if downloaded:
+                    job.downloaded += 1
+                elif path:
+                    job.cached += 1
+                else:
+                    job.failed[vendor_code] = error or "not found"
+                job.cursor += 1
+                if job.cursor % self.CHECKPOINT_EVERY == 0:
+                    self._save(job)
+                else:
+                    self._notify(job)
+            time.sleep(delay)
+
+    def _run_retries(self, job: ImageJob, token: object):
+        """
+        Пакетный повтор неудачных артикулов (параллельно через пул загрузчика).
+        Очередь retry_items сокращается после каждого пакета, поэтому
+        пауза останавливает повтор между пакетами, а возобновление
+        продолжает его с оставшихся артикулов.
+        """
+        with self._lock:
+            if self._should_stop(job, token):
+                return
+            if not job.retry_items and job.failed and job.retry_rounds < self.AUTO_RETRY_ROUNDS:
+                job.retry_items = list(job.failed)
+                job.retry_rounds += 1
+                self._save(job)
+
+        while job.retry_items:
+            if self._should_stop(job, token):
+                return
+            chunk = job.retry_items[:self.RETRY_CHUNK]
+            results = self.wb_api.prefetch_images(chunk, job.size)
+            with self._lock:
+                # Пока шёл пакет, задание могли передать другому исполнителю
+                if self._runners.get(job.id) is not token:
+                    return
+                for vendor_code, path in results.items():
+                    if path:
+                        job.failed.pop(vendor_code, None)
+                        job.downloaded += 1
+                job.retry_items = job.retry_items[len(chunk):]
+                self._save(job)
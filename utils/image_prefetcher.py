@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+"""
+Фоновая предзагрузка изображений в периоды простоя
+Ночью или при долгом отсутствии действий в интерфейсе кэш заполняется
+изображениями ожидаемых товаров, чтобы не конкурировать с WB ПВЗ за канал
+"""
+import threading
+import time
+import logging
+import concurrent.futures
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Запросы, которые не считаются действиями пользователя (опросы по таймеру, картинки)
+PASSIVE_PREFIXES = (
+    '/static/',
+    '/api/cached_image/',
+    '/api/buyer-photo/',
+    '/api/qr/',
+    '/api/images/',
+    '/api/vendor-codes',
+    '/api/bot/status',
+    '/api/diagnostics/',
+    '/api/metrics/',
+    '/api/events',
+)
+# Заголовок, которым фронтенд помечает фоновые запросы (автообновление)
+BACKGROUND_HEADER = 'X-Background-Request'
+
+
+class TokenBucket:
+    """Ограничение скорости в байтах в секунду (можно уйти в долг на один файл)"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: float) -> float:
+        """Списать байты, вернуть сколько секунд нужно подождать до следующей загрузки"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0
+
+
+class ImagePrefetcher:
+    """
+    Планировщик предзагрузки.
+
+    Раз в check_interval проверяет, наступил ли простой: ночное окно
+    (и хотя бы минута без действий) либо idle_minutes без действий днём.
+    В простое обходит артикулы из get_codes и качает отсутствующие в кэше
+    с ограниченной параллельностью и скоростью. Любое действие
+    пользователя (mark_activity) прерывает обход сразу.
+    """
+
+    # Минимальная пауза после действия пользователя внутри ночного окна (сек)
+    WINDOW_QUIET_SECONDS = 60
+    # Неудачная попытка: повтор через RETRY_BASE секунд, с каждой неудачей вдвое дольше
+    RETRY_BASE = 600
+    RETRY_MAX = 24 * 3600
+    # Трафик неудачной попытки для бюджета канала: запрос к расчётному серверу
+    # и HEAD-пробы остальных basket-серверов (~1 КБ заголовков на запрос)
+    FAILED_ATTEMPT_BYTES = 32 * 1024
+
+    def __init__(self, wb_api, get_codes: Callable[[], Iterable[str]],
+                 windows: List[Tuple[int, int]] = None, idle_minutes: float = 20,
+                 concurrency: int = 2, bytes_per_second: float = 256 * 1024,
+                 size: str = 'small', check_interval: float = 30,
+                 enabled: bool = True):
+        """
+        Args:
+            wb_api: Клиент WildberriesAPI (кэш и загрузка)
+            get_codes: Функция, возвращающая артикулы в порядке важности
+            windows: Окна простоя [(час начала, час конца)], могут переходить через полночь
+            idle_minutes: Сколько минут без действий считается простоем вне окон
+            concurrency: Число одновременных загрузок
+            bytes_per_second: Бюджет канала
+            size: Размер изображений для предзагрузки
+            check_interval: Период проверки простоя (сек)
+            enabled: Включена ли предзагрузка
+        """
+        self.wb_api = wb_api
+        self.get_codes = get_codes
+        self.windows = list(windows or [])
+        self.idle_seconds = idle_minutes * 60
+        self.concurrency = max(1, concurrency)
+        self.bytes_per_second = bytes_per_second
+        self.size = size
+        self.check_interval = check_interval
+        self.enabled = enabled
+
+        self._last_activity = time.monotonic()
+        self._interrupt = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._stats_lock = threading.Lock()
+        # Поставленные на повторную загрузку (после остальных): vendor_code -> размер
+        self._requeued: Dict[str, str] = {}
+        # Неудачные артикулы: vendor_code -> (число неудач подряд, когда можно повторить)
+        self._failures: Dict[str, Tuple[int, float]] = {}
+        self.stats = {
+            'runs': 0,
+            'downloaded': 0,
+            'failed': 0,
+            'bytes': 0,
+            'interrupted': 0,
+            'last_run_started': None,
+            'last_run_finished': None,
+        }
+
+    # ============== АКТИВНОСТЬ ==============
+
+    def mark_activity(self):
+        """Пользователь что-то делает - прекратить предзагрузку"""
+        self._last_activity = time.monotonic()
+        if self._running:
+            self._interrupt.set()
+
+    def note_request(self, path: str, headers) -> None:
+        """Отметить активность по HTTP-запросу, пропуская фоновые"""
+        if path.startswith(PASSIVE_PREFIXES) or headers.get(BACKGROUND_HEADER):
+            return
+        self.mark_activity()
+
+    def in_window(self, now: Optional[datetime] = None) -> bool:
+        hour = (now or datetime.now()).hour
+        for start, end in self.windows:
+            if start <= end:
+                if start <= hour < end:
+                    return True
+            elif hour >= start or hour < end:
+                return True
+        return False
+
+    def is_idle(self, now: Optional[datetime] = None) -> bool:
+        quiet = time.monotonic() - self._last_activity
+        if self.in_window(now):
+            return quiet >= self.WINDOW_QUIET_SECONDS
+        return quiet >= self.idle_seconds
+
+    # ============== ЖИЗНЕННЫЙ ЦИКЛ ==============
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="Image_Prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._interrupt.set()
+        self._thread = None
+
+    def _loop(self):
+        while not self._stop.wait(self.check_interval):
+            if not self.is_idle():
+                continue
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"Ошибка предзагрузки изображений: {e}")
+
+    # ============== ОБХОД ==============
+
+    def requeue(self, vendor_code: str, size: Optional[str] = None):
+        """
+        Догрузить артикул в ближайший простой с низким приоритетом
+
+        Args:
+            size: Размер, которого не хватает (по умолчанию - размер предзагрузки);
+                для мастер-копии загрузка идёт, даже если вариант ещё в кэше
+        """
+        vendor_code = str(vendor_code)
+        with self._stats_lock:
+            self._requeued[vendor_code] = size or self.size
+            # Битый файл - не недоступный артикул: прошлые неудачи не в счёт
+            self._failures.pop(vendor_code, None)
+
+    def _pending_codes(self) -> List[Tuple[str, str]]:
+        """Отсутствующие в кэше (артикул, размер) в порядке загрузки"""
+        with self._stats_lock:
+            requeued = list(self._requeued.items())
+        now = time.monotonic()
+        pending = []
+        missing = set()
+        for vc, size in dict.fromkeys([(str(c), self.size) for c in self.get_codes() if c] + requeued):
+            if self.wb_api.cached_entry(vc, 1, size):
+                continue
+            missing.add((vc, size))
+            failure = self._failures.get(vc)
+            if failure is None or failure[1] <= now:
+                pending.append((vc, size))
+        missing_codes = {vc for vc, _ in missing}
+        with self._stats_lock:
+            self._requeued = {vc: size for vc, size in self._requeued.items() if (vc, size) in missing}
+            # Артикулы, ушедшие из списка или появившиеся в кэше, больше не отслеживаются
+            self._failures = {vc: f for vc, f in self._failures.items() if vc in missing_codes}
+        return pending
+
+    def _note_failure(self, vendor_code: str):
+        with self._stats_lock:
+            count = self._failures.get(vendor_code, (0, 0))[0] + 1
+            delay = min(self.RETRY_BASE * 2 ** (count - 1), self.RETRY_MAX)
+            self._failures[vendor_code] = (count, time.monotonic() + delay)
+            self.stats['failed'] += 1
+
+    def run_once(self) -> int:
+        """
+        Один проход предзагрузки (пока не прерван)
+
+        Returns:
+            Количество скачанных изображений
+        """
+        self._interrupt.clear()
+        self._running = True
+        self.stats['runs'] += 1
+        self.stats['last_run_started'] = time.time()
+        downloaded = 0
+        try:
+            pending = self._pending_codes()
+            if not pending:
+                return 0
+            logger.info(f"Предзагрузка изображений: {len(pending)} артикулов")
+            self.wb_api.warm_up(list(dict.fromkeys(vc for vc, _ in pending)))
+
+            bucket = TokenBucket(self.bytes_per_second)
+            queue = iter(pending)
+            queue_lock = threading.Lock()
+
+            def worker():
+                count = 0
+                while not self._interrupt.is_set():
+                    with queue_lock:
+                        item = next(queue, None)
+                    if item is None:
+                        break
+                    downloaded_one, nbytes = self._fetch_one(*item)
+                    count += downloaded_one
+                    if nbytes:
+                        # Пауза по бюджету канала (неудачные попытки тоже тратят канал),
+                        # прерывается действием пользователя
+                        delay = bucket.consume(nbytes)
+                        if delay and self._interrupt.wait(delay):
+                            break
+                return count
+
+            with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.concurrency, thread_name_prefix="Image_Prefetch") as pool:
+                downloaded = sum(pool.map(lambda _: worker(), range(self.concurrency)))
+
+            if self._interrupt.is_set():
+                self.stats['interrupted'] += 1
+                logger.info(f"Предзагрузка прервана активностью (скачано {downloaded})")
+            return downloaded
+        finally:
+            self._running = False
+            self.stats['last_run_finished'] = time.time()
+
+    def _fetch_one(self, vendor_code: str, size: Optional[str] = None) -> Tuple[bool, int]:
+        """
+        Скачать изображение (по умолчанию - размер предзагрузки)
+
+        Returns:
+            (скачано ли, объём трафика в байтах; для неудачи - оценка FAILED_ATTEMPT_BYTES)
+        """
+        try:
+            # Действие пользователя обрывает и текущую загрузку, а не только очередь
+            path, downloaded = self.wb_api.download_image_sync(vendor_code, 1, size or self.size,
+                                                               cancel=self._interrupt)
+        except concurrent.futures.CancelledError:
+            return False, 0
+        except Exception as e:
+            logger.debug(f"Предзагрузка {vendor_code}: {e}")
+            path, downloaded = None, False
+        if not path:
+            self._note_failure(vendor_code)
+            return False, self.FAILED_ATTEMPT_BYTES
+        with self._stats_lock:
+            self._failures.pop(vendor_code, None)
+        if not downloaded:
+            return False, 0
+        # Из сети пришла мастер-копия, вариант получен локально
+        entry = (self.wb_api.cache.peek(vendor_code, 1, self.wb_api.master_size)
+                 or self.wb_api.cache.peek(vendor_code, 1, size or self.size))
+        nbytes = entry.nbytes if entry else 0
+        with self._stats_lock:
+            self.stats['downloaded'] += 1
+            self.stats['bytes'] += nbytes
+        return True, nbytes
+
+    def status(self) -> dict:
+        return {
+            'enabled': self.enabled,
+            'running': self._running,
+            'idle': self.is_idle(),
+            'in_window': self.in_window(),
+            'windows': self.windows,
+            'bytes_per_second': self.bytes_per_second,
+            'concurrency': self.concurrency,
+            'requeued': len(self._requeued),
+            'backing_off': len(self._failures),
+            **self.stats,
+        }
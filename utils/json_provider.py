@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+JSON-сериализация ответов
+orjson (если установлен) вместо стандартного json: в разы быстрее
+на больших списках товаров и сам разбирает dataclass-модели;
+без orjson - стандартный json с теми же правилами
+"""
+import dataclasses
+import decimal
+import json
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+from flask import Response, current_app
+from flask.json.provider import DefaultJSONProvider
+
+from utils.request_timing import track
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def _default(obj: Any):
+    """Типы, которые сериализатор не знает сам"""
+    if hasattr(obj, '__json__'):
+        return obj.__json__()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Path):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON-провайдер Flask: кириллица без \\u-экранирования, порядок ключей сохраняется"""
+
+    ensure_ascii = False
+    sort_keys = False
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        if HAS_ORJSON and not kwargs:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('default', _default)
+        return json.dumps(obj, **kwargs)
+
+    def dump_bytes(self, obj: Any) -> bytes:
+        if HAS_ORJSON:
+            return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return self.dumps(obj).encode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if HAS_ORJSON and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        with track('serialize'):
+            data = self.dump_bytes(obj)
+        return self._app.response_class(data, mimetype=self.mimetype)
+
+
+def json_list_response(key: str, items: Sequence, convert: Optional[Callable[[Any], Any]] = None,
+                       extra: Optional[dict] = None, stream_threshold: int = 500,
+                       chunk_size: int = 500) -> Response:
+    """
+    Ответ вида {**extra, key: [...]}.
+
+    Короткие списки отдаются обычным JSON. Длинные - потоком: элементы
+    преобразуются и сериализуются частями по chunk_size, поэтому весь
+    список словарей не собирается в памяти до начала отправки.
+    """
+    convert = convert or (lambda item: item)
+    if len(items) <= stream_threshold:
+        return current_app.json.response({**(extra or {}), key: [convert(i) for i in items]})
+
+    provider = current_app.json
+
+    def generate() -> Iterable[bytes]:
+        head = provider.dump_bytes(extra or {})[:-1]  # без закрывающей скобки
+        yield head + (b',' if len(head) > 1 else b'') + provider.dump_bytes(key) + b':['
+        for start in range(0, len(items), chunk_size):
+            chunk = provider.dump_bytes([convert(i) for i in items[start:start + chunk_size]])
+            yield (b',' if start else b'') + chunk[1:-1]
+        yield b']}'
+
+    return Response(generate(), mimetype=provider.mimetype)
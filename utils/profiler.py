@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Профилировщик по выборкам стеков
+Раз в несколько миллисекунд снимает стеки потоков живого процесса
+(sys._current_frames) и считает, где они находятся. Без запуска профилирования
+ничего не работает и не стоит; во время замера процесс не замедляется
+заметно, в отличие от cProfile, который перехватывает каждый вызов
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Потоки, обслуживающие HTTP-запросы: waitress, встроенный сервер Flask,
+# пулы пакетных запросов и поиска
+WEB_THREAD_PREFIXES = ('waitress', 'API_Batch', 'Search')
+WEB_THREAD_MARKERS = ('process_request_thread',)
+# Потоки конвейера изображений (пул VariantRenderer - отдельные процессы, их здесь не видно)
+POOL_THREAD_PREFIXES = ('WB_Image', 'Image_Prefetch', 'Image_Integrity')
+
+THREAD_GROUPS = ('web', 'pools', 'all')
+
+# Верхние кадры потока, который просто ждёт работу
+IDLE_FRAMES = {
+    ('threading', 'wait'),
+    ('selectors', 'select'),
+    ('queue', 'get'),
+    ('socket', 'accept'),
+    ('base_events', '_run_once'),
+}
+
+
+def thread_group(name: str) -> Optional[str]:
+    if name.startswith(WEB_THREAD_PREFIXES) or any(m in name for m in WEB_THREAD_MARKERS):
+        return 'web'
+    if name.startswith(POOL_THREAD_PREFIXES):
+        return 'pools'
+    return None
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{code.co_name}"
+
+
+def stack_of(frame) -> List[str]:
+    """Стек от корня к текущему кадру"""
+    stack = []
+    while frame is not None:
+        stack.append(frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+class ProfileBusyError(RuntimeError):
+    """Профилирование уже идёт"""
+
+
+class StackSampler:
+    """
+    Выборки стеков выбранных потоков.
+
+    Один замер за раз: параллельные замеры искажали бы друг друга.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self._lock = threading.Lock()
+        self._clock = clock
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def _select(self, group: str, exclude: Iterable[int]) -> Dict[int, str]:
+        excluded = set(exclude)
+        threads = {}
+        for thread in threading.enumerate():
+            if thread.ident in excluded:
+                continue
+            kind = thread_group(thread.name)
+            if group == 'all' or kind == group or (group == 'pools' and kind == 'web'):
+                threads[thread.ident] = thread.name
+        return threads
+
+    def sample(self, seconds: float, interval: float = 0.005, group: str = 'web',
+               include_idle: bool = False) -> 'Profile':
+        """
+        Снять выборки за seconds секунд.
+
+        Args:
+            seconds: Длительность замера
+            interval: Пауза между выборками (сек)
+            group: web - потоки запросов, pools - они же и конвейер изображений, all - все потоки
+            include_idle: Учитывать потоки, ожидающие работу
+
+        Raises:
+            ProfileBusyError: Замер уже идёт
+        """
+        if group not in THREAD_GROUPS:
+            raise ValueError(f"Неизвестная группа потоков: {group}")
+        if not self._lock.acquire(blocking=False):
+            raise ProfileBusyError("Профилирование уже запущено")
+        try:
+            me = threading.get_ident()
+            stacks: Counter = Counter()
+            samples = 0
+            started = self._clock()
+            deadline = started + seconds
+            threads = self._select(group, exclude=(me,))
+            next_refresh = started + 0.5
+            while True:
+                now = self._clock()
+                if now >= deadline:
+                    break
+                if now >= next_refresh:
+                    # Пулы создают потоки по требованию - список обновляется на ходу
+                    threads = self._select(group, exclude=(me,))
+                    next_refresh = now + 0.5
+                frames = sys._current_frames()
+                samples += 1
+                for ident, name in threads.items():
+                    frame = frames.get(ident)
+                    if frame is None:
+                        continue
+                    code = frame.f_code
+                    leaf = (os.path.splitext(os.path.basename(code.co_filename))[0], code.co_name)
+                    if not include_idle and leaf in IDLE_FRAMES:
+                        continue
+                    stacks[(name,) + tuple(stack_of(frame))] += 1
+                del frames
+                time.sleep(interval)
+            return Profile(stacks, samples, self._clock() - started, interval, group)
+        finally:
+            self._lock.release()
+
+
+class Profile:
+    """Результат замера: свёрнутые стеки и сводка по функциям"""
+
+    def __init__(self, stacks: Counter, samples: int, duration: float, interval: float, group: str):
+        self.stacks = stacks
+        self.samples = samples
+        self.duration = duration
+        self.interval = interval
+        self.group = group
+
+    def collapsed(self) -> str:
+        """
+        Свёрнутые стеки (формат flamegraph.pl / speedscope):
+        "поток;модуль:функция;... число_выборок" - по строке на уникальный стек.
+        Имя потока без номера, чтобы одинаковые потоки пула складывались.
+        """
+        merged: Counter = Counter()
+        for (thread, *frames), count in self.stacks.items():
+            merged[(thread.rstrip('0123456789_-'),) + tuple(frames)] += count
+        lines = [f"{';'.join(stack)} {count}" for stack, count in merged.most_common()]
+        return '\n'.join(lines) + ('\n' if lines else '')
+
+    def top(self, limit: int = 25) -> List[dict]:
+        """Функции по числу выборок: self - на вершине стека, total - где-либо в стеке"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for (_, *frames), count in self.stacks.items():
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+        hits = sum(self.stacks.values()) or 1
+        ranked: List[Tuple[str, int]] = sorted(total.items(), key=lambda item: (own[item[0]], item[1]),
+                                               reverse=True)
+        return [{
+            'function': label,
+            'self': own[label],
+            'total': count,
+            'self_pct': round(own[label] * 100 / hits, 1),
+            'total_pct': round(count * 100 / hits, 1),
+        } for label, count in ranked[:limit]]
+
+    def to_dict(self, limit: int = 25) -> dict:
+        return {
+            'group': self.group,
+            'seconds': round(self.duration, 2),
+            'interval_ms': round(self.interval * 1000, 1),
+            'samples': self.samples,
+            'stack_hits': sum(self.stacks.values()),
+            'top': self.top(limit),
+            'collapsed': self.collapsed(),
+        }
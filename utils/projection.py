@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+Проекция полей в ответах API
+Списки на страницах показывают 3-5 полей товара из ~17, поэтому клиент
+может запросить только нужные (?fields=vendor_code,cell,image_url) и
+компактный формат (?format=compact): имена колонок один раз, строки - массивами.
+Для полей известны колонки БД, из которых они строятся, - по ним
+формируется SELECT вместо SELECT *
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from flask import Response
+
+from utils.json_provider import json_list_response
+
+FORMATS = ('full', 'compact')
+
+
+class FieldSet:
+    """
+    Набор полей объекта для JSON.
+
+    fields: имя поля -> (функция получения значения из объекта, колонки БД).
+    Порядок полей в полном ответе совпадает с порядком в словаре.
+    """
+
+    def __init__(self, fields: Dict[str, Tuple[Callable[[Any], Any], Sequence[str]]],
+                 required_columns: Sequence[str] = ()):
+        """
+        Args:
+            fields: Описание полей
+            required_columns: Колонки, которые нужны всегда (ключи объекта)
+        """
+        self.fields = fields
+        self.required_columns = tuple(required_columns)
+
+    def parse(self, raw: Optional[str]) -> Optional[List[str]]:
+        """
+        Разбор параметра fields.
+
+        Returns:
+            Список полей или None (все поля)
+
+        Raises:
+            ValueError: Неизвестное поле
+        """
+        if not raw:
+            return None
+        names = []
+        for name in raw.split(','):
+            name = name.strip()
+            if not name or name in names:
+                continue
+            if name not in self.fields:
+                raise ValueError(f"Неизвестное поле: {name}")
+            names.append(name)
+        return names or None
+
+    def columns(self, names: Optional[Sequence[str]]) -> Optional[List[str]]:
+        """Колонки БД для выбранных полей (None - все колонки)"""
+        if names is None:
+            return None
+        columns = list(self.required_columns)
+        for name in names:
+            for column in self.fields[name][1]:
+                if column not in columns:
+                    columns.append(column)
+        return columns
+
+    def to_dict(self, obj, names: Optional[Sequence[str]] = None) -> dict:
+        if names is None:
+            return {name: getter(obj) for name, (getter, _) in self.fields.items()}
+        return {name: self.fields[name][0](obj) for name in names}
+
+    def to_row(self, obj, names: Sequence[str]) -> list:
+        return [self.fields[name][0](obj) for name in names]
+
+    def response(self, key: str, items: Sequence, names: Optional[Sequence[str]] = None,
+                 fmt: str = 'full', extra: Optional[dict] = None) -> Response:
+        """
+        Ответ со списком объектов.
+
+        full:    {**extra, key: [{поле: значение}, ...]}
+        compact: {**extra, 'columns': [...], key: [[значение, ...], ...]}
+        """
+        if fmt == 'compact':
+            names = list(names or self.fields)
+            return json_list_response(key, items, lambda obj: self.to_row(obj, names),
+                                      extra={**(extra or {}), 'columns': names})
+        return json_list_response(key, items, lambda obj: self.to_dict(obj, names), extra=extra)
+
+
+def parse_format(raw: Optional[str]) -> str:
+    """Разбор параметра format (ValueError - неизвестный формат)"""
+    fmt = (raw or 'full').strip().lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+    return fmt
+
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+"""
+Замеры времени запросов
+Для каждого маршрута - гистограмма задержек и разбивка времени на БД,
+сериализацию JSON и файловую систему; медленные SQL-запросы журналируются
+вместе с параметрами и планом выполнения (EXPLAIN QUERY PLAN)
+"""
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from flask import Flask, g, request
+
+logger = logging.getLogger(__name__)
+
+# Фазы, время которых учитывается отдельно
+PHASES = ('db', 'serialize', 'fs')
+
+# Накопитель времени фаз текущего запроса (None - вне запроса)
+_phases: ContextVar[Optional[Dict[str, float]]] = ContextVar('request_phases', default=None)
+
+
+def add_time(phase: str, seconds: float):
+    """Добавить время к фазе текущего запроса (вне запроса - ничего не делает)"""
+    phases = _phases.get()
+    if phases is not None:
+        phases[phase] = phases.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def track(phase: str):
+    """Замер блока кода как фазы текущего запроса"""
+    if _phases.get() is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(phase, time.perf_counter() - started)
+
+
+def _latency_histogram():
+    # Импорт по месту: пакет api при импорте создаёт WildberriesAPI,
+    # а этот модуль подключается и из лёгкого utils.json_provider
+    from api.image_metrics import Histogram, LATENCY_BUCKETS_MS
+    return Histogram(LATENCY_BUCKETS_MS)
+
+
+class _RouteStats:
+    def __init__(self):
+        self.latency = _latency_histogram()
+        self.phase_totals = {phase: 0.0 for phase in PHASES}
+        self.errors = 0
+
+    def to_dict(self) -> dict:
+        count = self.latency.count or 1
+        return {
+            'latency_ms': self.latency.to_dict(),
+            'avg_ms': {phase: round(total / count, 2) for phase, total in self.phase_totals.items()},
+            'errors': self.errors,
+        }
+
+
+class RequestTiming:
+    """
+    Middleware замеров для Flask и журнал медленных SQL-запросов.
+
+    Время потоковых ответов считается до начала отправки тела.
+    В ответ добавляется заголовок Server-Timing - разбивку видно
+    во вкладке Network инструментов разработчика браузера.
+    """
+
+    SLOW_LIMIT = 50
+    # Очередь медленных запросов на EXPLAIN и запись в журнал; при переполнении
+    # записи отбрасываются - запрос пользователя не должен ждать журнал
+    SLOW_QUEUE_SIZE = 200
+
+    def __init__(self, app: Optional[Flask] = None, slow_query_ms: float = 100,
+                 log_file: Optional[Path] = None, explain: Optional[Callable] = None):
+        """
+        Args:
+            app: Приложение Flask
+            slow_query_ms: Порог медленного SQL-запроса (мс)
+            log_file: Файл журнала медленных запросов (ротация 1 МБ x 3)
+            explain: explain(sql, params) -> строки плана запроса
+        """
+        self.slow_query_ms = slow_query_ms
+        self.explain = explain
+        self._routes: Dict[str, _RouteStats] = {}
+        self._slow: deque = deque(maxlen=self.SLOW_LIMIT)
+        self._lock = threading.Lock()
+        self._slow_queue: "queue.Queue[tuple]" = queue.Queue(maxsize=self.SLOW_QUEUE_SIZE)
+        self._slow_worker: Optional[threading.Thread] = None
+        self.slow_dropped = 0
+        self.slow_logger = logging.getLogger(f"{__name__}.slow_queries")
+        self.log_file = Path(log_file) if log_file else None
+        if self.log_file:
+            self._attach_file_handler()
+        if app is not None:
+            self.init_app(app)
+
+    def _attach_file_handler(self):
+        try:
+            self.log_file.parent.mkdir(parents=True, exist_ok=True)
+            handler = RotatingFileHandler(self.log_file, maxBytes=1024 * 1024, backupCount=3,
+                                          encoding='utf-8')
+        except OSError as e:
+            logger.error(f"Не удалось открыть журнал замеров {self.log_file}: {e}")
+            return
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        self.slow_logger.addHandler(handler)
+        self.slow_logger.setLevel(logging.INFO)
+
+    def init_app(self, app: Flask):
+        # Замер начинается раньше остальных before_request, а заканчивается
+        # после всех after_request (они вызываются в обратном порядке) - со сжатием
+        app.before_request_funcs.setdefault(None, []).insert(0, self._start)
+        app.after_request_funcs.setdefault(None, []).insert(0, self._finish)
+        app.teardown_request(self._teardown)
+
+    # ============== ЗАПРОСЫ ==============
+
+    def _start(self):
+        g._timing_started = time.perf_counter()
+        g._timing_token = _phases.set({})
+
+    def _finish(self, response):
+        started = g.get('_timing_started')
+        phases = _phases.get()
+        if started is None or phases is None:
+            return response
+        total = time.perf_counter() - started
+        rule = request.url_rule.rule if request.url_rule else '<unmatched>'
+        route = f"{request.method} {rule}"
+        with self._lock:
+            stats = self._routes.get(route)
+            if stats is None:
+                stats = self._routes[route] = _RouteStats()
+            stats.latency.observe(total * 1000)
+            for phase in PHASES:
+                stats.phase_totals[phase] += phases.get(phase, 0.0) * 1000
+            if response.status_code >= 500:
+                stats.errors += 1
+        timings = [f"{phase};dur={phases[phase] * 1000:.1f}" for phase in PHASES if phase in phases]
+        timings.append(f"total;dur={total * 1000:.1f}")
+        response.headers['Server-Timing'] = ', '.join(timings)
+        return response
+
+    def _teardown(self, exc=None):
+        token = g.pop('_timing_token', None)
+        if token is not None:
+            try:
+                _phases.reset(token)
+            except ValueError:
+                # Контекст уже другой (завершение в другом потоке) - накопитель просто отбрасываем
+                _phases.set(None)
+
+    # ============== SQL ==============
+
+    def on_query(self, sql: str, params, seconds: float):
+        """
+        Наблюдатель запросов DatabaseManager.
+
+        В потоке запроса только учитывается время и запоминается маршрут;
+        EXPLAIN и запись в журнал выполняет фоновый поток.
+        """
+        add_time('db', seconds)
+        elapsed_ms = seconds * 1000
+        if elapsed_ms < self.slow_query_ms:
+            return
+        try:
+            route = f"{request.method} {request.path}"
+        except RuntimeError:
+            route = None  # вне запроса (фоновые задачи)
+        item = (datetime.now().isoformat(timespec='seconds'), route, elapsed_ms, sql, tuple(params or ()))
+        self._ensure_worker()
+        try:
+            self._slow_queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.slow_dropped += 1
+
+    def _ensure_worker(self):
+        if self._slow_worker is not None:
+            return
+        with self._lock:
+            if self._slow_worker is None:
+                self._slow_worker = threading.Thread(target=self._slow_loop, name="Slow_Query_Log",
+                                                     daemon=True)
+                self._slow_worker.start()
+
+    def _slow_loop(self):
+        while True:
+            item = self._slow_queue.get()
+            try:
+                self._record_slow(*item)
+            except Exception as e:
+                logger.error(f"Ошибка журнала медленных запросов: {e}")
+            finally:
+                self._slow_queue.task_done()
+
+    def _record_slow(self, when: str, route: Optional[str], elapsed_ms: float, sql: str, params):
+        statement = ' '.join(sql.split())
+        plan: List[str] = []
+        if self.explain and statement.upper().startswith(('SELECT', 'WITH')):
+            try:
+                plan = self.explain(sql, params)
+            except Exception as e:
+                plan = [f"(план недоступен: {e})"]
+        entry = {
+            'time': when,
+            'route': route,
+            'ms': round(elapsed_ms, 1),
+            'sql': statement,
+            'params': [repr(p)[:100] for p in params],
+            'plan': plan,
+        }
+        with self._lock:
+            self._slow.append(entry)
+        self.slow_logger.info(f"{entry['ms']} мс [{route or 'фон'}] {statement} "
+                              f"params={entry['params']} plan={plan}")
+
+    def flush(self):
+        """Дождаться обработки уже поставленных в очередь медленных запросов"""
+        self._slow_queue.join()
+
+    # ============== СВОДКА ==============
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = {route: stats.to_dict() for route, stats in self._routes.items()}
+            slow = list(reversed(self._slow))
+        ordered = dict(sorted(routes.items(), key=lambda item: item[1]['latency_ms']['count'],
+                              reverse=True))
+        return {
+            'routes': ordered,
+            'slow_queries': slow,
+            'slow_query_ms': self.slow_query_ms,
+            'slow_dropped': self.slow_dropped,
+            'log_file': str(self.log_file) if self.log_file else None,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._slow.clear()
+            self.slow_dropped = 0
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Поиск с уточнением
+При наборе "1234" -> "12345" каждый следующий запрос содержит предыдущий,
+поэтому его результаты - подмножество предыдущих (поиск идёт по LIKE %q%).
+Если прошлый набор кандидатов был полным (не обрезан LIMIT), новый
+результат отбирается из него в памяти, без повторного прохода по таблицам
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, List, Optional
+
+# LIKE в SQLite не различает регистр только для латиницы
+_ASCII_LOWER = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+
+def like(value: Any, query: str) -> bool:
+    """Аналог `value LIKE '%query%'` из SQLite (NULL не совпадает ни с чем)"""
+    if value is None:
+        return False
+    return query.translate(_ASCII_LOWER) in str(value).translate(_ASCII_LOWER)
+
+
+# ============== УСЛОВИЯ ЗАПРОСОВ DatabaseManager ==============
+
+def goods_matches_barcode(goods, query: str) -> bool:
+    """search_goods_by_barcode: scanned_code (shk_code в пути), sticker_code, barcode"""
+    return (like(goods.scanned_code, query) or like(goods.sticker_code, query)
+            or like(goods.barcode, query))
+
+
+def goods_matches_name(goods, query: str) -> bool:
+    """search_goods_by_name: название, бренд или предмет из info"""
+    info = goods.info
+    return info is not None and (like(info.name, query) or like(info.brand, query)
+                                 or like(info.subject_name, query))
+
+
+def buyer_matches(buyer, query: str) -> bool:
+    """search_buyers: телефон, имя, user_sid или кастомное имя"""
+    if like(buyer.mobile, query) or like(buyer.name, query) or like(buyer.user_sid, query):
+        return True
+    return bool(buyer.custom_name) and query.lower() in buyer.custom_name.lower()
+
+
+def delivered_matches(item: dict, query: str) -> bool:
+    """search_delivered_goods: goods_uid, order_id, ШК или shk_code товара"""
+    return any(like(item.get(key), query) for key in ('goods_uid', 'order_id', 'scanned_code', 'shk_code'))
+
+
+# ============== КЭШ УТОЧНЕНИЙ ==============
+
+@dataclass
+class _Entry:
+    query: str
+    version: Hashable
+    items: list
+    complete: bool
+    created: float
+
+
+class RefinementCache:
+    """
+    Последний набор кандидатов каждого вида поиска для каждой сессии.
+
+    Наборы живут недолго (ttl) и сбрасываются при смене версии данных,
+    так что уточнение никогда не показывает устаревшие строки.
+    """
+
+    def __init__(self, ttl: float = 30.0, max_sessions: int = 256):
+        """
+        Args:
+            ttl: Время жизни набора кандидатов (сек)
+            max_sessions: Максимум сессий (самые старые вытесняются)
+        """
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def candidates(self, session: Hashable, kind: Hashable, query: str,
+                   version: Hashable) -> Optional[list]:
+        """Полный набор, из которого можно отобрать результаты query, или None"""
+        with self._lock:
+            entry = self._entries.get((session, kind))
+            if (entry is None or not entry.complete or entry.version != version
+                    or time.monotonic() - entry.created > self.ttl
+                    or entry.query.translate(_ASCII_LOWER) not in query.translate(_ASCII_LOWER)):
+                return None
+            return entry.items
+
+    def store(self, session: Hashable, kind: Hashable, query: str, version: Hashable,
+              items: list, complete: bool):
+        with self._lock:
+            key = (session, kind)
+            self._entries.pop(key, None)
+            self._entries[key] = _Entry(query, version, items, complete, time.monotonic())
+            while len(self._entries) > self.max_sessions * 4:
+                self._entries.popitem(last=False)
+
+    def search(self, session: Hashable, kind: Hashable, query: str, version: Hashable,
+               fetch: Callable[[int], List], matches: Callable[[Any, str], bool],
+               cap: int = 200) -> list:
+        """
+        Результаты поиска: уточнение прошлого набора или запрос к БД.
+
+        Args:
+            kind: Вид поиска; всё, что влияет на содержимое строк (например,
+                набор колонок SELECT), должно входить в kind
+            fetch: fetch(limit) - запрос к БД не более чем на limit строк
+            matches: Условие запроса, повторённое в Python
+            cap: Размер набора кандидатов; набор короче cap считается полным
+        """
+        candidates = self.candidates(session, kind, query, version)
+        if candidates is not None:
+            items = [item for item in candidates if matches(item, query)]
+            complete = True
+            with self._lock:
+                self.hits += 1
+        else:
+            items = fetch(cap)
+            complete = len(items) < cap
+            with self._lock:
+                self.misses += 1
+        self.store(session, kind, query, version, items, complete)
+        return items
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
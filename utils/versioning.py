@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Версионирование ответов API
+Списки и счётчики меняются только вместе с БД WB ПВЗ, поэтому ETag
+строится из версии данных и параметров запроса: на повторный опрос
+без изменений отвечаем 304, не выполняя ни одного запроса к БД
+"""
+import hashlib
+import uuid
+from functools import wraps
+from typing import Callable, Hashable
+
+from flask import Response, make_response, request
+
+from utils.compression import SUFFIXES
+
+
+class ResponseVersioning:
+    """
+    Декоратор ETag/304 для GET-эндпоинтов.
+
+    version() должна быть дешёвой (PRAGMA data_version, счётчики в памяти).
+    В ETag входит идентификатор запуска: после перезапуска сервера
+    счётчики начинаются заново, и старые ETag не должны совпасть.
+    """
+
+    def __init__(self, version: Callable[[], Hashable]):
+        self.version = version
+        self.boot_id = uuid.uuid4().hex[:8]
+
+    def etag_for_request(self) -> str:
+        args = sorted(request.args.items(multi=True))
+        raw = repr((self.boot_id, self.version(), request.path, args))
+        return hashlib.blake2b(raw.encode('utf-8'), digest_size=12).hexdigest()
+
+    @staticmethod
+    def _matches(etag: str) -> bool:
+        # Сжатый ответ уходит с ETag "<тег>-gzip" / "<тег>-br"
+        candidates = {etag} | {f"{etag}-{encoding}" for encoding in SUFFIXES}
+        return any(tag in candidates for tag in request.if_none_match.as_set())
+
+    def versioned(self, view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = self.etag_for_request()
+            if self._matches(etag):
+                response = Response(status=304)
+                response.set_etag(next(t for t in request.if_none_match.as_set()
+                                       if t.startswith(etag)))
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+            # Браузер хранит ответ, но каждый раз сверяется с сервером
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper